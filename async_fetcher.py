@@ -0,0 +1,153 @@
+# async_fetcher.py
+
+import asyncio
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+
+class FetchAborted(Exception):
+    pass
+
+
+class AsyncDataFetcher:
+    def __init__(self, fetcher, config, health=None):
+        fetch_config = config.get('fetching', {})
+        self.fetcher = fetcher
+        self.health = health  # SymbolHealth updated with each symbol's outcome, if given
+        self.max_concurrency = fetch_config.get('max_concurrency', 8)
+        self.request_timeout = fetch_config.get('request_timeout', 20)
+        self.max_retries = fetch_config.get('max_retries', 2)
+        self.backoff_base = fetch_config.get('backoff_base', 0.5)
+        self.backoff_max = fetch_config.get('backoff_max', 8)
+        self.max_consecutive_failures = fetch_config.get('max_consecutive_failures', 5)
+
+        # Timed-out calls keep running in their thread, so leave headroom beyond the in-flight limit
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency * 2,
+                                            thread_name_prefix='fetch')
+        self._semaphore = None
+        self._consecutive_failures = 0
+        self._tripped = False
+        self._errors = {}
+        self._outcomes = []  # (symbol, latency or None, failure reason) of this cycle, applied to health at its end
+
+    def _start_cycle(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._consecutive_failures = 0
+        self._tripped = False
+        self._errors = {}
+        self._outcomes = []
+
+    def _circuit_open(self):
+        # Stop hammering the source once it looks down (DNS, network) instead of failing every symbol
+        return self._consecutive_failures >= self.max_consecutive_failures
+
+    async def _call(self, func, symbol):
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            if self._circuit_open():
+                raise FetchAborted()
+            return await asyncio.wait_for(loop.run_in_executor(self._executor, func, symbol),
+                                          self.request_timeout)
+
+    async def _with_retries(self, func, symbol):
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await self._call(func, symbol)
+                self._consecutive_failures = 0
+                return result
+            except FetchAborted:
+                raise
+            except asyncio.TimeoutError:
+                last_error = TimeoutError(f"timed out after {self.request_timeout}s")
+            except Exception as e:
+                last_error = e
+
+            # Every failed attempt counts: retries queue behind the other symbols' first attempts, so
+            # counting only exhausted symbols would let an outage try the whole universe before tripping
+            self._consecutive_failures += 1
+            self._tripped = self._tripped or self._circuit_open()
+            if attempt < self.max_retries:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+        raise last_error
+
+    async def fetch_history(self, symbol):
+        try:
+            df = await self._with_retries(self.fetcher.download_history, symbol)
+            return df if df is not None else pd.DataFrame()
+        except FetchAborted:
+            return pd.DataFrame()
+        except Exception as e:
+            logging.warning(f"Error fetching data for {symbol}: {e}")
+            self._errors[symbol] = str(e)
+            return pd.DataFrame()
+
+    async def fetch_current_price(self, symbol):
+        try:
+            return await self._with_retries(self.fetcher.download_current_price, symbol)
+        except FetchAborted:
+            return None
+        except Exception as e:
+            logging.warning(f"Error fetching current price for {symbol}: {e}")
+            self._errors.setdefault(symbol, str(e))
+            return None
+
+    async def fetch_symbol(self, symbol, include_price=True):
+        start = time.perf_counter()
+        if not include_price:
+            df, current_price = await self.fetch_history(symbol), None
+        elif self.health is not None and self.health.probing(symbol):
+            # A failing symbol is probed with its history first, and its price only fetched if that worked
+            df = await self.fetch_history(symbol)
+            current_price = await self.fetch_current_price(symbol) if not df.empty else None
+        else:
+            df, current_price = await asyncio.gather(self.fetch_history(symbol),
+                                                     self.fetch_current_price(symbol))
+        if self.health is not None:
+            self._record_health(symbol, df, current_price, include_price, time.perf_counter() - start)
+        return symbol, df, current_price
+
+    def _record_health(self, symbol, df, current_price, include_price, elapsed):
+        if not df.empty and (current_price is not None or not include_price):
+            self._outcomes.append((symbol, elapsed, None))
+        else:
+            self._outcomes.append((symbol, None, self._errors.get(symbol, 'empty history' if df.empty else 'no price')))
+
+    def _commit_health(self):
+        # Failures only single out a symbol when the source served others in the same cycle; while it is down
+        # as a whole (breaker tripped, or nothing succeeded) they say nothing about the symbol
+        source_up = not self._tripped and any(latency is not None for _, latency, _ in self._outcomes)
+        for symbol, latency, reason in self._outcomes:
+            if latency is not None:
+                self.health.record_success(symbol, latency)
+            elif source_up:
+                self.health.record_failure(symbol, reason)
+        self._outcomes = []
+
+    async def stream(self, symbols, include_price=True):
+        # Yields (symbol, df, current_price) in completion order so analysis can start on the first arrival
+        self._start_cycle()
+        tasks = [asyncio.ensure_future(self.fetch_symbol(symbol, include_price)) for symbol in symbols]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self.health is not None:
+                self._commit_health()
+            if self._circuit_open():
+                logging.error(f"Data source unavailable, skipped remaining fetches this cycle "
+                              f"after {self._consecutive_failures} consecutive failures")
+
+    async def fetch_all(self, symbols):
+        return {symbol: df async for symbol, df, _ in self.stream(symbols, include_price=False)}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
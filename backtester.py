@@ -0,0 +1,214 @@
+# backtester.py
+#
+# Replays cached bars through SignalGenerator and RiskManagement. Signals are precomputed for
+# every bar of the whole universe at once; the per-trade loop only walks from one entry to the
+# bar where its stop loss or take profit is touched.
+
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+from bar_cache import BarCache
+from panel import PricePanel, rolling_std
+from risk_management import RiskManagement
+from signal_generator import SignalGenerator
+from utils import load_config, setup_logging
+
+TRADE_COLUMNS = ['symbol', 'action', 'entry_time', 'exit_time', 'entry_price', 'exit_price', 'stop_loss',
+                 'take_profit', 'leverage', 'position_size', 'exit_reason', 'bars_held', 'return', 'pnl']
+
+
+def _first_touch(adverse, favourable, start, stop, direction, stop_loss, take_profit, block=64):
+    # First bar in [start, stop) whose range reaches either level; scans in growing blocks so that
+    # short trades do not pay for comparing the rest of the history
+    while start < stop:
+        end = min(start + block, stop)
+        hits = (direction * adverse[start:end] <= direction * stop_loss) | \
+               (direction * favourable[start:end] >= direction * take_profit)
+        if hits.any():
+            return start + int(np.argmax(hits))
+        start, block = end, min(block * 2, 4096)
+    return None
+
+
+def _fill(direction, open_price, adverse, stop_loss, take_profit):
+    # Price and reason for a bar that touched a level. A bar that opens beyond a level fills at the
+    # open; when both levels fall inside one bar the stop is assumed to have been hit first.
+    if direction * open_price <= direction * stop_loss:
+        return open_price, 'stop_loss'
+    if direction * open_price >= direction * take_profit:
+        return open_price, 'take_profit'
+    if direction * adverse <= direction * stop_loss:
+        return stop_loss, 'stop_loss'
+    return take_profit, 'take_profit'
+
+
+class BacktestResult:
+    def __init__(self, trades, initial_capital):
+        self.trades = trades
+        self.initial_capital = initial_capital
+
+    def equity_curve(self):
+        pnl = self.trades.sort_values('exit_time').set_index('exit_time')['pnl']
+        return self.initial_capital + pnl.cumsum()
+
+    def summary(self):
+        trades = self.trades
+        if trades.empty:
+            return {'total_trades': 0}
+
+        equity = self.equity_curve()
+        drawdown = 1 - equity / np.maximum.accumulate(np.maximum(equity.to_numpy(), self.initial_capital))
+        gross_loss = -trades.loc[trades['pnl'] < 0, 'pnl'].sum()
+        return {
+            'total_trades': len(trades),
+            'win_rate': float((trades['pnl'] > 0).mean()),
+            'avg_return': float(trades['return'].mean()),
+            'total_pnl': float(trades['pnl'].sum()),
+            'profit_factor': float(trades.loc[trades['pnl'] > 0, 'pnl'].sum() / gross_loss) if gross_loss else np.inf,
+            'max_drawdown': float(drawdown.max()),
+            'avg_bars_held': float(trades['bars_held'].mean()),
+            'stop_loss_exits': int((trades['exit_reason'] == 'stop_loss').sum()),
+            'take_profit_exits': int((trades['exit_reason'] == 'take_profit').sum()),
+        }
+
+    def by_symbol(self):
+        return self.trades.groupby('symbol').agg(trades=('pnl', 'size'), win_rate=('pnl', lambda pnl: (pnl > 0).mean()),
+                                                 total_pnl=('pnl', 'sum'), avg_return=('return', 'mean'))
+
+
+class Backtester:
+    def __init__(self, config, bar_cache=None):
+        backtest_config = config.get('backtesting', {})
+        self.start_date = backtest_config.get('start_date')
+        self.end_date = backtest_config.get('end_date')
+        self.initial_capital = backtest_config.get('initial_capital', 10000)
+        self.fee_rate = backtest_config.get('fee_rate', 0.0)  # Per side, as a fraction of notional
+        self.max_holding_bars = backtest_config.get('max_holding_bars')
+
+        self.timeframe = config['data_parameters']['timeframe']
+        self.history_length = config['data_parameters']['history_length']
+        self.history_bars = int(pd.Timedelta(self.history_length) / pd.Timedelta(self.timeframe))
+
+        self.risk_management = RiskManagement(config['risk_management'])
+        self.signal_generator = SignalGenerator(config['strategy'], self.risk_management, None, None)
+        cache_config = config.get('cache', {})
+        self.bar_cache = bar_cache or BarCache(cache_config.get('directory', 'data_cache'))
+
+    def load_frames(self, symbols):
+        # Load one history window before start_date so the first bars of the range are fully warmed up
+        start = pd.Timestamp(self.start_date) - pd.Timedelta(self.history_length) if self.start_date else None
+        end = pd.Timestamp(self.end_date) + pd.Timedelta(days=1) if self.end_date else None
+        frames = {}
+        for symbol in symbols:
+            df = self.bar_cache.load(symbol, self.timeframe, start, end)
+            if df.empty:
+                logging.warning(f"No cached {self.timeframe} bars for {symbol} between {start} and {end}")
+                continue
+            frames[symbol] = df
+        return frames
+
+    def volatility(self, panel):
+        # SignalGenerator sizes leverage from the volatility of the fetched history window
+        returns = np.full(panel.close.shape, np.nan)
+        returns[1:] = panel.close[1:] / panel.close[:-1] - 1
+        return rolling_std(returns, self.history_bars - 1)
+
+    def precompute(self, panel, indicators=None, volatility=None):
+        signals = self.signal_generator.precompute_signals(panel, indicators)
+        if volatility is None:
+            volatility = self.volatility(panel)
+
+        tradable = (signals != 0) & np.isfinite(volatility) & (volatility > 0)
+        if self.start_date:
+            tradable &= (panel.index >= pd.Timestamp(self.start_date))[:, None]
+        return signals, volatility, tradable
+
+    def _simulate_symbol(self, symbol, j, panel, signals, volatility, tradable, start_bar, end_bar):
+        open_, high, low, close = panel.open[:, j], panel.high[:, j], panel.low[:, j], panel.close[:, j]
+        entries = start_bar + np.flatnonzero(tradable[start_bar:end_bar, j])
+        last_bar = end_bar - 1
+        while last_bar >= start_bar and np.isnan(close[last_bar]):
+            last_bar -= 1
+
+        trades = []
+        i = 0
+        while i < len(entries):
+            entry = entries[i]
+            if entry >= last_bar:
+                break
+            direction = 1 if signals[entry, j] > 0 else -1
+            action = 'BUY' if direction > 0 else 'SELL'
+            entry_price = close[entry]
+            stop_loss, take_profit = self.risk_management.calculate_stop_loss_take_profit(entry_price, action)
+            leverage = self.risk_management.calculate_leverage(volatility[entry, j])
+
+            adverse, favourable = (low, high) if direction > 0 else (high, low)
+            horizon = last_bar + 1 if self.max_holding_bars is None else min(last_bar + 1,
+                                                                              entry + 1 + self.max_holding_bars)
+            exit_bar = _first_touch(adverse, favourable, entry + 1, horizon, direction, stop_loss, take_profit)
+            if exit_bar is None:
+                exit_bar = horizon - 1
+                exit_price = close[exit_bar]
+                exit_reason = 'end_of_data' if exit_bar == last_bar else 'timeout'
+            else:
+                exit_price, exit_reason = _fill(direction, open_[exit_bar], adverse[exit_bar], stop_loss, take_profit)
+
+            position_size = self.risk_management.calculate_position_size(self.initial_capital, entry_price, stop_loss)
+            fees = self.fee_rate * position_size * (entry_price + exit_price)
+            trade_return = direction * (exit_price - entry_price) / entry_price - 2 * self.fee_rate
+            trades.append((symbol, action, entry, exit_bar, entry_price, exit_price,
+                           stop_loss, take_profit, leverage, position_size, exit_reason, exit_bar - entry,
+                           trade_return, direction * (exit_price - entry_price) * position_size - fees))
+
+            # One position per symbol: the next entry is the first signal after the exit bar
+            i = int(np.searchsorted(entries, exit_bar, side='right'))
+        return trades
+
+    def simulate(self, panel, signals, volatility, tradable, start_bar=0, end_bar=None):
+        # Trades are opened and closed within [start_bar, end_bar); positions still open at the end are closed there
+        end_bar = len(panel) if end_bar is None else end_bar
+        trades = []
+        for j, symbol in enumerate(panel.symbols):
+            trades.extend(self._simulate_symbol(symbol, j, panel, signals, volatility, tradable, start_bar, end_bar))
+
+        trades = pd.DataFrame(trades, columns=TRADE_COLUMNS)
+        # Bar positions are mapped to timestamps once, outside the trade loop
+        for column in ('entry_time', 'exit_time'):
+            trades[column] = panel.index.take(trades[column].to_numpy(dtype='i8'))
+        return BacktestResult(trades, self.initial_capital)
+
+    def run(self, frames):
+        panel = PricePanel.from_frames(frames)
+        return self.simulate(panel, *self.precompute(panel))
+
+    def run_symbols(self, symbols):
+        frames = self.load_frames(symbols)
+        if not frames:
+            raise ValueError("No cached bars to backtest; run the bot with the bar cache enabled first")
+        return self.run(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest the signal strategy on cached bars')
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--symbols', nargs='+', help='Defaults to trading.symbols')
+    parser.add_argument('--trades', default='backtest_trades.csv', help='Per-trade output file')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    setup_logging(config['logging']['level'], 'backtester.log', config['logging'])
+
+    backtester = Backtester(config)
+    result = backtester.run_symbols(args.symbols or config['trading']['symbols'])
+    result.trades.to_csv(args.trades, index=False)
+
+    for name, value in result.summary().items():
+        print(f"{name:>18}: {value}")
+    print(result.by_symbol().to_string())
+
+
+if __name__ == "__main__":
+    main()
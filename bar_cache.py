@@ -0,0 +1,191 @@
+# bar_cache.py
+
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import utc_now
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+BAR_DTYPE = np.dtype([('timestamp', '<i8')] + [(column, '<f8') for column in BAR_COLUMNS])
+
+
+def find_gaps(index, timeframe):
+    # Crypto trades around the clock, so any step larger than one bar is missing data
+    if len(index) < 2:
+        return []
+    interval = pd.Timedelta(timeframe)
+    steps = index[1:] - index[:-1]
+    positions = np.flatnonzero(steps > interval)
+    return [(index[i], index[i + 1], int(steps[i] / interval) - 1) for i in positions]
+
+
+class BarRing:
+    # The last `capacity` bars of one symbol; older bars are overwritten in place
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.bars = np.zeros(capacity, dtype=BAR_DTYPE)
+        self.count = 0  # Bars ever appended
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def last_timestamp(self):
+        return int(self.bars['timestamp'][(self.count - 1) % self.capacity]) if self.count else None
+
+    def append(self, bar):
+        # A bar for the newest timestamp replaces it (e.g. a backfilled partial bar); an older one is ignored
+        last_timestamp = self.last_timestamp
+        if last_timestamp is not None and bar[0] <= last_timestamp:
+            if bar[0] == last_timestamp:
+                self.bars[(self.count - 1) % self.capacity] = bar
+            return
+        self.bars[self.count % self.capacity] = bar
+        self.count += 1
+
+    def extend(self, records):
+        # Appends the records newer than the last bar held
+        if self.count:
+            records = records[records['timestamp'] > self.last_timestamp]
+        records = records[-self.capacity:]
+        self.bars[(self.count + np.arange(len(records))) % self.capacity] = records
+        self.count += len(records)
+
+    def records(self):
+        if self.count <= self.capacity:
+            return self.bars[:self.count].copy()
+        start = self.count % self.capacity
+        return np.concatenate((self.bars[start:], self.bars[:start]))
+
+
+class BarCache:
+    # One memory-mappable .npy file of BAR_DTYPE records per symbol and timeframe
+    def __init__(self, directory, max_bars=None):
+        self.directory = directory
+        self.max_bars = max_bars
+
+    def _path(self, symbol, timeframe):
+        return os.path.join(self.directory, timeframe, f"{symbol}.npy")
+
+    def _read(self, symbol, timeframe, mmap_mode=None):
+        path = self._path(symbol, timeframe)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=BAR_DTYPE)
+        return np.load(path, mmap_mode=mmap_mode)
+
+    @staticmethod
+    def _to_records(df):
+        records = np.empty(len(df), dtype=BAR_DTYPE)
+        records['timestamp'] = df.index.values.astype('datetime64[ns]').view('i8')
+        for column in BAR_COLUMNS:
+            records[column] = df[column].to_numpy(dtype='f8')
+        return records
+
+    @staticmethod
+    def _to_frame(records):
+        index = pd.DatetimeIndex(records['timestamp'].astype('datetime64[ns]'))
+        return pd.DataFrame({column: records[column] for column in BAR_COLUMNS}, index=index)
+
+    def load(self, symbol, timeframe, start=None, end=None):
+        records = self._read(symbol, timeframe, mmap_mode='r')
+        if start is not None:
+            records = records[records['timestamp'] >= pd.Timestamp(start).value]
+        if end is not None:
+            records = records[records['timestamp'] <= pd.Timestamp(end).value]
+        return self._to_frame(records)
+
+    def last_timestamp(self, symbol, timeframe):
+        records = self._read(symbol, timeframe, mmap_mode='r')
+        return pd.Timestamp(int(records['timestamp'][-1])) if len(records) else None
+
+    def merge(self, symbol, timeframe, df):
+        # Bars at or after the first new timestamp are replaced, so a partial last bar is overwritten once it closes
+        new = self._to_records(df.sort_index())
+        old = self._read(symbol, timeframe)
+        if len(new):
+            old = old[old['timestamp'] < new['timestamp'][0]]
+        merged = np.concatenate([old, new])
+        if self.max_bars is not None:
+            merged = merged[-self.max_bars:]
+
+        path = self._path(symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, merged)
+        os.replace(tmp_path, path)  # Readers never see a half-written file
+        return self._to_frame(merged)
+
+    def symbols(self, timeframe):
+        directory = os.path.join(self.directory, timeframe)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-4] for name in os.listdir(directory) if name.endswith('.npy'))
+
+    def gaps(self, symbol, timeframe):
+        return find_gaps(self.load(symbol, timeframe).index, timeframe)
+
+    def replay(self, symbol, timeframe, start=None, end=None):
+        # Offline playback of cached bars in time order
+        for timestamp, bar in self.load(symbol, timeframe, start, end).iterrows():
+            yield timestamp, bar
+
+
+class CachedDataFetcher:
+    def __init__(self, fetcher, cache, config):
+        self.fetcher = fetcher
+        self.cache = cache
+        self.timeframe = config['data_parameters']['timeframe']
+        self.history_length = config['data_parameters']['history_length']
+        self.offline = config.get('cache', {}).get('offline', False)
+
+    def _window(self, df):
+        if df.empty:
+            return df
+        return df[df.index > df.index[-1] - pd.Timedelta(self.history_length)]
+
+    def download_history(self, symbol):
+        if self.offline:
+            return self._window(self.cache.load(symbol, self.timeframe))
+
+        last_timestamp = self.cache.last_timestamp(symbol, self.timeframe)
+        if last_timestamp is None or utc_now() - last_timestamp > pd.Timedelta(self.history_length):
+            fresh = self.fetcher.download_history(symbol)
+        else:
+            # Refetch from the last cached bar, which may have been partial when stored
+            fresh = self.fetcher.download_history(symbol, start=last_timestamp)
+
+        if fresh.empty:
+            return self._window(self.cache.load(symbol, self.timeframe))
+
+        if last_timestamp is not None and fresh.index[0] - last_timestamp > pd.Timedelta(self.timeframe):
+            missing = int((fresh.index[0] - last_timestamp) / pd.Timedelta(self.timeframe)) - 1
+            logging.warning(f"Bar cache gap for {symbol} {self.timeframe}: {missing} bars missing "
+                            f"between {last_timestamp} and {fresh.index[0]}")
+
+        return self._window(self.cache.merge(symbol, self.timeframe, fresh))
+
+    def download_current_price(self, symbol):
+        if self.offline:
+            last_timestamp = self.cache.last_timestamp(symbol, self.timeframe)
+            if last_timestamp is None:
+                raise KeyError(f"No cached bars for {symbol}")
+            return float(self.cache.load(symbol, self.timeframe, start=last_timestamp)['Close'].iloc[-1])
+        return self.fetcher.download_current_price(symbol)
+
+    def fetch_historical_data(self, symbol):
+        try:
+            return self.download_history(symbol)
+        except Exception as e:
+            logging.error(f"Error fetching data for {symbol}: {e}")
+            return pd.DataFrame()
+
+    def get_current_price(self, symbol):
+        try:
+            return self.download_current_price(symbol)
+        except Exception as e:
+            logging.error(f"Error fetching current price for {symbol}: {e}")
+            return None
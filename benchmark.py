@@ -0,0 +1,342 @@
+# benchmark.py
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from async_fetcher import AsyncDataFetcher
+from backtester import Backtester
+from data_sources import create_source, synthetic_ohlcv
+from feature_store import FeatureStore, shared_store
+from indicators import Indicators
+from market_regime_detector import MarketRegimeDetector
+from ml_predictor import EnhancedMLPredictor
+from panel import PricePanel, score_universe
+from parallel_executor import ParallelSignalExecutor
+from performance_analytics import PerformanceAnalytics
+from risk_management import PortfolioRisk, RiskManagement
+from signal_generator import SignalGenerator
+from signal_record import Signal
+
+CAPITAL_ALLOCATION = {'momentum': 0.4, 'mean_reversion': 0.3, 'breakout': 0.3}
+STAGES = ('indicators', 'regime', 'signals', 'ml_prepare', 'risk', 'analytics', 'cycle')
+
+
+def _timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_panel(symbol_counts, n_bars, repeat):
+    # A zero-byte feature store keeps nothing, so every repeat computes the indicators again
+    generator = SignalGenerator({'capital_allocation': CAPITAL_ALLOCATION}, None, None, None, FeatureStore(0))
+
+    def per_symbol_loop(frames):
+        scores = []
+        for df in frames.values():
+            indicators = generator._calculate_indicators(df)
+            scores.append(generator._combine_signals(generator._momentum_strategy(df, indicators),
+                                                     generator._mean_reversion_strategy(df, indicators),
+                                                     generator._breakout_strategy(df, indicators), 0))
+        return scores
+
+    print(f"{'symbols':>8} {'loop (s)':>10} {'panel (s)':>10} {'speedup':>8}")
+    for n_symbols in symbol_counts:
+        frames = synthetic_ohlcv(n_symbols, n_bars)
+        loop_time = _timed(lambda: per_symbol_loop(frames), repeat)
+        panel_time = _timed(lambda: score_universe(PricePanel.from_frames(frames), CAPITAL_ALLOCATION), repeat)
+        print(f"{n_symbols:>8} {loop_time:>10.4f} {panel_time:>10.4f} {loop_time / panel_time:>7.1f}x")
+
+
+def bench_parallel(worker_counts, n_symbols, n_bars, repeat):
+    config = {
+        'strategy': {'capital_allocation': CAPITAL_ALLOCATION},
+        'risk_management': {'risk_per_trade': 0.01, 'max_risk_per_trade': 0.02, 'stop_loss_pct': 0.01,
+                            'max_leverage': 2},
+    }
+    frames = synthetic_ohlcv(n_symbols, n_bars)
+
+    print(f"{'workers':>8} {'time (s)':>10} {'symbols/s':>10}")
+    for workers in worker_counts:
+        executor = ParallelSignalExecutor(config, workers=workers)
+        executor.evaluate(frames)  # Warm up the pool and the per-worker regime models
+        elapsed = _timed(lambda: executor.evaluate(frames), repeat)
+        executor.close()
+        print(f"{workers:>8} {elapsed:>10.3f} {n_symbols / elapsed:>10.1f}")
+
+
+def bench_backtest(n_symbols, n_bars, repeat):
+    config = {
+        'strategy': {'capital_allocation': CAPITAL_ALLOCATION},
+        'risk_management': {'risk_per_trade': 0.01, 'max_risk_per_trade': 0.02, 'stop_loss_pct': 0.01,
+                            'max_leverage': 2},
+        'data_parameters': {'timeframe': '15m', 'history_length': '7d'},
+    }
+    frames = synthetic_ohlcv(n_symbols, n_bars)
+    backtester = Backtester(config)
+    panel = PricePanel.from_frames(frames)
+
+    precompute_time = _timed(lambda: backtester.precompute(panel), repeat)
+    total_time = _timed(lambda: backtester.run(frames), repeat)
+    result = backtester.run(frames)
+    print(f"{n_symbols} symbols x {n_bars} bars: {len(result.trades)} trades")
+    print(f"{'precompute (s)':>15} {'simulate (s)':>13} {'total (s)':>10} {'bars/s':>12}")
+    print(f"{precompute_time:>15.3f} {total_time - precompute_time:>13.3f} {total_time:>10.3f} "
+          f"{n_symbols * n_bars / total_time:>12.0f}")
+
+
+def bench_pipeline(n_symbols, workers, source_type, concurrency):
+    # Fetch + signal evaluation for a whole universe from an offline source, as one bot cycle would run it
+    config = {
+        'data_source': {'type': source_type, 'synthetic': {'speed': 0}, 'replay': {'speed': 0}},
+        'data_parameters': {'timeframe': '15m', 'history_length': '7d'},
+        'fetching': {'max_concurrency': concurrency},
+        'strategy': {'capital_allocation': CAPITAL_ALLOCATION},
+        'risk_management': {'risk_per_trade': 0.01, 'max_risk_per_trade': 0.02, 'stop_loss_pct': 0.01,
+                            'max_leverage': 2},
+    }
+    source = create_source(config)
+    symbols = source.symbols()[:n_symbols] if source_type == 'replay' else [f"SYM{j}-USD" for j in range(n_symbols)]
+    fetcher = AsyncDataFetcher(source, config)
+    executor = ParallelSignalExecutor(config, workers=workers)
+
+    start = time.perf_counter()
+    frames = asyncio.run(fetcher.fetch_all(symbols))
+    fetch_time = time.perf_counter() - start
+    start = time.perf_counter()
+    records = executor.evaluate(frames)
+    evaluate_time = time.perf_counter() - start
+    executor.close()
+    fetcher.close()
+
+    n_bars = sum(len(df) for df in frames.values())
+    signals = sum(record is not None for record in records.values())
+    print(f"{len(symbols)} symbols, {n_bars} bars from '{source_type}', {signals} signals")
+    print(f"{'stage':>10} {'time (s)':>10} {'symbols/s':>10}")
+    print(f"{'fetch':>10} {fetch_time:>10.2f} {len(symbols) / fetch_time:>10.0f}")
+    print(f"{'evaluate':>10} {evaluate_time:>10.2f} {len(symbols) / evaluate_time:>10.0f}")
+    print(f"{'total':>10} {fetch_time + evaluate_time:>10.2f} {len(symbols) / (fetch_time + evaluate_time):>10.0f}")
+
+
+def _stage_setups(frames, config):
+    # Stage name -> setup returning the callable to time; setups are untimed and give every run fresh state
+    # (empty feature store, unfitted regime models), so each run pays what a cold cycle pays
+    symbols = list(frames)
+    risk_management = RiskManagement(config['risk_management'])
+    candidates = [Signal(symbol, 'BUY', df['close'].iloc[-1], df['close'].iloc[-1] * 0.99, df['close'].iloc[-1] * 1.015,
+                         1.0, 1.0) for symbol, df in frames.items()]
+    # One trade every 16 bars per symbol for the analytics
+    trades = [Signal(symbol, 'BUY' if k % 2 else 'SELL', df['close'].iloc[k], 0, 0, 1, timestamp=df.index[k])
+              for symbol, df in frames.items() for k in range(0, len(df), 16)]
+
+    def indicators():
+        for df in frames.values():
+            Indicators.calculate_rsi(df['close'])
+            Indicators.calculate_macd(df['close'])
+            Indicators.calculate_atr(df)
+            Indicators.bollinger_bands(df)
+
+    def regime():
+        detector = MarketRegimeDetector(**config.get('regime_detection', {}))
+        return lambda: [detector.detect_regime(df['close'], symbol) for symbol, df in frames.items()]
+
+    def signals():
+        generator = SignalGenerator(config['strategy'], risk_management, None,
+                                    MarketRegimeDetector(**config.get('regime_detection', {})), FeatureStore())
+        return lambda: [generator.generate_signal(df, symbol) for symbol, df in frames.items()]
+
+    def ml_prepare():
+        predictor = EnhancedMLPredictor(feature_store=FeatureStore())
+        return lambda: [predictor.prepare_data(df, fit=True, symbol=symbol) for symbol, df in frames.items()]
+
+    def risk():
+        portfolio_risk = PortfolioRisk(config['risk_management'], symbols)
+
+        def run():
+            for signal, df in zip(candidates, frames.values()):
+                risk_management.calculate_stop_loss_take_profit(signal.entry_price, signal.action)
+                risk_management.calculate_position_size(10000, signal.entry_price, signal.stop_loss)
+                risk_management.calculate_leverage(df['close'].pct_change().std())
+            portfolio_risk.update(frames)
+            portfolio_risk.scale(candidates)
+        return run
+
+    def analytics():
+        performance = PerformanceAnalytics()
+
+        def run():
+            for signal in trades:
+                performance.add_signal(signal)
+            performance.calculate_metrics()
+        return run
+
+    def cycle():
+        # Signal evaluation for the whole universe, then portfolio sizing, as one bot cycle runs them
+        shared_store().clear()  # The in-process generator reads through the shared store
+        executor = ParallelSignalExecutor(config, workers=1)
+        portfolio_risk = PortfolioRisk(config['risk_management'], symbols)
+
+        def run():
+            generated = [signal for signal in executor.evaluate(frames).values() if signal is not None]
+            portfolio_risk.update(frames)
+            portfolio_risk.scale(generated)
+        return run
+
+    return {'indicators': lambda: indicators, 'regime': regime, 'signals': signals, 'ml_prepare': ml_prepare,
+            'risk': risk, 'analytics': analytics, 'cycle': cycle}
+
+
+def _measure(setup, repeat):
+    setup()()  # Warm-up, so lazy imports and first-call costs stay out of the numbers
+    times = []
+    for _ in range(repeat):
+        run = setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    # Peak memory comes from one extra run, since tracing allocations slows the timed ones down
+    run = setup()
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'best_s': min(times), 'median_s': statistics.median(times), 'peak_mb': peak / 2 ** 20}
+
+
+def bench_stages(n_symbols, n_bars, volatility, seed, repeat, stages=None):
+    config = {
+        'strategy': {'capital_allocation': CAPITAL_ALLOCATION},
+        'risk_management': {'risk_per_trade': 0.01, 'max_risk_per_trade': 0.02, 'stop_loss_pct': 0.01,
+                            'max_leverage': 2},
+    }
+    frames = synthetic_ohlcv(n_symbols, n_bars, seed=seed, volatility=volatility)
+    setups = _stage_setups(frames, config)
+    results = {
+        'meta': {'symbols': n_symbols, 'bars': n_bars, 'volatility': list(volatility), 'seed': seed, 'repeat': repeat,
+                 'created': pd.Timestamp.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                 'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.machine()},
+        'stages': {},
+    }
+    print(f"{n_symbols} symbols x {n_bars} bars, volatility {'/'.join(map(str, volatility))}, seed {seed}")
+    print(f"{'stage':>12} {'best (s)':>10} {'median (s)':>11} {'peak (MB)':>10}")
+    for name in stages or STAGES:
+        result = results['stages'][name] = _measure(setups[name], repeat)
+        print(f"{name:>12} {result['best_s']:>10.4f} {result['median_s']:>11.4f} {result['peak_mb']:>10.1f}")
+    return results
+
+
+def compare(baseline, results, threshold, min_seconds=0.005, min_mb=0.5):
+    # Stages whose median time or peak memory grew by more than threshold; growth below min_seconds or min_mb
+    # is noise, like a 0.04 -> 0.05 MB peak
+    meta_keys = ('symbols', 'bars', 'volatility', 'seed')
+    if any(baseline['meta'].get(key) != results['meta'].get(key) for key in meta_keys):
+        print("Warning: baseline was run with different inputs: " +
+              ', '.join(f"{key} {baseline['meta'].get(key)} vs {results['meta'].get(key)}" for key in meta_keys))
+    regressions = []
+    print(f"{'stage':>12} {'median':>16} {'change':>8} {'peak (MB)':>16} {'change':>8}")
+    for name, result in results['stages'].items():
+        base = baseline['stages'].get(name)
+        if base is None:
+            print(f"{name:>12} (not in baseline)")
+            continue
+        time_change = result['median_s'] / base['median_s'] - 1 if base['median_s'] else 0.0
+        memory_change = result['peak_mb'] / base['peak_mb'] - 1 if base['peak_mb'] else 0.0
+        flags = []
+        if time_change > threshold and result['median_s'] - base['median_s'] > min_seconds:
+            flags.append('SLOWER')
+        if memory_change > threshold and result['peak_mb'] - base['peak_mb'] > min_mb:
+            flags.append('MORE MEMORY')
+        if flags:
+            regressions.append((name, flags))
+        print(f"{name:>12} {base['median_s']:>7.4f}->{result['median_s']:<7.4f} {time_change:>+8.1%} "
+              f"{base['peak_mb']:>7.1f}->{result['peak_mb']:<7.1f} {memory_change:>+8.1%}  {' '.join(flags)}")
+    return regressions
+
+
+def _load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline performance benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    panel_parser = subparsers.add_parser('panel', help='Per-symbol loop vs vectorised panel scoring')
+    panel_parser.add_argument('--symbols', type=int, nargs='+', default=[40, 400, 4000])
+    panel_parser.add_argument('--bars', type=int, default=672)  # 7 days of 15m bars
+    panel_parser.add_argument('--repeat', type=int, default=3)
+
+    parallel_parser = subparsers.add_parser('parallel', help='Signal evaluation throughput vs worker count')
+    parallel_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parallel_parser.add_argument('--symbols', type=int, default=400)
+    parallel_parser.add_argument('--bars', type=int, default=672)
+    parallel_parser.add_argument('--repeat', type=int, default=3)
+
+    backtest_parser = subparsers.add_parser('backtest', help='Backtester throughput on synthetic bars')
+    backtest_parser.add_argument('--symbols', type=int, default=40)
+    backtest_parser.add_argument('--bars', type=int, default=35040)  # One year of 15m bars
+    backtest_parser.add_argument('--repeat', type=int, default=3)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help='Full fetch + evaluation cycle from an offline source')
+    pipeline_parser.add_argument('--symbols', type=int, default=10000)
+    pipeline_parser.add_argument('--workers', type=int, default=None, help='Defaults to every CPU')
+    pipeline_parser.add_argument('--source', choices=['synthetic', 'replay'], default='synthetic')
+    pipeline_parser.add_argument('--concurrency', type=int, default=32)
+
+    stages_parser = subparsers.add_parser('stages', help='Per-stage and full-cycle timings with peak memory')
+    stages_parser.add_argument('--symbols', type=int, default=40)
+    stages_parser.add_argument('--bars', type=int, default=672)
+    stages_parser.add_argument('--volatility', type=float, nargs='+', default=[0.002, 0.008, 0.004],
+                               help='Per-bar volatility; several values make consecutive volatility regimes')
+    stages_parser.add_argument('--seed', type=int, default=42)
+    stages_parser.add_argument('--repeat', type=int, default=5)
+    stages_parser.add_argument('--stages', nargs='+', choices=STAGES, default=None, help='Subset of stages to run')
+    stages_parser.add_argument('--output', help='Write the results to this JSON file')
+    stages_parser.add_argument('--baseline', help='Compare against a stored results file')
+    stages_parser.add_argument('--threshold', type=float, default=0.15, help='Relative growth flagged as a regression')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two stored stage results')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('--threshold', type=float, default=0.15)
+
+    args = parser.parse_args()
+    if args.command == 'stages':
+        results = bench_stages(args.symbols, args.bars, args.volatility, args.seed, args.repeat, args.stages)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+        if args.baseline:
+            print()
+            if compare(_load_results(args.baseline), results, args.threshold):
+                sys.exit(1)
+    elif args.command == 'compare':
+        if compare(_load_results(args.baseline), _load_results(args.results), args.threshold):
+            sys.exit(1)
+    elif args.command == 'panel':
+        bench_panel(args.symbols, args.bars, args.repeat)
+    elif args.command == 'parallel':
+        bench_parallel(args.workers, args.symbols, args.bars, args.repeat)
+    elif args.command == 'backtest':
+        bench_backtest(args.symbols, args.bars, args.repeat)
+    elif args.command == 'pipeline':
+        bench_pipeline(args.symbols, args.workers, args.source, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
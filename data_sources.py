@@ -0,0 +1,253 @@
+# data_sources.py
+#
+# Market data sources selected by data_source.type. Every source provides the raising
+# download_history / download_current_price pair used by AsyncDataFetcher and returns bars with
+# yfinance-style capitalised OHLCV columns. Offline sources carry their own clock so the scheduler
+# can run replayed time faster than the wall clock.
+
+import abc
+import asyncio
+import logging
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from bar_cache import BAR_COLUMNS, BarCache
+from utils import utc_now
+
+_sources = {}
+
+
+def register_source(name, factory):
+    _sources[name] = factory
+
+
+def create_source(config):
+    source_type = config.get('data_source', {}).get('type', 'yfinance')
+    if source_type not in _sources:
+        raise KeyError(f"Unknown data source: {source_type} (available: {', '.join(sorted(_sources))})")
+    return _sources[source_type](config)
+
+
+def synthetic_ohlcv(n_symbols, n_bars, timeframe='15m', seed=42, volatility=0.004):
+    # Several volatilities split the bars into consecutive, equally long volatility regimes
+    rng = np.random.default_rng(seed)
+    interval = pd.Timedelta(timeframe)
+    index = pd.date_range(end=utc_now().floor(interval), periods=n_bars, freq=interval)
+    volatility = np.atleast_1d(volatility)
+    bar_volatility = volatility[np.arange(n_bars) * len(volatility) // n_bars]
+    returns = rng.normal(0, 1, size=(n_bars, n_symbols)) * bar_volatility[:, None]
+    close = 100 * np.exp(np.cumsum(returns, axis=0))
+    spread = np.abs(rng.normal(0, 0.003, size=(n_bars, n_symbols)))
+    frames = {}
+    for j in range(n_symbols):
+        open_ = np.roll(close[:, j], 1)
+        frames[f"SYM{j}-USD"] = pd.DataFrame({
+            'open': open_,
+            'high': np.maximum(open_, close[:, j]) * (1 + spread[:, j]),
+            'low': np.minimum(open_, close[:, j]) * (1 - spread[:, j]),
+            'close': close[:, j],
+            'volume': rng.uniform(1e3, 1e5, n_bars),
+        }, index=index)
+    return frames
+
+
+class WallClock:
+    def now(self):
+        return utc_now()
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+
+class ReplayClock:
+    # Virtual time running `speed` times faster than the wall clock; with speed 0 it only moves on sleep()
+    def __init__(self, start, speed=0):
+        self.start = pd.Timestamp(start)
+        self.speed = speed
+        self._jumped = pd.Timedelta(0)
+        self._wall_start = time.monotonic()
+
+    def now(self):
+        return self.start + self._jumped + pd.Timedelta(seconds=(time.monotonic() - self._wall_start) * self.speed)
+
+    async def sleep(self, seconds):
+        if self.speed:
+            await asyncio.sleep(seconds / self.speed)
+        else:
+            self._jumped += pd.Timedelta(seconds=seconds)
+            await asyncio.sleep(0)
+
+
+class DataSource(abc.ABC):
+    cacheable = True  # Whether CachedDataFetcher should persist what this source returns
+    streaming = False  # Whether bars are pushed, so the scheduler can wait on wait_closed()
+    clock = None
+
+    def __init__(self, config):
+        self.timeframe = config['data_parameters']['timeframe']
+        self.history_length = config['data_parameters']['history_length']
+        self.interval = pd.Timedelta(self.timeframe)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abc.abstractmethod
+    def download_history(self, symbol, start=None):
+        pass
+
+    @abc.abstractmethod
+    def download_current_price(self, symbol):
+        pass
+
+    def fetch_historical_data(self, symbol):
+        try:
+            return self.download_history(symbol)
+        except Exception as e:
+            logging.error(f"Error fetching data for {symbol}: {e}")
+            return pd.DataFrame()
+
+    def get_current_price(self, symbol):
+        try:
+            return self.download_current_price(symbol)
+        except Exception as e:
+            logging.error(f"Error fetching current price for {symbol}: {e}")
+            return None
+
+
+class ReplayDataSource(DataSource):
+    # Serves recorded bars as of the replay clock: only bars that have closed by clock.now() are visible
+    cacheable = False
+
+    def __init__(self, config):
+        super().__init__(config)
+        replay_config = config.get('data_source', {}).get('replay', {})
+        self.directory = replay_config.get('directory', config.get('cache', {}).get('directory', 'data_cache'))
+        self.format = replay_config.get('format', 'npy')
+        self.bar_cache = BarCache(self.directory)
+        self._bars = {}  # symbol -> (timestamps ns, OHLCV rows)
+
+        start = replay_config.get('start')
+        if start is None:
+            first = [self._load(symbol)[0][0] for symbol in self.symbols() if len(self._load(symbol)[0])]
+            if not first:
+                raise ValueError(f"No recorded {self.timeframe} bars in {self.directory}")
+            start = pd.Timestamp(min(first)) + pd.Timedelta(self.history_length)
+        self.clock = ReplayClock(start, replay_config.get('speed', 0))
+
+    def symbols(self):
+        if self.format == 'csv':
+            return sorted(name[:-4] for name in os.listdir(self.directory) if name.endswith('.csv'))
+        return self.bar_cache.symbols(self.timeframe)
+
+    def _load(self, symbol):
+        if symbol not in self._bars:
+            if self.format == 'csv':
+                path = os.path.join(self.directory, f"{symbol}.csv")
+                df = pd.read_csv(path, index_col=0, parse_dates=True) if os.path.exists(path) else pd.DataFrame()
+                df = df.rename(columns=str.capitalize)
+                timestamps = df.index.values.astype('datetime64[ns]').view('i8')
+                values = df[BAR_COLUMNS].to_numpy(dtype='f8') if not df.empty else np.empty((0, len(BAR_COLUMNS)))
+            else:
+                records = self.bar_cache.load(symbol, self.timeframe)
+                timestamps = records.index.values.astype('datetime64[ns]').view('i8')
+                values = records[BAR_COLUMNS].to_numpy(dtype='f8')
+            self._bars[symbol] = (timestamps, values)
+        return self._bars[symbol]
+
+    def _visible(self, symbol, start=None):
+        timestamps, values = self._load(symbol)
+        if not len(timestamps):
+            raise KeyError(f"No recorded bars for {symbol}")
+        # A bar is visible once it has closed; timestamps mark the bar open
+        now = self.clock.now()
+        end = np.searchsorted(timestamps, (now - self.interval).value, side='right')
+        window_start = now - pd.Timedelta(self.history_length) if start is None else pd.Timestamp(start)
+        begin = np.searchsorted(timestamps, window_start.value, side='left')
+        return timestamps[begin:end], values[begin:end]
+
+    def download_history(self, symbol, start=None):
+        timestamps, values = self._visible(symbol, start)
+        return pd.DataFrame(values, columns=BAR_COLUMNS, index=pd.DatetimeIndex(timestamps.view('datetime64[ns]')))
+
+    def download_current_price(self, symbol):
+        timestamps, values = self._visible(symbol)
+        if not len(timestamps):
+            raise KeyError(f"No bars for {symbol} before {self.clock.now()}")
+        return float(values[-1, BAR_COLUMNS.index('Close')])
+
+
+class SyntheticDataSource(DataSource):
+    # Deterministic random-walk bars per symbol for load tests; the same symbol always gets the same path
+    cacheable = False
+
+    def __init__(self, config):
+        super().__init__(config)
+        synthetic_config = config.get('data_source', {}).get('synthetic', {})
+        self.seed = synthetic_config.get('seed', 42)
+        self.volatility = synthetic_config.get('volatility', 0.004)
+        speed = synthetic_config.get('speed')
+        self.clock = WallClock() if speed is None else ReplayClock(synthetic_config.get('start', utc_now()),
+                                                                   speed)
+        self.origin = self.clock.now().floor(self.interval) - pd.Timedelta(self.history_length)
+        self._paths = {}  # symbol -> (generator, last log close, bar rows generated so far)
+        self._lock = threading.Lock()  # History and price requests for one symbol arrive on different threads
+
+    def _bars(self, symbol, n_bars):
+        with self._lock:
+            return self._extend(symbol, n_bars)
+
+    def _extend(self, symbol, n_bars):
+        # Extends the symbol's path to n_bars, drawing from its own generator so earlier bars never change
+        state = self._paths.get(symbol)
+        if state is None:
+            rng = np.random.default_rng([self.seed, zlib.crc32(symbol.encode())])
+            state = self._paths[symbol] = [rng, np.log(rng.uniform(1, 1000)), np.empty((0, len(BAR_COLUMNS)))]
+        rng, last_log_close, rows = state
+        missing = n_bars - len(rows)
+        if missing > 0:
+            log_close = last_log_close + np.cumsum(rng.normal(0, self.volatility, missing))
+            close = np.exp(log_close)
+            open_ = np.exp(np.concatenate(([last_log_close], log_close[:-1])))
+            spread = np.abs(rng.normal(0, self.volatility * 0.75, missing))
+            new_rows = np.column_stack((open_, np.maximum(open_, close) * (1 + spread),
+                                        np.minimum(open_, close) * (1 - spread), close,
+                                        rng.uniform(1e3, 1e5, missing)))
+            state[1], state[2] = log_close[-1], np.concatenate((rows, new_rows))
+        return state[2][:n_bars]
+
+    def download_history(self, symbol, start=None):
+        now = self.clock.now()
+        n_bars = int((now - self.origin) / self.interval)
+        rows = self._bars(symbol, n_bars)
+        index = pd.date_range(self.origin, periods=n_bars, freq=self.interval)
+        window_start = now - pd.Timedelta(self.history_length) if start is None else pd.Timestamp(start)
+        begin = index.searchsorted(window_start)
+        return pd.DataFrame(rows[begin:], columns=BAR_COLUMNS, index=index[begin:])
+
+    def download_current_price(self, symbol):
+        n_bars = int((self.clock.now() - self.origin) / self.interval)
+        return float(self._bars(symbol, n_bars)[-1, BAR_COLUMNS.index('Close')])
+
+
+def _yfinance_source(config):
+    from data_fetcher import YFinanceDataFetcher  # yfinance is only imported when it is the configured source
+    return YFinanceDataFetcher(config)
+
+
+def _stream_source(config):
+    from stream_ingest import StreamDataSource
+    return StreamDataSource(config)
+
+
+register_source('yfinance', _yfinance_source)
+register_source('stream', _stream_source)
+register_source('replay', ReplayDataSource)
+register_source('synthetic', SyntheticDataSource)
@@ -0,0 +1,116 @@
+# feature_store.py
+#
+# Memoised indicator arrays shared by the signal generator, the ML predictor and the analyzer, so
+# each indicator is computed once per symbol per bar. Entries are keyed by the frame's identity
+# (symbol, timeframe, length, first and last bar, first and last close) plus indicator name and
+# parameters; the last close is part of the key because a still-forming bar changes without a new
+# timestamp.
+# Arrays are returned read-only and evicted least-recently-used beyond a memory budget.
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from indicators import Indicators
+
+
+def _column(df, name):
+    return df[name] if name in df else df[name.capitalize()]
+
+
+def _rsi(store, df, key, period=14):
+    return Indicators.calculate_rsi(_column(df, 'close'), period)
+
+
+def _macd(store, df, key, fast=12, slow=26):
+    # Built from the cached EMAs, which the signal line and other MACD variants share
+    return store.get(df, 'ema', key, span=fast) - store.get(df, 'ema', key, span=slow)
+
+
+def _macd_signal(store, df, key, fast=12, slow=26, signal=9):
+    macd = pd.Series(store.get(df, 'macd', key, fast=fast, slow=slow))
+    return macd.ewm(span=signal, adjust=False).mean()
+
+
+INDICATORS = {
+    'sma': lambda store, df, key, window: _column(df, 'close').rolling(window=window).mean(),
+    'ema': lambda store, df, key, span: _column(df, 'close').ewm(span=span, adjust=False).mean(),
+    'rsi': _rsi,
+    'macd': _macd,
+    'macd_signal': _macd_signal,
+    'rolling_max': lambda store, df, key, column, window: _column(df, column).rolling(window=window).max(),
+    'rolling_min': lambda store, df, key, column, window: _column(df, column).rolling(window=window).min(),
+    'atr': lambda store, df, key, period: Indicators.calculate_atr(df.rename(columns=str.lower), period),
+}
+
+
+def frame_key(df, symbol=None, timeframe=None):
+    if df.empty:
+        return symbol, timeframe, 0
+    close = _column(df, 'close')
+    return symbol, timeframe, len(df), df.index[0], df.index[-1], float(close.iloc[0]), float(close.iloc[-1])
+
+
+class FeatureStore:
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> read-only array, least recently used first
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, df, indicator, key=None, **params):
+        # key is frame_key(df, ...) when the caller knows the symbol; without one the frame's own bars identify it
+        frame = frame_key(df) if key is None else key
+        entry_key = (frame, indicator, tuple(sorted(params.items())))
+        with self._lock:
+            values = self._entries.get(entry_key)
+            if values is not None:
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                return values
+            self.misses += 1
+
+        values = INDICATORS[indicator](self, df, frame, **params)
+        values = np.asarray(values, dtype='f8')
+        values.flags.writeable = False
+        self._put(entry_key, values)
+        return values
+
+    def _put(self, entry_key, values):
+        with self._lock:
+            if entry_key in self._entries:
+                return
+            self._entries[entry_key] = values
+            self.bytes += values.nbytes
+            while self.bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'entries': len(self._entries), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+
+_shared = FeatureStore()
+
+
+def shared_store():
+    return _shared
+
+
+def configure(config):
+    # Resizes the process-wide store from the feature_store config section
+    _shared.max_bytes = config.get('feature_store', {}).get('max_mb', 256) * 1024 * 1024
+    return _shared
@@ -0,0 +1,267 @@
+# instrumentation.py
+#
+# Latency histograms per stage and per (stage, symbol), slow-call counters and iteration timings,
+# exported in the Prometheus text format to a file and/or a small HTTP endpoint. Iterations that
+# run far slower than usual arm cProfile and tracemalloc for the following iteration.
+
+import asyncio
+import bisect
+import cProfile
+import functools
+import inspect
+import logging
+import os
+import statistics
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.slow = 0
+
+    def observe(self, seconds, slow_threshold=None):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        if slow_threshold is not None and seconds > slow_threshold:
+            self.slow += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-quantile, as Prometheus' histogram_quantile would estimate
+        if not self.count:
+            return None
+        rank, cumulative = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+class Instrumentation:
+    def __init__(self, config=None):
+        config = config or {}
+        self.enabled = config.get('enabled', True)
+        self.buckets = tuple(sorted(config.get('buckets', DEFAULT_BUCKETS)))
+        self.slow_call_seconds = config.get('slow_call_seconds', 2.0)
+        self.slow_thresholds = config.get('slow_thresholds', {})  # Per-stage overrides
+        self.metrics_file = config.get('metrics_file')
+        self.profile_outliers = config.get('profile_outliers', True)
+        self.outlier_factor = config.get('outlier_factor', 3.0)
+        self.profile_dir = config.get('profile_dir', 'profiles')
+        self.iteration_budget = config.get('iteration_budget')
+
+        self.stages = {}
+        self.symbol_stages = {}
+        self.iterations = LatencyHistogram(tuple(sorted(set(self.buckets) | {120, 300, 900})))
+        self.overruns = 0
+        self.last_iteration_seconds = 0.0
+        self._recent = deque(maxlen=50)
+        self._iteration = 0
+        self._armed = False
+        self._lock = threading.Lock()  # Fetches are timed on worker threads
+        self._server = None
+
+        port = config.get('metrics_port')
+        if self.enabled and port:
+            self.serve(port, config.get('metrics_host', '127.0.0.1'))
+
+    def observe(self, stage, seconds, symbol=None):
+        if not self.enabled:
+            return
+        threshold = self.slow_thresholds.get(stage, self.slow_call_seconds)
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = LatencyHistogram(self.buckets)
+            histogram.observe(seconds, threshold)
+            if symbol is not None:
+                key = (stage, symbol)
+                histogram = self.symbol_stages.get(key)
+                if histogram is None:
+                    histogram = self.symbol_stages[key] = LatencyHistogram(self.buckets)
+                histogram.observe(seconds, threshold)
+        if seconds > threshold:
+            logging.debug(f"Slow {stage} call{f' for {symbol}' if symbol else ''}: {seconds:.2f}s")
+
+    @contextmanager
+    def timer(self, stage, symbol=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, symbol)
+
+    def wrap(self, obj, method_name, stage, symbol_arg='symbol'):
+        # Replaces obj.method_name on this instance with a timed version; works for plain and async methods
+        if not self.enabled:
+            return
+        method = getattr(obj, method_name)
+        signature = inspect.signature(method)
+
+        def symbol_of(args, kwargs):
+            if symbol_arg is None:
+                return None
+            try:
+                return signature.bind_partial(*args, **kwargs).arguments.get(symbol_arg)
+            except TypeError:
+                return None
+
+        if asyncio.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    self.observe(stage, time.perf_counter() - start, symbol_of(args, kwargs))
+        else:
+            @functools.wraps(method)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    self.observe(stage, time.perf_counter() - start, symbol_of(args, kwargs))
+        setattr(obj, method_name, timed)
+
+    @contextmanager
+    def iteration(self):
+        self._iteration += 1
+        profiler = None
+        if self.enabled and self._armed:
+            profiler = cProfile.Profile()
+            tracemalloc.start()
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                self._dump_profile(profiler, tracemalloc.take_snapshot())
+                tracemalloc.stop()
+                self._armed = False
+            self._finish_iteration(elapsed, profiled=profiler is not None)
+
+    def _finish_iteration(self, elapsed, profiled=False):
+        if not self.enabled:
+            return
+        self.iterations.observe(elapsed)
+        self.last_iteration_seconds = elapsed
+        if self.iteration_budget is not None and elapsed > self.iteration_budget:
+            self.overruns += 1
+            logging.warning(f"Iteration {self._iteration} took {elapsed:.1f}s, "
+                            f"over its {self.iteration_budget}s budget")
+
+        # An outlier against the recent median profiles the next iteration, which usually hits the same cause.
+        # Profiled iterations carry the profiler's overhead and are kept out of the baseline.
+        if not profiled:
+            if self.profile_outliers and len(self._recent) >= 5:
+                median = statistics.median(self._recent)
+                if elapsed > self.outlier_factor * median:
+                    logging.warning(f"Iteration {self._iteration} took {elapsed:.2f}s ({elapsed / median:.1f}x the "
+                                    f"median); profiling the next iteration")
+                    self._armed = True
+            self._recent.append(elapsed)
+        self.write_metrics()
+
+    def _dump_profile(self, profiler, snapshot):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        prefix = os.path.join(self.profile_dir, f"iteration-{self._iteration:06d}")
+        profiler.dump_stats(prefix + '.prof')  # Open with pstats or snakeviz
+        with open(prefix + '-memory.txt', 'w') as f:
+            for stat in snapshot.statistics('lineno')[:25]:
+                f.write(f"{stat}\n")
+        logging.info(f"Wrote profile of iteration {self._iteration} to {prefix}.prof")
+
+    def _histogram_lines(self, name, histogram, labels):
+        prefix = f"{labels}," if labels else ''
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}'
+        suffix = f"{{{labels}}}" if labels else ''
+        yield f"{name}_sum{suffix} {histogram.sum:.6f}"
+        yield f"{name}_count{suffix} {histogram.count}"
+
+    def render(self):
+        with self._lock:
+            stages = list(self.stages.items())
+            symbol_stages = list(self.symbol_stages.items())
+        lines = ['# HELP signals_bot_stage_seconds Latency of each stage of the signal loop',
+                 '# TYPE signals_bot_stage_seconds histogram']
+        for stage, histogram in sorted(stages):
+            lines.extend(self._histogram_lines('signals_bot_stage_seconds', histogram, _labels(stage=stage)))
+        lines += ['# HELP signals_bot_symbol_stage_seconds Latency of each stage per symbol',
+                  '# TYPE signals_bot_symbol_stage_seconds histogram']
+        for (stage, symbol), histogram in sorted(symbol_stages):
+            lines.extend(self._histogram_lines('signals_bot_symbol_stage_seconds', histogram,
+                                               _labels(stage=stage, symbol=symbol)))
+        lines += ['# HELP signals_bot_slow_calls_total Calls slower than the stage threshold',
+                  '# TYPE signals_bot_slow_calls_total counter']
+        lines += [f'signals_bot_slow_calls_total{{{_labels(stage=stage)}}} {histogram.slow}'
+                  for stage, histogram in sorted(stages)]
+        lines += ['# HELP signals_bot_iteration_seconds Duration of a full signal cycle',
+                  '# TYPE signals_bot_iteration_seconds histogram']
+        lines.extend(self._histogram_lines('signals_bot_iteration_seconds', self.iterations, ''))
+        lines += ['# TYPE signals_bot_last_iteration_seconds gauge',
+                  f'signals_bot_last_iteration_seconds {self.last_iteration_seconds:.6f}',
+                  '# TYPE signals_bot_iteration_overruns_total counter',
+                  f'signals_bot_iteration_overruns_total {self.overruns}']
+        return '\n'.join(lines) + '\n'
+
+    def write_metrics(self):
+        if not self.metrics_file:
+            return
+        tmp_path = self.metrics_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp_path, self.metrics_file)  # Textfile collectors never see half a file
+
+    def serve(self, port, host='127.0.0.1'):
+        instrumentation = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = instrumentation.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logging.info(f"Serving metrics on {host}:{port}")
+
+    def summary(self):
+        return {stage: {'count': histogram.count, 'mean': histogram.sum / histogram.count if histogram.count else 0,
+                        'p95': histogram.quantile(0.95), 'slow': histogram.slow}
+                for stage, histogram in self.stages.items()}
+
+    def close(self):
+        self.write_metrics()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
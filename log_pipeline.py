@@ -0,0 +1,192 @@
+# log_pipeline.py
+#
+# Non-blocking logging: callers only put records on a bounded queue, and a QueueListener thread does
+# the file and console I/O. The file gets one JSON object per line and rotates by size. Bursts of
+# the same warning or error (same logger and message up to symbols, numbers and addresses) are
+# collapsed: the first record passes, repeats within the window are counted and summarised in a
+# single record such as "Failed to get ticker 'DCR-USD' ... [x40 in 5.0s; 40 symbols: DCR-USD, ...]".
+# When the queue is full records are dropped and the drop count is reported later, so a stalled disk
+# never blocks the event loop.
+
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import threading
+
+_VARIABLE = re.compile(r'0x[0-9a-fA-F]+|\d+(?:\.\d+)?')
+# Tickers such as BTC-USD or $SYM0-USD, and quoted upper-case tokens such as 'AAPL'
+_SYMBOL = re.compile(r"\$?\b[A-Z0-9^=.]*[A-Z][A-Z0-9^=.]*-[A-Z]{3,4}\b|'\$?[A-Z0-9^=.]*[A-Z][A-Z0-9^=.-]*'")
+MAX_LISTED_SYMBOLS = 10
+
+
+def _burst_key(record):
+    # An outage logs the same error once per symbol, so symbols are not part of the key
+    message = record.getMessage()
+    return record.name, record.levelno, _VARIABLE.sub('#', _SYMBOL.sub('<symbol>', message))
+
+
+def _symbols(message):
+    return [match.strip("'") for match in _SYMBOL.findall(message)]
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {'time': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+                 'level': record.levelname, 'logger': record.name, 'message': record.getMessage()}
+        repeats = getattr(record, 'repeats', None)
+        if repeats:
+            entry['repeats'] = repeats
+        symbols = getattr(record, 'symbols', None)
+        if symbols:
+            entry['symbols'] = symbols
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DedupQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue, window=5.0, level=logging.WARNING):
+        super().__init__(log_queue)
+        self.window = window
+        self.dedup_level = level
+        self.dropped = 0
+        self._bursts = {}  # burst key -> [first record, count, symbols in order of appearance]
+        self._next_sweep = 0.0
+        self._burst_lock = threading.Lock()
+        self._exc_formatter = logging.Formatter()
+
+    def handle(self, record):
+        if not self.filter(record):
+            return False
+        summaries = []
+        with self._burst_lock:
+            if record.created >= self._next_sweep:
+                summaries = self._expire(record.created)
+                self._next_sweep = record.created + min(self.window, 1.0)
+            suppressed = False
+            if record.levelno >= self.dedup_level and self.window > 0:
+                key = _burst_key(record)
+                burst = self._bursts.get(key)
+                symbols = dict.fromkeys(_symbols(record.getMessage()))
+                if burst is None:
+                    self._bursts[key] = [record, 1, symbols]
+                else:
+                    burst[1] += 1
+                    burst[2].update(symbols)
+                    suppressed = True
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            notice = logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f"Dropped {dropped} log records: logging queue full"})
+            try:
+                self.queue.put_nowait(self.prepare(notice))
+            except queue.Full:
+                with self._burst_lock:  # Still no room; the count is carried to the next record
+                    self.dropped += dropped
+        for summary in summaries:
+            self.emit(summary)
+        if not suppressed:
+            self.emit(record)
+        return not suppressed
+
+    def _expire(self, now, everything=False):
+        # Ends the bursts whose window has passed; those with repeats become one summary record
+        summaries = []
+        for key, (first, count, symbols) in list(self._bursts.items()):
+            if everything or now - first.created >= self.window:
+                del self._bursts[key]
+                if count > 1:
+                    summary = logging.makeLogRecord(first.__dict__)
+                    detail = f"x{count} in {now - first.created:.1f}s"
+                    if len(symbols) > 1:
+                        listed = list(symbols)[:MAX_LISTED_SYMBOLS]
+                        more = f", +{len(symbols) - len(listed)} more" if len(symbols) > len(listed) else ''
+                        detail += f"; {len(symbols)} symbols: {', '.join(listed)}{more}"
+                        summary.symbols = list(symbols)
+                    summary.msg = f"{first.getMessage()} [{detail}]"
+                    summary.args = None
+                    summary.exc_info = summary.exc_text = None
+                    summary.created = now
+                    summary.msecs = int((now - int(now)) * 1000) + 0.0  # As LogRecord.__init__ derives it
+                    summary.relativeCreated = (now - logging._startTime) * 1000
+                    summary.repeats = count
+                    summaries.append(summary)
+        return summaries
+
+    def flush(self):
+        with self._burst_lock:
+            summaries = self._expire(datetime.datetime.now().timestamp(), everything=True)
+        for summary in summaries:
+            self.emit(summary)
+
+    def prepare(self, record):
+        # Renders the message and traceback on the caller's thread, where the arguments are still current
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._burst_lock:  # handle() reads and resets the count under the same lock
+                self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # Waits for room; the default put_nowait fails on a full queue
+
+
+_listener = None
+_handler = None
+
+
+def start(log_level, log_file, max_bytes=50 * 1024 * 1024, backup_count=5, queue_size=10000, dedup_window=5.0,
+          dedup_level='WARNING'):
+    global _listener, _handler
+    stop()
+    file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                                        encoding='utf-8', delay=True)
+    file_handler.setFormatter(JsonFormatter())
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    _handler = DedupQueueHandler(log_queue, dedup_window, logging.getLevelName(dedup_level))
+    _listener = _Listener(log_queue, file_handler, console)
+    root = logging.getLogger()
+    root.setLevel(log_level)
+    root.addHandler(_handler)
+    _listener.start()
+    return _handler
+
+
+def stop():
+    # Emits pending burst summaries and drains the queue before the listener thread exits
+    global _listener, _handler
+    if _handler is not None:
+        _handler.flush()
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop)
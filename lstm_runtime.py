@@ -0,0 +1,127 @@
+# lstm_runtime.py
+#
+# TensorFlow-free inference for the EnhancedMLPredictor LSTM. export() writes the trained Keras
+# weights and the MinMaxScaler parameters to one .npz file; NumpyLSTM runs the same forward pass
+# (stacked LSTM layers, then Dense) batched over windows with plain NumPy matrix products. Dropout
+# layers are identity at inference and are not exported. Training stays in TensorFlow.
+
+import argparse
+import os
+
+import numpy as np
+
+WEIGHTS_FILE = 'weights.npz'
+
+
+def _sigmoid(x):
+    return 0.5 * (np.tanh(0.5 * x) + 1)  # Overflow-free form of 1 / (1 + exp(-x))
+
+
+def export(model, scaler, path):
+    # Layers are stored in order as layer{i}_{j} arrays with their kinds alongside
+    arrays, kinds = {}, []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind == 'Dropout':
+            continue
+        if kind == 'LSTM':
+            if layer.activation.__name__ != 'tanh' or layer.recurrent_activation.__name__ != 'sigmoid':
+                raise ValueError(f"{layer.name}: only tanh/sigmoid LSTM layers can be exported")
+            if not layer.use_bias:
+                raise ValueError(f"{layer.name}: LSTM layers without a bias cannot be exported")
+        elif kind != 'Dense' or layer.activation.__name__ != 'linear':
+            raise ValueError(f"{layer.name}: cannot export {kind} layers")
+        for j, weights in enumerate(layer.get_weights()):
+            arrays[f"layer{len(kinds)}_{j}"] = weights.astype('f4')
+        kinds.append(kind.lower())
+    np.savez(path, kinds=np.array(kinds), scaler_min=np.asarray(scaler.min_, dtype='f8'),
+             scaler_scale=np.asarray(scaler.scale_, dtype='f8'), **arrays)
+
+
+class NumpyScaler:
+    # The transform half of a fitted MinMaxScaler
+    def __init__(self, min_, scale_):
+        self.min_ = min_
+        self.scale_ = scale_
+
+    def transform(self, X):
+        return X * self.scale_ + self.min_
+
+
+class NumpyLSTM:
+    def __init__(self, layers):
+        self.layers = layers  # [(kind, weights), ...]
+
+    @classmethod
+    def load(cls, path):
+        # Returns the model and its scaler
+        with np.load(path) as data:
+            layers = []
+            for i, kind in enumerate(data['kinds']):
+                n_weights = 3 if kind == 'lstm' else 2
+                layers.append((str(kind), [data[f"layer{i}_{j}"] for j in range(n_weights)]))
+            scaler = NumpyScaler(data['scaler_min'], data['scaler_scale'])
+        return cls(layers), scaler
+
+    @staticmethod
+    def _lstm(x, kernel, recurrent_kernel, bias, return_sequences):
+        # Keras gate order is input, forget, cell, output; the input projection of every step is one product
+        batch, steps, _ = x.shape
+        units = recurrent_kernel.shape[0]
+        projected = x @ kernel + bias
+        h = np.zeros((batch, units), dtype=x.dtype)
+        c = np.zeros((batch, units), dtype=x.dtype)
+        outputs = np.empty((batch, steps, units), dtype=x.dtype) if return_sequences else None
+        for t in range(steps):
+            z = projected[:, t] + h @ recurrent_kernel
+            i = _sigmoid(z[:, :units])
+            f = _sigmoid(z[:, units:2 * units])
+            g = np.tanh(z[:, 2 * units:3 * units])
+            o = _sigmoid(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+            if return_sequences:
+                outputs[:, t] = h
+        return outputs if return_sequences else h
+
+    def predict(self, windows):
+        # (batch, lookback, features) -> (batch, outputs)
+        x = np.asarray(windows, dtype='f4')
+        for index, (kind, weights) in enumerate(self.layers):
+            if kind == 'lstm':
+                # Every LSTM but the last one feeds its full sequence to the next
+                more_lstm = any(later == 'lstm' for later, _ in self.layers[index + 1:])
+                x = self._lstm(x, *weights, return_sequences=more_lstm)
+            else:
+                x = x @ weights[0] + weights[1]
+        return x
+
+
+def main():
+    # Offline step for versions saved before weights were exported alongside the Keras model
+    parser = argparse.ArgumentParser(description='Export a saved LSTM version for NumPy inference')
+    parser.add_argument('version_dir', help='e.g. models/lstm_v0003')
+    parser.add_argument('--check', action='store_true', help='Compare NumPy and Keras outputs on random windows')
+    args = parser.parse_args()
+
+    import pickle
+
+    from ml_backends import get_backend
+
+    model = get_backend('keras').load_model(os.path.join(args.version_dir, 'model.keras'))
+    with open(os.path.join(args.version_dir, 'scaler.pkl'), 'rb') as f:
+        scaler = pickle.load(f)
+    path = os.path.join(args.version_dir, WEIGHTS_FILE)
+    export(model, scaler, path)
+    print(f"Wrote {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+
+    if args.check:
+        runtime, _ = NumpyLSTM.load(path)
+        windows = np.random.default_rng(0).random((64, *model.input_shape[1:]), dtype='f4')
+        expected = model(windows, training=False).numpy()
+        error = np.abs(runtime.predict(windows) - expected).max()
+        print(f"Max abs difference from Keras over {len(windows)} windows: {error:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,137 +1,289 @@
-# main.py
-
-import asyncio
-import logging
-from data_fetcher import YFinanceDataFetcher
-from strategy import Strategy
-from risk_management import DynamicRiskManagement
-from ml_predictor import EnhancedMLPredictor
-from market_regime_detector import MarketRegimeDetector
-from utils import setup_logging, load_config
-import pandas as pd
-import time
-
-
-async def generate_signal(symbol, df, current_price, strategies, risk_management, ml_predictor, market_regime_detector):
-    if df.empty:
-        return None
-
-    regime, regime_probs = market_regime_detector.detect_regime(df['Close'])
-    ml_prediction = ml_predictor.predict(df)
-
-    signals = {}
-    for strategy_name, strategy in strategies.items():
-        signal = strategy.generate_signal(df, ml_prediction, regime)
-        if signal['action'] in ['buy', 'sell']:
-            entry_price = current_price
-            stop_loss_price = signal['stop_loss']
-            position_size = risk_management.calculate_position_size(entry_price, stop_loss_price,
-                                                                    df['Close'].pct_change().std())
-            leverage = min(risk_management.calculate_leverage(signal['action'], entry_price, stop_loss_price),
-                           config['risk_management']['max_leverage'])
-
-            explanation = f"""
-            Signal for {symbol} ({strategy_name} strategy):
-            Action: {signal['action'].upper()}
-            Entry Price: {entry_price:.2f}
-            Stop Loss: {stop_loss_price:.2f}
-            Take Profit: {signal['take_profit']:.2f}
-            Leverage: {leverage:.2f}x
-            Position Size: {position_size:.4f}
-
-            Explanation:
-            {strategy.explain_signal(df, signal, regime)}
-
-            Market Regime: {market_regime_detector.regime_description(regime)}
-            ML Prediction: {ml_prediction:.2f}
-            """
-
-            signals[strategy_name] = {
-                'action': signal['action'],
-                'entry_price': entry_price,
-                'stop_loss': stop_loss_price,
-                'take_profit': signal['take_profit'],
-                'leverage': leverage,
-                'position_size': position_size,
-                'explanation': explanation,
-                'timestamp': pd.Timestamp.now()
-            }
-
-    return signals
-
-
-async def run_bot(config):
-    data_fetcher = YFinanceDataFetcher(config)
-
-    strategies = {
-        'momentum': Strategy(config['strategy'], 'momentum'),
-        'mean_reversion': Strategy(config['strategy'], 'mean_reversion'),
-        'breakout': Strategy(config['strategy'], 'breakout')
-    }
-
-    risk_management = DynamicRiskManagement(config['risk_management'])
-    ml_predictor = EnhancedMLPredictor()
-    market_regime_detector = MarketRegimeDetector()
-
-    last_signal_time = {}
-    all_signals = []
-
-    while True:
-        for symbol in config['trading']['symbols']:
-            try:
-                current_time = pd.Timestamp.now()
-
-                # Check cooldown period
-                if symbol in last_signal_time and (current_time - last_signal_time[symbol]).total_seconds() < \
-                        config['trading']['cooldown_period']:
-                    continue
-
-                df = data_fetcher.fetch_historical_data(symbol)
-                current_price = data_fetcher.get_current_price(symbol)
-
-                if df.empty or current_price is None:
-                    logging.warning(f"No data available for {symbol}, skipping...")
-                    continue
-
-                signals = await generate_signal(symbol, df, current_price, strategies, risk_management, ml_predictor,
-                                                market_regime_detector)
-
-                if signals:
-                    for strategy_name, signal in signals.items():
-                        logging.info(f"\n{signal['explanation']}")
-                        all_signals.append({**signal, 'symbol': symbol, 'strategy': strategy_name})
-                    last_signal_time[symbol] = current_time
-                else:
-                    logging.info(f"No signals generated for {symbol}")
-
-            except Exception as e:
-                logging.error(f"Error processing {symbol}: {e}")
-
-        # Save signals to CSV
-        signals_df = pd.DataFrame(all_signals)
-        signals_df.to_csv(config['output']['signal_file'], index=False)
-
-        # Remove expired signals
-        current_time = pd.Timestamp.now()
-        all_signals = [signal for signal in all_signals if
-                       (current_time - signal['timestamp']).total_seconds() < config['trading'][
-                           'signal_validity_window']]
-
-        await asyncio.sleep(config['trading']['iteration_interval'])
-
-
-async def main():
-    global config
-    config = load_config('config.yaml')
-    setup_logging(config['logging']['level'], config['logging']['file'])
-
-    try:
-        await run_bot(config)
-    except KeyboardInterrupt:
-        logging.info("Bot stopped by user.")
-    except Exception as e:
-        logging.error(f"An unexpected error occurred: {e}")
-
-
-if __name__ == "__main__":
+# main.py
+
+import time
+
+_start_time = time.perf_counter()
+
+import argparse
+import asyncio
+import functools
+import logging
+from contextlib import aclosing
+from data_sources import WallClock, create_source
+from async_fetcher import AsyncDataFetcher
+from bar_cache import BarCache, CachedDataFetcher
+from signal_journal import SignalJournal
+from signal_record import Signal
+import feature_store
+from instrumentation import Instrumentation
+from scheduler import BarCloseScheduler
+from symbol_health import SymbolHealth
+from resampler import Resampler
+from strategy import Strategy
+from risk_management import PortfolioRisk, RiskManagement
+from ml_predictor import EnhancedMLPredictor
+from market_regime_detector import MarketRegimeDetector
+from utils import setup_logging, load_config, log_startup_stats
+
+
+async def generate_signal(symbol, df, current_price, strategies, risk_management, account_balance, ml_prediction,
+                          market_regime_detector, now):
+    if df.empty:
+        return None
+
+    regime, regime_probs = market_regime_detector.detect_regime(df['Close'], symbol)
+
+    signals = {}
+    for strategy_name, strategy in strategies.items():
+        signal = strategy.generate_signal(df, ml_prediction, regime)
+        if signal['action'] in ['buy', 'sell']:
+            entry_price = current_price
+            stop_loss_price = signal['stop_loss']
+            position_size = risk_management.calculate_position_size(account_balance, entry_price, stop_loss_price)
+            leverage = risk_management.calculate_leverage(df['Close'].pct_change().std())
+
+            # Only scalars are bound, so a pending explanation does not keep the frame alive; it is rendered
+            # only if the full signal text is logged at DEBUG or exported
+            signals[strategy_name] = Signal(symbol, signal['action'], entry_price, stop_loss_price,
+                                            signal['take_profit'], leverage, position_size, strategy=strategy_name,
+                                            ml_prediction=ml_prediction,
+                                            regime=market_regime_detector.regime_description(regime), timestamp=now,
+                                            explain=functools.partial(strategy.explain_signal, len(df), dict(signal),
+                                                                      regime))
+
+    return signals
+
+
+async def retrain_model(trainer, predictor, frames):
+    # Trains on a separate predictor in a worker thread, so the serving one keeps predicting until the new
+    # version is saved. The version is read in the worker too, but swapped in here on the event loop, between
+    # two predict_batch calls. Returns False when training failed
+    loop = asyncio.get_running_loop()
+    try:
+        version = await loop.run_in_executor(None, trainer.maybe_retrain, frames)
+        if version is not None:
+            loaded = await loop.run_in_executor(None, predictor.read_version, version)
+            if loaded is None:
+                raise ValueError(f"version {version} does not match the serving predictor")
+            predictor.install(loaded)
+            logging.info(f"Serving retrained LSTM version {version}")
+        return True
+    except Exception as e:
+        logging.error(f"LSTM retraining failed: {e}")
+        return False
+
+
+async def run_bot(config, max_iterations=None, dry_run=False):
+    instrumentation_config = dict(config.get('instrumentation', {}))
+    instrumentation_config.setdefault('iteration_budget', config['trading']['iteration_interval'])
+    instrumentation = Instrumentation(instrumentation_config)
+
+    data_source = create_source(config)
+    clock = data_source.clock or WallClock()
+    await data_source.start()
+    source = data_source
+    features = feature_store.configure(config)
+    instrumentation.wrap(source, 'download_history', 'fetch_history')
+    instrumentation.wrap(source, 'download_current_price', 'fetch_price')
+    if config.get('cache', {}).get('enabled', False) and source.cacheable:
+        bar_cache = BarCache(config['cache']['directory'], config['cache'].get('max_bars'))
+        source = CachedDataFetcher(source, bar_cache, config)
+    health = SymbolHealth(config, clock)
+    data_fetcher = AsyncDataFetcher(source, config, health)
+    logging.info(health.summary(config['trading']['symbols']))
+
+    resampler = Resampler.from_config(config)
+    strategies = {
+        'momentum': Strategy(config['strategy'], 'momentum', resampler),
+        'mean_reversion': Strategy(config['strategy'], 'mean_reversion', resampler),
+        'breakout': Strategy(config['strategy'], 'breakout', resampler)
+    }
+
+    risk_management = RiskManagement(config['risk_management'])
+    account_balance = config['risk_management'].get('account_balance', 10000)
+    portfolio_risk = PortfolioRisk(config['risk_management'], config['trading']['symbols'],
+                                   config['data_parameters']['timeframe'])
+    ml_config = dict(config.get('ml', {}))
+    ml_predictor = ml_trainer = retrain_task = None
+    retrain_backoff = ml_config.pop('retrain_backoff', 3600)
+    retrain_after = 0.0
+    if ml_config.pop('enabled', True):
+        ml_predictor = EnhancedMLPredictor(lookback=config['strategy']['lstm_lookback'], **ml_config)
+        ml_trainer = EnhancedMLPredictor(lookback=config['strategy']['lstm_lookback'], **ml_config)
+    market_regime_detector = MarketRegimeDetector(**config.get('regime_detection', {}))
+    instrumentation.wrap(market_regime_detector, 'detect_regime', 'regime')
+    if ml_predictor is not None:
+        instrumentation.wrap(ml_predictor, 'predict_batch', 'ml_predict', symbol_arg=None)
+    for strategy in strategies.values():
+        instrumentation.wrap(strategy, 'generate_signal', 'strategy', symbol_arg=None)
+
+    output_config = config['output']
+    journal = None
+    if not dry_run:
+        journal = SignalJournal(output_config['signal_journal'],
+                                segment_max_bytes=output_config.get('journal_segment_bytes', 16 * 1024 * 1024),
+                                fsync=output_config.get('journal_fsync', 'commit'),
+                                validity_window=config['trading']['signal_validity_window'], clock=clock)
+
+    scheduler = BarCloseScheduler(config, instrumentation, clock,
+                                  bar_source=data_source if data_source.streaming else None)
+    last_signal_time = {}
+
+    iteration = 0
+    while max_iterations is None or iteration < max_iterations:
+        iteration += 1
+        cycle = await scheduler.next_cycle(immediate=dry_run)
+
+        with instrumentation.iteration():
+            # Check cooldown period, in the source's time so replayed runs cool down in replayed bars
+            current_time = clock.now()
+            due_symbols = [symbol for symbol in config['trading']['symbols']
+                           if symbol not in last_signal_time or
+                           (current_time - last_signal_time[symbol]).total_seconds()
+                           >= config['trading']['cooldown_period']]
+            # Symbols that keep failing stay out until their backoff expires, so the cycle's budget goes elsewhere
+            healthy = health.due(due_symbols)
+            if len(healthy) < len(due_symbols):
+                logging.debug(f"Skipping {len(due_symbols) - len(healthy)} backed-off or quarantined symbols")
+            due_symbols = scheduler.order(healthy)
+
+            seen = set()
+            frames = {}
+            prices = {}
+            candidates = []
+
+            async def process(symbol, ml_prediction):
+                start = time.perf_counter()
+                try:
+                    with instrumentation.timer('signal', symbol):
+                        signals = await generate_signal(symbol, frames[symbol], prices[symbol], strategies,
+                                                        risk_management, account_balance, ml_prediction,
+                                                        market_regime_detector, clock.now())
+                    if signals:
+                        candidates.extend(signals.values())
+                    else:
+                        logging.info(f"No signals generated for {symbol}")
+                except Exception as e:
+                    logging.error(f"Error processing {symbol}: {e}")
+                finally:
+                    cycle.record(symbol, time.perf_counter() - start)
+
+            async with aclosing(data_fetcher.stream(due_symbols)) as stream:
+                async for symbol, df, current_price in stream:
+                    if cycle.expired():
+                        # Closing the stream cancels the fetches still in flight
+                        cycle.defer([pending for pending in due_symbols if pending not in seen])
+                        break
+                    seen.add(symbol)
+                    if df.empty or current_price is None:
+                        logging.warning(f"No data available for {symbol}, skipping...")
+                        continue
+                    frames[symbol] = df
+                    prices[symbol] = current_price
+                    resampler.update(symbol, df, clock.now())
+                    if ml_predictor is None:
+                        await process(symbol, 0.0)  # Without a model, analysis starts on each symbol's arrival
+
+            if ml_predictor is not None and frames:
+                # One batched forward pass over every fetched symbol, then the per-symbol analysis
+                try:
+                    ml_predictions = ml_predictor.predict_batch(frames)
+                except Exception as e:
+                    logging.error(f"ML prediction failed: {e}")
+                    ml_predictions = {}
+                for position, symbol in enumerate(frames):
+                    if cycle.expired():
+                        cycle.defer(list(frames)[position:])
+                        break
+                    await process(symbol, ml_predictions.get(symbol, 0.0))
+
+            # Candidates are sized together against the positions still open from earlier signals
+            with instrumentation.timer('portfolio_risk'):
+                now = clock.now()
+                portfolio_risk.update(frames, now)
+                open_positions = [Signal.from_dict(record) for record in journal.active(now)] if journal else []
+                scale, risk_report = portfolio_risk.scale(candidates, open_positions)
+            logging.info(f"Portfolio VaR {risk_report['parametric_var']:.2f} parametric / "
+                         f"{risk_report['historical_var']:.2f} historical of a {risk_report['var_budget']:.2f} budget, "
+                         f"gross exposure {risk_report['gross_exposure']:.2f}")
+
+            logging.debug(f"Feature store: {features.stats()}")
+            for signal in candidates:
+                logging.info("%r", signal)
+                logging.debug("\n%s", signal)
+                last_signal_time[signal.symbol] = signal.time
+            if journal is not None:
+                with instrumentation.timer('journal'):
+                    journal.append(candidates)
+                with instrumentation.timer('journal_commit'):
+                    journal.commit()
+                expired = journal.expire(now)
+                if expired:
+                    logging.debug(f"{len(expired)} signals expired")
+
+        scheduler.finish(cycle)
+        health.save()
+
+        # Retraining runs in the background; a failed attempt is retried after retrain_backoff seconds
+        if ml_trainer is not None and not dry_run and frames:
+            if retrain_task is not None and retrain_task.done():
+                if not retrain_task.result():
+                    retrain_after = time.monotonic() + retrain_backoff
+                retrain_task = None
+            if retrain_task is None and time.monotonic() >= retrain_after:
+                retrain_task = asyncio.ensure_future(retrain_model(ml_trainer, ml_predictor, dict(frames)))
+
+    if retrain_task is not None:
+        # A training thread cannot be interrupted; it finishes in the background, but nothing is swapped in
+        retrain_task.cancel()
+        try:
+            await retrain_task
+        except asyncio.CancelledError:
+            pass
+
+    logging.info(health.summary(config['trading']['symbols']))
+    if journal is not None:
+        journal.close()
+    await data_source.stop()
+    instrumentation.close()
+
+
+def check_config(config):
+    required = [('data_parameters', 'timeframe'), ('data_parameters', 'history_length'), ('strategy', 'lstm_lookback'),
+                ('risk_management', 'max_leverage'), ('trading', 'symbols'), ('trading', 'iteration_interval'),
+                ('output', 'signal_journal')]
+    missing = [f"{section}.{key}" for section, key in required if key not in config.get(section, {})]
+    if missing:
+        logging.error(f"Config is missing: {', '.join(missing)}")
+        return False
+    logging.info(f"Config OK: {len(config['trading']['symbols'])} symbols, "
+                 f"ML {'enabled' if config.get('ml', {}).get('enabled', True) else 'disabled'}")
+    return True
+
+
+async def main():
+    global config
+    parser = argparse.ArgumentParser(description='Signals bot')
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--check-config', action='store_true', help='Validate the config and exit')
+    parser.add_argument('--dry-run', action='store_true', help='Run a single iteration without writing signals')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    setup_logging(config['logging']['level'], config['logging']['file'], config['logging'])
+    log_startup_stats(_start_time)
+
+    if args.check_config:
+        check_config(config)
+        return
+
+    try:
+        await run_bot(config, max_iterations=1 if args.dry_run else None, dry_run=args.dry_run)
+    except KeyboardInterrupt:
+        logging.info("Bot stopped by user.")
+    except Exception as e:
+        logging.error(f"An unexpected error occurred: {e}")
+
+
+if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -1,32 +1,111 @@
-import numpy as np
-from sklearn.mixture import GaussianMixture
-
-class MarketRegimeDetector:
-    def __init__(self, n_regimes=3, lookback_period=100):
-        self.n_regimes = n_regimes
-        self.lookback_period = lookback_period
-        self.gmm = GaussianMixture(n_components=n_regimes, random_state=42)
-
-    def detect_regime(self, price_data):
-        returns = np.diff(np.log(price_data[-self.lookback_period:]))
-        volatility = np.std(returns) * np.sqrt(252)  # Annualized volatility
-
-        features = np.column_stack((returns, volatility))
-        self.gmm.fit(features)
-
-        current_features = np.array([[returns[-1], volatility]])
-        current_regime = self.gmm.predict(current_features)[0]
-
-        regime_probabilities = self.gmm.predict_proba(current_features)[0]
-
-        return current_regime, regime_probabilities
-
-    def get_regime_parameters(self):
-        means = self.gmm.means_
-        covariances = self.gmm.covariances_
-        weights = self.gmm.weights_
-        return means, covariances, weights
-
-    def regime_description(self, regime):
-        descriptions = ['Low Volatility', 'Medium Volatility', 'High Volatility']
-        return descriptions[regime]
\ No newline at end of file
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ml_backends import get_backend
+
+
+class _RegimeModel:
+    def __init__(self, gmm):
+        self.gmm = gmm
+        self.rank = None  # component -> regime, ordered by volatility
+        self.baseline_loglik = None
+        self.calls_since_fit = 0
+        self.n_fits = 0
+        self.filtered = None
+
+
+class MarketRegimeDetector:
+    def __init__(self, n_regimes=3, lookback_period=100, volatility_window=20, refit_every=96, loglik_drift=2.0,
+                 online_filter=False, stickiness=0.95):
+        self.n_regimes = n_regimes
+        self.lookback_period = lookback_period
+        self.volatility_window = volatility_window
+        self.refit_every = refit_every
+        self.loglik_drift = loglik_drift
+        self.online_filter = online_filter
+        self.stickiness = stickiness
+        self.models = {}
+        self.gmm = None  # Model used by the last detect_regime call
+
+    def _feature_rows(self, returns):
+        # Rolling (annualised) volatility per bar, aligned with that bar's return
+        volatility = sliding_window_view(returns, self.volatility_window).std(axis=1) * np.sqrt(252)
+        return np.column_stack((returns[self.volatility_window - 1:], volatility))
+
+    def _features(self, price_data):
+        prices = np.asarray(price_data[-(self.lookback_period + self.volatility_window):], dtype=float)
+        returns = np.diff(np.log(prices))
+        if len(returns) < self.volatility_window + self.n_regimes:
+            raise ValueError(f"Not enough data for regime detection: {len(prices)} prices")
+        return self._feature_rows(returns)[-self.lookback_period:]
+
+    def _fit(self, state, features):
+        # warm_start reuses the previous means/covariances as the starting point of EM
+        state.gmm.fit(features)
+        state.rank = np.argsort(np.argsort(state.gmm.means_[:, 1]))
+        state.baseline_loglik = state.gmm.score(features)
+        state.calls_since_fit = 0
+        state.n_fits += 1
+        state.filtered = None
+
+    def _needs_refit(self, state, features):
+        if state.rank is None or state.calls_since_fit >= self.refit_every:
+            return True
+        recent = features[-self.volatility_window:]
+        return state.baseline_loglik - state.gmm.score(recent) > self.loglik_drift
+
+    def _transition_matrix(self):
+        off_diagonal = (1 - self.stickiness) / max(self.n_regimes - 1, 1)
+        matrix = np.full((self.n_regimes, self.n_regimes), off_diagonal)
+        np.fill_diagonal(matrix, self.stickiness)
+        return matrix
+
+    def detect_regime(self, price_data, symbol=None):
+        features = self._features(price_data)
+
+        state = self.models.get(symbol)
+        if state is None:
+            gmm = get_backend('sklearn').GaussianMixture(n_components=self.n_regimes, random_state=42,
+                                                         warm_start=True)
+            state = self.models[symbol] = _RegimeModel(gmm)
+        if self._needs_refit(state, features):
+            self._fit(state, features)
+        else:
+            state.calls_since_fit += 1
+        self.gmm = state.gmm
+
+        component_probs = state.gmm.predict_proba(features[-1:])[0]
+        regime_probabilities = np.empty(self.n_regimes)
+        regime_probabilities[state.rank] = component_probs
+
+        if self.online_filter:
+            # One forward step of an HMM with sticky transitions, using the GMM components as emissions
+            weights = np.empty(self.n_regimes)
+            weights[state.rank] = state.gmm.weights_
+            prior = (np.full(self.n_regimes, 1 / self.n_regimes) if state.filtered is None
+                     else self._transition_matrix().T @ state.filtered)
+            posterior = regime_probabilities / weights * prior
+            state.filtered = regime_probabilities = posterior / posterior.sum()
+
+        current_regime = int(np.argmax(regime_probabilities))
+        return current_regime, regime_probabilities
+
+    def label_history(self, price_data, symbol=None):
+        # Regime of every bar of a long history under the symbol's current model, with the log return of that
+        # bar; the first volatility_window - 1 returns have no label and are dropped
+        self.detect_regime(price_data, symbol)
+        state = self.models[symbol]
+        returns = np.diff(np.log(np.asarray(price_data, dtype=float)))
+        return state.rank[state.gmm.predict(self._feature_rows(returns))], returns[self.volatility_window - 1:]
+
+    def get_regime_parameters(self, symbol=None):
+        state = self.models.get(symbol)
+        gmm = state.gmm if state is not None else self.gmm
+        if gmm is None:
+            raise ValueError(f"No regime model for {symbol}: call detect_regime first")
+        order = np.argsort(state.rank) if state is not None else np.arange(self.n_regimes)
+        return gmm.means_[order], gmm.covariances_[order], gmm.weights_[order]
+
+    def regime_description(self, regime):
+        descriptions = ['Low Volatility', 'Medium Volatility', 'High Volatility']
+        return descriptions[regime]
@@ -0,0 +1,60 @@
+# ml_backends.py
+#
+# Heavy ML libraries are imported on first use through this registry, so runs that never touch
+# a model (config checks, dry runs, ML disabled) do not pay for TensorFlow or scikit-learn.
+
+import logging
+import time
+from types import SimpleNamespace
+
+from utils import current_rss_mb
+
+_loaders = {}
+_backends = {}
+import_stats = {}
+
+
+def register_backend(name, loader):
+    _loaders[name] = loader
+
+
+def get_backend(name):
+    if name not in _backends:
+        if name not in _loaders:
+            raise KeyError(f"Unknown ML backend: {name}")
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        _backends[name] = _loaders[name]()
+        elapsed = time.perf_counter() - start
+        rss_after = current_rss_mb()
+        import_stats[name] = {'import_seconds': elapsed, 'rss_delta_mb': rss_after - rss_before}
+        logging.info(f"Loaded ML backend '{name}' in {elapsed:.2f}s (RSS +{rss_after - rss_before:.0f} MB)")
+    return _backends[name]
+
+
+def is_loaded(name):
+    return name in _backends
+
+
+def _load_keras():
+    from tensorflow.keras.models import Sequential, load_model
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+    from tensorflow.keras.optimizers import Adam
+    return SimpleNamespace(Sequential=Sequential, load_model=load_model, LSTM=LSTM, Dense=Dense,
+                           Dropout=Dropout, Adam=Adam)
+
+
+def _load_sklearn():
+    from sklearn.mixture import GaussianMixture
+    from sklearn.preprocessing import MinMaxScaler
+    return SimpleNamespace(GaussianMixture=GaussianMixture, MinMaxScaler=MinMaxScaler)
+
+
+def _load_numpy():
+    from lstm_runtime import NumpyLSTM, export
+    return SimpleNamespace(NumpyLSTM=NumpyLSTM, export=export)
+
+
+register_backend('keras', _load_keras)
+register_backend('sklearn', _load_sklearn)
+register_backend('numpy', _load_numpy)
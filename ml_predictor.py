@@ -1,47 +1,217 @@
-import numpy as np
-import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, Dropout
-from tensorflow.keras.optimizers import Adam
-
-class EnhancedMLPredictor:
-    def __init__(self, lookback=60, features=['open', 'high', 'low', 'close', 'volume']):
-        self.lookback = lookback
-        self.features = features
-        self.model = self._build_lstm_model()
-        self.scaler = MinMaxScaler()
-
-    def _build_lstm_model(self):
-        model = Sequential([
-            LSTM(100, return_sequences=True, input_shape=(self.lookback, len(self.features))),
-            Dropout(0.2),
-            LSTM(100, return_sequences=False),
-            Dropout(0.2),
-            Dense(1)
-        ])
-        model.compile(optimizer=Adam(learning_rate=0.001), loss='mse')
-        return model
-
-    def prepare_data(self, df):
-        df_featured = self._engineer_features(df)
-        X = df_featured[self.features].values
-        y = df_featured['close'].shift(-1).values[:-1]
-        X = X[:-1]
-
-        X_scaled = self.scaler.fit_transform(X)
-        X_seq = np.array([X_scaled[i-self.lookback:i] for i in range(self.lookback, len(X_scaled))])
-        y_seq = y[self.lookback-1:]
-
-        return X_seq, y_seq
-
-    def _engineer_features(self, df):
-        df = df.copy()
-        df['MA_10'] = df['close'].rolling(window=10).mean()
-        df['RSI'] = self._calculate_rsi(df['close'])
-        df['MACD'] = self._calculate_macd(df['close'])
-        return df
-
-    def _calculate_rsi(self, prices, period=14):
-        delta = prices.diff()
-        gain
\ No newline at end of file
+import json
+import logging
+import os
+import pickle
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from feature_store import frame_key, shared_store
+from lstm_runtime import WEIGHTS_FILE
+from ml_backends import get_backend
+
+# Engineered feature name -> feature store indicator and parameters
+ENGINEERED_FEATURES = {'MA_10': ('sma', {'window': 10}), 'RSI': ('rsi', {'period': 14}),
+                       'MACD': ('macd', {'fast': 12, 'slow': 26})}
+
+class EnhancedMLPredictor:
+    def __init__(self, lookback=60, features=['open', 'high', 'low', 'close', 'volume'], model_dir='models',
+                 max_model_age=7 * 24 * 3600, drift_threshold=0.25, epochs=10, batch_size=64, feature_store=None,
+                 runtime='numpy'):
+        self.lookback = lookback
+        self.features = features
+        self.model_dir = model_dir
+        self.max_model_age = max_model_age
+        self.drift_threshold = drift_threshold
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.feature_store = feature_store if feature_store is not None else shared_store()
+        self.runtime = runtime  # 'numpy' serves exported weights without TensorFlow; 'keras' loads the full model
+
+        # Loaded lazily from the newest saved version on first use
+        self._model = None
+        self._numpy_model = False
+        self.scaler = None
+        self.metadata = None
+
+    @property
+    def model(self):
+        if self._model is None and not self.load():
+            self._model = self._build_lstm_model()
+        return self._model
+
+    def _build_lstm_model(self):
+        keras = get_backend('keras')
+        model = keras.Sequential([
+            keras.LSTM(100, return_sequences=True, input_shape=(self.lookback, len(self.features))),
+            keras.Dropout(0.2),
+            keras.LSTM(100, return_sequences=False),
+            keras.Dropout(0.2),
+            keras.Dense(1)
+        ])
+        model.compile(optimizer=keras.Adam(learning_rate=0.001), loss='mse')
+        return model
+
+    def _version_dir(self, version):
+        return os.path.join(self.model_dir, f"lstm_v{version:04d}")
+
+    def _versions(self):
+        if not os.path.isdir(self.model_dir):
+            return []
+        return sorted(int(name[len('lstm_v'):]) for name in os.listdir(self.model_dir)
+                      if name.startswith('lstm_v') and
+                      os.path.exists(os.path.join(self.model_dir, name, 'metadata.json')))
+
+    def read_version(self, version=None):
+        # Reads a saved version without touching the one being served; returns None if none fits
+        versions = self._versions()
+        if not versions:
+            return None
+        version = versions[-1] if version is None else version
+
+        path = self._version_dir(version)
+        with open(os.path.join(path, 'metadata.json')) as f:
+            metadata = json.load(f)
+        if metadata['lookback'] != self.lookback or metadata['features'] != self.features:
+            return None
+        weights = os.path.join(path, WEIGHTS_FILE)
+        if self.runtime == 'numpy' and os.path.exists(weights):
+            model, scaler = get_backend('numpy').NumpyLSTM.load(weights)
+            return model, scaler, True, metadata
+        if self.runtime == 'numpy':
+            logging.warning(f"No {WEIGHTS_FILE} in {path}; loading the Keras model (export it with lstm_runtime.py)")
+        with open(os.path.join(path, 'scaler.pkl'), 'rb') as f:
+            scaler = pickle.load(f)
+        return get_backend('keras').load_model(os.path.join(path, 'model.keras')), scaler, False, metadata
+
+    def install(self, loaded):
+        # Swaps in a read_version() result as one step, so predictions never mix two versions' model and scaler
+        self._model, self.scaler, self._numpy_model, self.metadata = loaded
+
+    def load(self, version=None):
+        loaded = self.read_version(version)
+        if loaded is None:
+            return False
+        self.install(loaded)
+        return True
+
+    def save(self, n_samples):
+        version = (self._versions() or [0])[-1] + 1
+        path = self._version_dir(version)
+        os.makedirs(path, exist_ok=True)
+        self._model.save(os.path.join(path, 'model.keras'))
+        with open(os.path.join(path, 'scaler.pkl'), 'wb') as f:
+            pickle.dump(self.scaler, f)
+        get_backend('numpy').export(self._model, self.scaler, os.path.join(path, WEIGHTS_FILE))
+
+        self.metadata = {
+            'version': version,
+            'trained_at': time.time(),
+            'lookback': self.lookback,
+            'features': self.features,
+            'n_samples': n_samples,
+        }
+        # metadata.json is written last and marks the version as complete
+        with open(os.path.join(path, 'metadata.json'), 'w') as f:
+            json.dump(self.metadata, f)
+        return version
+
+    def _feature_matrix(self, df, symbol=None):
+        # Raw columns are read in either case; engineered ones come from the feature store
+        columns = {column.lower(): column for column in df.columns}
+        key = frame_key(df, symbol)
+        return np.column_stack([df[columns[feature]].to_numpy(dtype='f8') if feature in columns
+                                else self.feature_store.get(df, ENGINEERED_FEATURES[feature][0], key,
+                                                            **ENGINEERED_FEATURES[feature][1])
+                                for feature in self.features])
+
+    def _windows(self, X_scaled):
+        # Zero-copy (n_windows, lookback, n_features) view over the scaled feature rows
+        return sliding_window_view(X_scaled, self.lookback, axis=0).transpose(0, 2, 1)
+
+    def prepare_data(self, df, fit=False, symbol=None):
+        X = self._feature_matrix(df, symbol)
+        if fit or self.scaler is None:
+            self.scaler = get_backend('sklearn').MinMaxScaler()
+            self.scaler.fit(X)
+        X_scaled = self.scaler.transform(X)
+
+        # The window ending at bar t is labelled with the scaled close of bar t + 1
+        close_idx = self.features.index('close')
+        X_seq = self._windows(X_scaled)[:-1]
+        y_seq = X_scaled[self.lookback:, close_idx]
+
+        return X_seq, y_seq
+
+    def train(self, dfs):
+        frames = {symbol: df for symbol, df in dfs.items() if len(df) > self.lookback + 1}
+        if not frames:
+            return None
+
+        self.scaler = get_backend('sklearn').MinMaxScaler()
+        self.scaler.fit(np.vstack([self._feature_matrix(df, symbol) for symbol, df in frames.items()]))
+        prepared = [self.prepare_data(df, symbol=symbol) for symbol, df in frames.items()]
+        X = np.concatenate([X_seq for X_seq, _ in prepared])
+        y = np.concatenate([y_seq for _, y_seq in prepared])
+
+        self._model = self._build_lstm_model()
+        self._numpy_model = False
+        self._model.fit(X, y, epochs=self.epochs, batch_size=self.batch_size, verbose=0)
+        version = self.save(len(X))
+        if self.runtime == 'numpy':
+            self.load(version)  # Serve the exported weights, exactly as a freshly started process would
+        return version
+
+    def needs_retraining(self, dfs):
+        if self._model is None and not self.load():
+            return True
+        if time.time() - self.metadata['trained_at'] > self.max_model_age:
+            return True
+
+        # Drift: share of recent scaled feature values that fall outside the range seen in training
+        recent = [self.scaler.transform(self._feature_matrix(df, symbol)[-self.lookback:])
+                  for symbol, df in dfs.items() if len(df) >= self.lookback]
+        if not recent:
+            return False
+        recent = np.vstack(recent)
+        out_of_range = np.mean((recent < 0) | (recent > 1))
+        return out_of_range > self.drift_threshold
+
+    def maybe_retrain(self, dfs):
+        if self.needs_retraining(dfs):
+            return self.train(dfs)
+        return None
+
+    def predict_batch(self, dfs):
+        # One forward pass for every symbol; returns the expected relative move of the next close
+        if self._model is None and not self.load():
+            return {symbol: 0.0 for symbol in dfs}  # Nothing trained yet
+
+        symbols, windows, last_closes = [], [], []
+        for symbol, df in dfs.items():
+            if len(df) < self.lookback:
+                continue
+            X = self._feature_matrix(df, symbol)[-self.lookback:]
+            symbols.append(symbol)
+            windows.append(self.scaler.transform(X))
+            last_closes.append(X[-1, self.features.index('close')])
+
+        predictions = {symbol: 0.0 for symbol in dfs}
+        if not symbols:
+            return predictions
+
+        close_idx = self.features.index('close')
+        windows = np.stack(windows)
+        if self._numpy_model:
+            scaled = self._model.predict(windows)[:, 0]
+        else:
+            scaled = self._model(windows, training=False).numpy()[:, 0]
+        predicted_close = (scaled - self.scaler.min_[close_idx]) / self.scaler.scale_[close_idx]
+        last_closes = np.array(last_closes)
+        for symbol, change in zip(symbols, (predicted_close - last_closes) / last_closes):
+            predictions[symbol] = float(change)
+        return predictions
+
+    def predict(self, df, symbol=None):
+        return self.predict_batch({symbol: df})[symbol]
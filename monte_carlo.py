@@ -0,0 +1,224 @@
+# monte_carlo.py
+#
+# Monte Carlo paths of per-bar log returns, resampled from history: circular block bootstrap, or
+# regime-conditioned sampling where a Markov chain over the MarketRegimeDetector regimes picks which
+# historical bars each step draws from. Paths are generated in chunks of bounded size from a seeded
+# generator, and reduced to stop-loss/take-profit odds, drawdown and tail-loss distributions and a
+# growth-optimal Kelly fraction.
+
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+from bar_cache import BarCache
+from market_regime_detector import MarketRegimeDetector
+from utils import load_config
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def aligned_closes(frames):
+    # Closes of several symbols on the union of their bars; bars missing for a symbol count as flat
+    closes = pd.DataFrame({symbol: df['Close'] if 'Close' in df else df['close'] for symbol, df in frames.items()})
+    return closes.sort_index().ffill().bfill()
+
+
+def log_returns(closes):
+    # One-bar log returns of aligned closes; row i is the move into bar i + 1
+    return np.log(closes).diff().iloc[1:]
+
+
+def transition_matrix(labels, n_regimes):
+    # Empirical regime transitions with add-one smoothing, so every regime can be left
+    counts = np.ones((n_regimes, n_regimes))
+    np.add.at(counts, (labels[:-1], labels[1:]), 1)
+    return counts / counts.sum(axis=1, keepdims=True)
+
+
+def max_drawdowns(log_paths):
+    cumulative = np.cumsum(log_paths, axis=1)
+    peak = np.maximum.accumulate(np.maximum(cumulative, 0.0), axis=1)  # The path starts at equity 1
+    return 1 - np.exp((cumulative - peak).min(axis=1))
+
+
+def equity_drawdowns(equity):
+    # Same as max_drawdowns for paths given as equity relative to a start of 1
+    peak = np.maximum.accumulate(np.maximum(equity, 1.0), axis=1)
+    return 1 - (equity / peak).min(axis=1)
+
+
+def _distribution(values):
+    return {'mean': float(values.mean()), **{f"p{int(q * 100)}": float(np.quantile(values, q)) for q in QUANTILES}}
+
+
+class MonteCarloSimulator:
+    def __init__(self, config=None):
+        max_leverage = (config or {}).get('risk_management', {}).get('max_leverage')
+        config = (config or {}).get('monte_carlo', {})
+        self.n_paths = config.get('n_paths', 10000)
+        self.horizon = config.get('horizon', 96)  # Bars
+        self.block_size = config.get('block_size', 16)
+        self.chunk_size = config.get('chunk_size', 2000)  # Paths generated at once; bounds memory
+        self.confidence = config.get('confidence', 0.99)
+        self.max_kelly_fraction = config.get('max_kelly_fraction', 1.0)  # Above 1 means leverage
+        if max_leverage is not None:
+            self.max_kelly_fraction = min(self.max_kelly_fraction, max_leverage)
+        self.seed = config.get('seed', 42)
+
+    def _chunks(self, seed):
+        # One child generator per chunk, so results depend only on the seed, n_paths and chunk_size
+        seed = self.seed if seed is None else seed
+        sizes = [min(self.chunk_size, self.n_paths - start) for start in range(0, self.n_paths, self.chunk_size)]
+        return zip(sizes, (np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(len(sizes))))
+
+    def bootstrap_paths(self, returns, n_paths, rng):
+        # Circular block bootstrap; keeps volatility clustering within a block and, for 2-D returns, the
+        # cross-sectional correlation of each bar
+        returns = np.asarray(returns)
+        n_blocks = -(-self.horizon // self.block_size)
+        starts = rng.integers(len(returns), size=(n_paths, n_blocks))
+        rows = (starts[:, :, None] + np.arange(self.block_size)) % len(returns)
+        return returns[rows.reshape(n_paths, -1)[:, :self.horizon]]
+
+    def regime_paths(self, returns, labels, start_regime, n_paths, rng, n_regimes=None):
+        # labels[i] is the regime of the i-th of the last len(labels) bars of returns
+        returns = np.asarray(returns)[-len(labels):]
+        n_regimes = n_regimes or int(labels.max()) + 1
+        cumulative = np.cumsum(transition_matrix(labels, n_regimes), axis=1)
+        pools = [np.flatnonzero(labels == regime) for regime in range(n_regimes)]
+
+        regimes = np.empty((n_paths, self.horizon), dtype=np.intp)
+        state = np.full(n_paths, start_regime, dtype=np.intp)
+        for t in range(self.horizon):
+            state = np.minimum((cumulative[state] < rng.random(n_paths)[:, None]).sum(axis=1), n_regimes - 1)
+            regimes[:, t] = state
+
+        rows = np.empty((n_paths, self.horizon), dtype=np.intp)
+        for regime, pool in enumerate(pools):
+            mask = regimes == regime
+            # A regime never seen in history falls back to the whole sample
+            pool = pool if len(pool) else np.arange(len(returns))
+            rows[mask] = pool[rng.integers(len(pool), size=int(mask.sum()))]
+        return returns[rows]
+
+    def paths(self, returns, labels=None, start_regime=None, weights=None, seed=None):
+        # Yields chunks of (paths, horizon) log returns; 2-D returns are combined with portfolio weights
+        for size, rng in self._chunks(seed):
+            if labels is None:
+                chunk = self.bootstrap_paths(returns, size, rng)
+            else:
+                chunk = self.regime_paths(returns, labels, start_regime, size, rng)
+            if chunk.ndim == 3:
+                # Weights apply to simple returns; the result is turned back into a log return
+                chunk = np.log1p(np.expm1(chunk) @ np.asarray(weights, dtype=float))
+            yield chunk
+
+    def simulate_trade(self, returns, direction, stop_loss_pct, take_profit_pct, labels=None, start_regime=None,
+                       seed=None):
+        # Close-to-close paths of one position; intrabar touches between closes are not seen
+        outcomes, drawdowns = [], []
+        stop_hits = take_hits = 0
+        for chunk in self.paths(returns, labels, start_regime, seed=seed):
+            # Simple return of the position: a short gains what the price loses, not the negated log return
+            pnl = direction * np.expm1(np.cumsum(chunk, axis=1))
+            stopped = pnl <= -stop_loss_pct
+            taken = pnl >= take_profit_pct
+            first_stop = np.where(stopped.any(axis=1), stopped.argmax(axis=1), self.horizon)
+            first_take = np.where(taken.any(axis=1), taken.argmax(axis=1), self.horizon)
+
+            stop_first = (first_stop < self.horizon) & (first_stop <= first_take)
+            take_first = (first_take < self.horizon) & ~stop_first
+            stop_hits += int(stop_first.sum())
+            take_hits += int(take_first.sum())
+            outcome = pnl[:, -1].copy()
+            outcome[stop_first] = -stop_loss_pct
+            outcome[take_first] = take_profit_pct
+            outcomes.append(outcome)
+
+            # Drawdown up to the exit bar; equity stays at its exit value afterwards
+            exit_bar = np.minimum(first_stop, first_take)
+            bars = np.minimum(np.arange(self.horizon), exit_bar[:, None])
+            drawdowns.append(equity_drawdowns(1 + np.take_along_axis(pnl, bars, axis=1)))
+
+        outcomes, drawdowns = np.concatenate(outcomes), np.concatenate(drawdowns)
+        return {
+            'paths': len(outcomes),
+            'stop_loss_probability': stop_hits / len(outcomes),
+            'take_profit_probability': take_hits / len(outcomes),
+            'expected_return': float(outcomes.mean()),
+            'kelly_fraction': self.kelly_fraction(outcomes, self.max_kelly_fraction),
+            'drawdown': _distribution(drawdowns),
+            **self._tail(outcomes),
+        }
+
+    def simulate_portfolio(self, returns, weights, labels=None, start_regime=None, seed=None):
+        horizon_returns, drawdowns = [], []
+        for chunk in self.paths(returns, labels, start_regime, weights, seed):
+            horizon_returns.append(np.expm1(chunk.sum(axis=1)))
+            drawdowns.append(max_drawdowns(chunk))
+        horizon_returns, drawdowns = np.concatenate(horizon_returns), np.concatenate(drawdowns)
+        return {'paths': len(horizon_returns), 'expected_return': float(horizon_returns.mean()),
+                'drawdown': _distribution(drawdowns), **self._tail(horizon_returns)}
+
+    def _tail(self, returns):
+        var = -float(np.quantile(returns, 1 - self.confidence))
+        tail = returns[returns <= -var]
+        return {'var': var, 'cvar': -float(tail.mean()) if len(tail) else var}
+
+    @staticmethod
+    def kelly_fraction(outcomes, max_fraction=1.0, steps=201):
+        # Fraction of capital maximising the mean log growth over the simulated trade outcomes
+        fractions = np.linspace(0, max_fraction, steps)
+        worst = outcomes.min()
+        if worst < 0:
+            fractions = fractions[fractions < -1 / worst]  # Beyond this a single outcome wipes out the stake
+        growth = np.log1p(np.outer(fractions, outcomes)).mean(axis=1)
+        return float(fractions[np.argmax(growth)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo risk of cached bars')
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--direction', choices=['long', 'short'], default='long')
+    parser.add_argument('--regimes', action='store_true', help='Regime-conditioned sampling instead of bootstrap')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    config = load_config(args.config)
+    timeframe = config['data_parameters']['timeframe']
+    bar_cache = BarCache(config['cache']['directory'])
+    frames = {symbol: bar_cache.load(symbol, timeframe) for symbol in args.symbols}
+    frames = {symbol: df for symbol, df in frames.items() if not df.empty}
+    if not frames:
+        raise SystemExit(f"No cached {timeframe} bars for {', '.join(args.symbols)}")
+    closes = aligned_closes(frames)
+    returns = log_returns(closes)
+    simulator = MonteCarloSimulator(config)
+
+    labels = start_regime = None
+    if args.regimes:
+        # The first symbol's regimes condition the joint draw of every symbol; labelled on the aligned closes so
+        # labels[i] belongs to the same bar as the i-th of the last len(labels) returns
+        symbol = next(iter(frames))
+        detector = MarketRegimeDetector(**config.get('regime_detection', {}))
+        labels, _ = detector.label_history(closes[symbol].to_numpy(), symbol)
+        start_regime = int(labels[-1])
+
+    if len(frames) == 1:
+        stop_loss_pct = config['risk_management']['stop_loss_pct']
+        take_profit_pct = stop_loss_pct * config['risk_management'].get('take_profit_ratio', 1.5)
+        result = simulator.simulate_trade(returns.to_numpy()[:, 0], 1 if args.direction == 'long' else -1,
+                                          stop_loss_pct, take_profit_pct, labels, start_regime, args.seed)
+    else:
+        result = simulator.simulate_portfolio(returns.to_numpy(), np.full(len(frames), 1 / len(frames)), labels,
+                                              start_regime, args.seed)
+    for key, value in result.items():
+        print(f"{key:>24}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+# optimizer.py
+#
+# Grid / random search with walk-forward evaluation of strategy and risk parameters on cached bars.
+# Indicator arrays for every window in the search space are computed once and shared with the
+# worker processes through a single shared memory block; trials only combine and simulate them.
+
+import argparse
+import copy
+import csv
+import itertools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtester import Backtester
+from panel import PricePanel, rolling_max, rolling_mean, rolling_min, rsi
+from utils import load_config, setup_logging
+
+METRICS = ['total_trades', 'total_pnl', 'win_rate', 'profit_factor', 'max_drawdown']
+PANEL_ARRAYS = ['open', 'high', 'low', 'close']
+
+_worker_state = None
+
+
+def with_params(config, params):
+    # Copy of config with dotted parameter paths (e.g. 'strategy.rsi_overbought') overridden
+    config = copy.deepcopy(config)
+    for path, value in params.items():
+        *parents, key = path.split('.')
+        section = config
+        for parent in parents:
+            section = section.setdefault(parent, {})
+        section[key] = value
+    return config
+
+
+def grid_trials(space):
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_trials(space, n_trials, seed=42):
+    # Lists are sampled as choices, {min, max} mappings uniformly (as integers when both bounds are)
+    rng = np.random.default_rng(seed)
+    names = sorted(space)
+    trials = []
+    for _ in range(n_trials):
+        params = {}
+        for name in names:
+            values = space[name]
+            if isinstance(values, dict):
+                low, high = values['min'], values['max']
+                if isinstance(low, int) and isinstance(high, int):
+                    params[name] = int(rng.integers(low, high + 1))
+                else:
+                    params[name] = float(rng.uniform(low, high))
+            else:
+                params[name] = values[int(rng.integers(len(values)))]
+        if params not in trials:
+            trials.append(params)
+    return trials
+
+
+def walk_forward_segments(n_bars, start_bar, splits, anchored=False):
+    # (fold, segment, start, end) in evaluation order; each fold tests on the block after its training block
+    if not splits:
+        return [(0, 'full', start_bar, n_bars)]
+    bounds = np.linspace(start_bar, n_bars, splits + 2).astype(int)
+    segments = []
+    for fold in range(splits):
+        segments.append((fold, 'train', int(bounds[0] if anchored else bounds[fold]), int(bounds[fold + 1])))
+        segments.append((fold, 'test', int(bounds[fold + 1]), int(bounds[fold + 2])))
+    return segments
+
+
+def _trial_indicators(generator, arrays):
+    return {
+        f'SMA_{generator.sma_fast}': arrays[f'SMA_{generator.sma_fast}'],
+        f'SMA_{generator.sma_slow}': arrays[f'SMA_{generator.sma_slow}'],
+        'RSI': arrays[f'RSI_{generator.rsi_period}'],
+        'Highest_High': arrays[f'Highest_High_{generator.breakout_window}'],
+        'Lowest_Low': arrays[f'Lowest_Low_{generator.breakout_window}'],
+    }
+
+
+def precompute_arrays(config, panel, trials):
+    # Every indicator any trial needs, computed once for the whole search
+    arrays = {field: getattr(panel, field) for field in PANEL_ARRAYS}
+    arrays['volatility'] = Backtester(config).volatility(panel)
+    for params in trials:
+        generator = Backtester(with_params(config, params)).signal_generator
+        for window in (generator.sma_fast, generator.sma_slow):
+            if f'SMA_{window}' not in arrays:
+                arrays[f'SMA_{window}'] = rolling_mean(panel.close, window)
+        if f'RSI_{generator.rsi_period}' not in arrays:
+            arrays[f'RSI_{generator.rsi_period}'] = rsi(panel.close, generator.rsi_period)
+        if f'Highest_High_{generator.breakout_window}' not in arrays:
+            arrays[f'Highest_High_{generator.breakout_window}'] = rolling_max(panel.high, generator.breakout_window)
+            arrays[f'Lowest_Low_{generator.breakout_window}'] = rolling_min(panel.low, generator.breakout_window)
+    return arrays
+
+
+def _should_prune(summary, pruning):
+    if summary.get('total_trades', 0) < pruning.get('min_trades', 30):
+        return False
+    return (summary['max_drawdown'] > pruning.get('max_drawdown', 0.5) or
+            summary['profit_factor'] < pruning.get('min_profit_factor', 0.8))
+
+
+def evaluate_trial(config, panel, arrays, params, segments, pruning):
+    backtester = Backtester(with_params(config, params))
+    indicators = _trial_indicators(backtester.signal_generator, arrays)
+    signals, volatility, tradable = backtester.precompute(panel, indicators, arrays['volatility'])
+
+    rows = []
+    for fold, segment, start, end in segments:
+        summary = backtester.simulate(panel, signals, volatility, tradable, start, end).summary()
+        rows.append({'fold': fold, 'segment': segment, **{metric: summary.get(metric, 0) for metric in METRICS},
+                     'pruned': 0})
+        # Clearly losing in-sample: skip the remaining folds
+        if segment != 'test' and _should_prune(summary, pruning):
+            rows[-1]['pruned'] = 1
+            break
+    return rows
+
+
+def _pack(arrays):
+    names = sorted(arrays)
+    shape = arrays[names[0]].shape
+    shm = shared_memory.SharedMemory(create=True, size=max(len(names) * int(np.prod(shape)) * 8, 1))
+    block = np.ndarray((len(names),) + shape, dtype='f8', buffer=shm.buf)
+    for i, name in enumerate(names):
+        block[i] = arrays[name]
+    return shm, names, shape
+
+
+def _init_worker(shm_name, names, shape, timestamps, symbols, config, segments, pruning):
+    global _worker_state
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray((len(names),) + shape, dtype='f8', buffer=shm.buf)
+    block.flags.writeable = False
+    arrays = {name: block[i] for i, name in enumerate(names)}
+    index = pd.DatetimeIndex(timestamps.view('datetime64[ns]'))
+    panel = PricePanel(symbols, index, volume=None, **{field: arrays[field] for field in PANEL_ARRAYS})
+    _worker_state = (shm, config, panel, arrays, segments, pruning)
+
+
+def _run_trial(trial_id, params):
+    _, config, panel, arrays, segments, pruning = _worker_state
+    return trial_id, params, evaluate_trial(config, panel, arrays, params, segments, pruning)
+
+
+class Optimizer:
+    def __init__(self, config, workers=None):
+        optimization_config = config.get('optimization', {})
+        self.config = config
+        self.space = optimization_config.get('parameters', {})
+        self.method = optimization_config.get('method', 'grid')
+        self.n_trials = optimization_config.get('n_trials', 100)
+        self.seed = optimization_config.get('seed', 42)
+        self.metric = optimization_config.get('metric', 'total_pnl')
+        self.results_file = optimization_config.get('results_file', 'optimization_results.csv')
+        self.workers = workers if workers is not None else optimization_config.get('workers') or os.cpu_count()
+
+        walk_forward = optimization_config.get('walk_forward', {})
+        self.splits = walk_forward.get('splits', 4)
+        self.anchored = walk_forward.get('anchored', False)
+        self.pruning = optimization_config.get('pruning', {})
+
+    def trials(self):
+        if self.method == 'grid':
+            return grid_trials(self.space)
+        if self.method == 'random':
+            return random_trials(self.space, self.n_trials, self.seed)
+        raise ValueError(f"Unknown search method: {self.method}")
+
+    def _columns(self):
+        return ['trial'] + sorted(self.space) + ['fold', 'segment'] + METRICS + ['pruned']
+
+    def _completed(self):
+        # Parameter combinations already in the results table, as written by csv (strings)
+        if not os.path.exists(self.results_file):
+            return set()
+        with open(self.results_file, newline='') as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames != self._columns():
+                raise ValueError(f"{self.results_file} was written for a different parameter space")
+            return {tuple(row[name] for name in sorted(self.space)) for row in reader}
+
+    def run(self, frames, fresh=False):
+        if fresh and os.path.exists(self.results_file):
+            os.remove(self.results_file)
+        trials = list(enumerate(self.trials()))
+        completed = self._completed()
+        pending = [(trial_id, params) for trial_id, params in trials
+                   if tuple(str(params[name]) for name in sorted(self.space)) not in completed]
+        logging.info(f"{len(trials)} trials, {len(trials) - len(pending)} already in {self.results_file}")
+
+        if pending:
+            panel = PricePanel.from_frames(frames)
+            start_date = self.config.get('backtesting', {}).get('start_date')
+            start_bar = int(panel.index.searchsorted(pd.Timestamp(start_date))) if start_date else 0
+            segments = walk_forward_segments(len(panel), start_bar, self.splits, self.anchored)
+            arrays = precompute_arrays(self.config, panel, [params for _, params in pending])
+
+            new_file = not os.path.exists(self.results_file)
+            with open(self.results_file, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self._columns())
+                if new_file:
+                    writer.writeheader()
+                for done, (trial_id, params, rows) in enumerate(self._evaluate(panel, arrays, pending, segments), 1):
+                    writer.writerows({'trial': trial_id, **params, **row} for row in rows)
+                    f.flush()  # Every finished trial survives an interrupted run
+                    if done % 50 == 0 or done == len(pending):
+                        logging.info(f"Optimization: {done}/{len(pending)} trials evaluated")
+
+        return pd.read_csv(self.results_file)
+
+    def _evaluate(self, panel, arrays, pending, segments):
+        if self.workers <= 1:
+            for trial_id, params in pending:
+                yield trial_id, params, evaluate_trial(self.config, panel, arrays, params, segments, self.pruning)
+            return
+
+        shm, names, shape = _pack(arrays)
+        try:
+            timestamps = panel.index.values.astype('datetime64[ns]').view('i8')
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(shm.name, names, shape, timestamps, panel.symbols, self.config,
+                                               segments, self.pruning)) as pool:
+                futures = [pool.submit(_run_trial, trial_id, params) for trial_id, params in pending]
+                for future in as_completed(futures):
+                    yield future.result()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def walk_forward_report(self, results):
+        # Per fold: the best trial on the training block and how it did on the following test block
+        train = results[(results['segment'] == 'train') & (results['pruned'] == 0)]
+        test = results[results['segment'] == 'test'].set_index(['trial', 'fold'])
+        report = []
+        for fold, group in train.groupby('fold'):
+            candidates = group[[(trial, fold) in test.index for trial in group['trial']]]
+            if candidates.empty:
+                continue
+            best = candidates.loc[candidates[self.metric].idxmax()]
+            report.append({'fold': fold, 'trial': int(best['trial']),
+                           **{name: best[name] for name in sorted(self.space)},
+                           f'train_{self.metric}': best[self.metric],
+                           f'test_{self.metric}': test.loc[(best['trial'], fold), self.metric]})
+        return pd.DataFrame(report)
+
+    def best_trials(self, results, top_n=10):
+        segment = 'full' if not self.splits else 'test'
+        totals = results[results['segment'] == segment].groupby('trial')[self.metric].sum()
+        params = results.drop_duplicates('trial').set_index('trial')[sorted(self.space)]
+        return params.join(totals, how='inner').nlargest(top_n, self.metric)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search strategy and risk parameters on cached bars')
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--symbols', nargs='+', help='Defaults to trading.symbols')
+    parser.add_argument('--workers', type=int, help='Defaults to optimization.workers')
+    parser.add_argument('--fresh', action='store_true', help='Discard existing results instead of resuming')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    setup_logging(config['logging']['level'], 'optimizer.log', config['logging'])
+
+    frames = Backtester(config).load_frames(args.symbols or config['trading']['symbols'])
+    if not frames:
+        raise SystemExit("No cached bars to optimize on; run the bot with the bar cache enabled first")
+
+    optimizer = Optimizer(config, workers=args.workers)
+    results = optimizer.run(frames, fresh=args.fresh)
+    if optimizer.splits:
+        print(optimizer.walk_forward_report(results).to_string(index=False))
+    print(optimizer.best_trials(results).to_string())
+
+
+if __name__ == "__main__":
+    main()
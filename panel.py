@@ -0,0 +1,230 @@
+# panel.py
+#
+# Universe-wide indicators on (n_bars, n_symbols) arrays. Symbols with shorter history are
+# NaN-padded at the top; every rolling kernel requires a full window of valid bars, matching
+# pandas' rolling(window) semantics on each symbol's own frame. Bars missing inside a symbol's
+# history (other symbols traded then) are filled as flat no-volume bars at the last close, so a
+# gap does not blank that symbol's indicators for the next window of bars.
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+PANEL_FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+
+class PricePanel:
+    def __init__(self, symbols, index, open, high, low, close, volume):
+        self.symbols = list(symbols)
+        self.index = index
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def from_frames(cls, frames):
+        symbols = [symbol for symbol, df in frames.items() if df is not None and not df.empty]
+        index = frames[symbols[0]].index if symbols else pd.DatetimeIndex([])
+        aligned = True
+        for symbol in symbols[1:]:
+            if not frames[symbol].index.equals(index):
+                index = index.union(frames[symbol].index)
+                aligned = False
+
+        arrays = {}
+        for field in PANEL_FIELDS:
+            columns = [frames[symbol][field if field in frames[symbol] else field.capitalize()].to_numpy(dtype='f8')
+                       for symbol in symbols]
+            if aligned:
+                arrays[field] = np.stack(columns, axis=1) if columns else np.empty((0, 0))
+                continue
+            arrays[field] = np.full((len(index), len(symbols)), np.nan)
+            for j, symbol in enumerate(symbols):
+                arrays[field][index.get_indexer(frames[symbol].index), j] = columns[j]
+        if not aligned:
+            cls._fill_gaps(arrays, [index.get_indexer(frames[symbol].index) for symbol in symbols])
+        return cls(symbols, index, **arrays)
+
+    @staticmethod
+    def _fill_gaps(arrays, rows):
+        # Rows between a symbol's first and last bar that it has no bar for: OHLC at the last close, volume 0
+        present = np.zeros(arrays['close'].shape, dtype=bool)
+        for j, symbol_rows in enumerate(rows):
+            present[symbol_rows, j] = True
+        positions = np.arange(len(present))[:, None]
+        last_row = np.maximum.accumulate(np.where(present, positions, -1), axis=0)
+        final_row = np.where(present, positions, -1).max(axis=0)
+        gaps = ~present & (last_row >= 0) & (positions <= final_row)
+        if not gaps.any():
+            return
+        carried = arrays['close'][np.maximum(last_row, 0), np.arange(present.shape[1])]
+        for field in ('open', 'high', 'low', 'close'):
+            arrays[field][gaps] = carried[gaps]
+        arrays['volume'][gaps] = 0.0
+
+    def __len__(self):
+        return len(self.index)
+
+
+def _window_sums(x, window, power=1):
+    # Cumulative-sum kernel over values re-centred on each symbol's first valid bar, which limits
+    # cancellation in the running totals. Returns the centred window sums, the full-window mask and the offsets.
+    valid = ~np.isnan(x)
+    complete = valid.all()
+    offset = np.nan_to_num(x[valid.argmax(axis=0), np.arange(x.shape[1])])
+    centred = np.subtract(x, offset)
+    if not complete:
+        centred[~valid] = 0.0
+    if power != 1:
+        centred **= power
+
+    sums = np.zeros((x.shape[0] + 1, x.shape[1]))
+    np.cumsum(centred, axis=0, out=sums[1:])
+
+    window_sums = np.full(x.shape, np.nan)
+    full = np.zeros(x.shape, dtype=bool)
+    if x.shape[0] >= window:
+        np.subtract(sums[window:], sums[:-window], out=window_sums[window - 1:])
+        if complete:
+            full[window - 1:] = True
+        else:
+            counts = np.zeros((x.shape[0] + 1, x.shape[1]), dtype=np.int32)
+            np.cumsum(valid, axis=0, out=counts[1:])
+            full[window - 1:] = (counts[window:] - counts[:-window]) == window
+    return window_sums, full, offset
+
+
+def rolling_mean(x, window):
+    sums, full, offset = _window_sums(x, window)
+    return np.where(full, sums / window + offset, np.nan)
+
+
+def rolling_std(x, window, ddof=1):
+    sum_x, full, _ = _window_sums(x, window)
+    sum_x2 = _window_sums(x, window, power=2)[0]
+    variance = (sum_x2 - sum_x * sum_x / window) / (window - ddof)
+    return np.where(full, np.sqrt(np.clip(variance, 0.0, None)), np.nan)
+
+
+def _rolling_extreme(x, window, reducer):
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] >= window:
+        # Any NaN in the window propagates, i.e. the window is not yet full
+        out[window - 1:] = reducer(sliding_window_view(x, window, axis=0), axis=-1)
+    return out
+
+
+def rolling_max(x, window):
+    return _rolling_extreme(x, window, np.max)
+
+
+def rolling_min(x, window):
+    return _rolling_extreme(x, window, np.min)
+
+
+def ema(x, span):
+    # ewm(span=span, adjust=False).mean(): recursive in time, vectorised across symbols
+    alpha = 1. / (1. + (span - 1) / 2.0)
+    out = np.empty(x.shape)
+    weighted = x[0].copy() if len(x) else np.empty(x.shape[1:])
+    for t in range(len(x)):
+        cur = x[t]
+        weighted = np.where(np.isnan(weighted), cur,
+                            np.where(np.isnan(cur), weighted, (1. - alpha) * weighted + alpha * cur))
+        out[t] = weighted
+    return out
+
+
+def rsi(close, period=14):
+    delta = np.full(close.shape, np.nan)
+    delta[1:] = close[1:] - close[:-1]
+    missing = np.isnan(close)
+    gain = np.where(missing, np.nan, np.where(delta > 0, delta, 0.0))
+    loss = np.where(missing, np.nan, np.where(delta < 0, -delta, 0.0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = rolling_mean(gain, period) / rolling_mean(loss, period)
+        return 100 - (100 / (1 + rs))
+
+
+def atr(high, low, close, period=14):
+    prev_close = np.full(close.shape, np.nan)
+    prev_close[1:] = close[:-1]
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return rolling_mean(true_range, period)
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger_bands(close, window=20, num_std=2):
+    middle = rolling_mean(close, window)
+    std = rolling_std(close, window)
+    return middle + std * num_std, middle, middle - std * num_std
+
+
+def compute_indicators(panel, breakout_window=20, sma_windows=(50, 200), rsi_period=14, atr_period=14):
+    indicators = {f"SMA_{window}": rolling_mean(panel.close, window) for window in sma_windows}
+    indicators['RSI'] = rsi(panel.close, rsi_period)
+    indicators['ATR'] = atr(panel.high, panel.low, panel.close, atr_period)
+    indicators['MACD'], indicators['MACD_Signal'], indicators['MACD_Histogram'] = macd(panel.close)
+    indicators['BB_Upper'], indicators['BB_Middle'], indicators['BB_Lower'] = bollinger_bands(panel.close)
+    indicators['Highest_High'] = rolling_max(panel.high, breakout_window)
+    indicators['Lowest_Low'] = rolling_min(panel.low, breakout_window)
+    return indicators
+
+
+def strategy_indicators(panel, sma_fast=50, sma_slow=200, rsi_period=14, breakout_window=20):
+    # Only the inputs of strategy_signals, for callers that do not need the full indicator set
+    return {
+        f'SMA_{sma_fast}': rolling_mean(panel.close, sma_fast),
+        f'SMA_{sma_slow}': rolling_mean(panel.close, sma_slow),
+        'RSI': rsi(panel.close, rsi_period),
+        'Highest_High': rolling_max(panel.high, breakout_window),
+        'Lowest_Low': rolling_min(panel.low, breakout_window),
+    }
+
+
+def _shift(x, periods=1):
+    out = np.full(x.shape, np.nan)
+    out[periods:] = x[:-periods]
+    return out
+
+
+def strategy_signals(panel, indicators, sma_fast=50, sma_slow=200, rsi_overbought=70, rsi_oversold=30):
+    # Array form of SignalGenerator's momentum / mean reversion / breakout checks, for every bar at once
+    close = panel.close
+    fast, slow, rsi_values = indicators[f'SMA_{sma_fast}'], indicators[f'SMA_{sma_slow}'], indicators['RSI']
+
+    momentum = np.where((close > fast) & (rsi_values < rsi_overbought), 1,
+                        np.where((close < fast) & (rsi_values > rsi_oversold), -1, 0))
+    mean_reversion = np.where((rsi_values < rsi_oversold) & (close < slow), 1,
+                              np.where((rsi_values > rsi_overbought) & (close > slow), -1, 0))
+    breakout = np.where(close > _shift(indicators['Highest_High']), 1,
+                        np.where(close < _shift(indicators['Lowest_Low']), -1, 0))
+    return momentum, mean_reversion, breakout
+
+
+def combine_signals(momentum, mean_reversion, breakout, capital_allocation, ml_prediction=None):
+    combined = (capital_allocation['momentum'] * momentum +
+                capital_allocation['mean_reversion'] * mean_reversion +
+                capital_allocation['breakout'] * breakout)
+    if ml_prediction is None:
+        return combined
+
+    agreement = np.sign(combined) * np.sign(ml_prediction)
+    return np.where(agreement > 0, combined * 1.2, np.where(agreement < 0, combined * 0.8, combined))
+
+
+def score_universe(panel, capital_allocation, ml_predictions=None, indicators=None, sma_fast=50, sma_slow=200,
+                   rsi_period=14, rsi_overbought=70, rsi_oversold=30, breakout_window=20):
+    # Combined signal of the latest bar for every symbol, as SignalGenerator would compute it one by one
+    if indicators is None:
+        indicators = strategy_indicators(panel, sma_fast, sma_slow, rsi_period, breakout_window)
+    momentum, mean_reversion, breakout = strategy_signals(panel, indicators, sma_fast, sma_slow, rsi_overbought,
+                                                          rsi_oversold)
+    return combine_signals(momentum[-1], mean_reversion[-1], breakout[-1], capital_allocation, ml_predictions)
@@ -0,0 +1,138 @@
+# parallel_executor.py
+#
+# Evaluates signals for a whole universe across worker processes over shared-memory bars. Only the
+# benchmark suite drives it for now; run_bot analyses each symbol as its fetch completes. Its settings
+# come from an optional 'parallel' config section (workers, chunks_per_worker).
+
+import gc
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import feature_store
+from market_regime_detector import MarketRegimeDetector
+from panel import PANEL_FIELDS
+from risk_management import RiskManagement
+from signal_generator import SignalGenerator
+
+_worker_generator = None
+
+
+def _build_generator(config):
+    return SignalGenerator(config['strategy'], RiskManagement(config['risk_management']), None,
+                           MarketRegimeDetector(**config.get('regime_detection', {})))
+
+
+def _init_worker(config):
+    global _worker_generator
+    feature_store.configure(config)
+    _worker_generator = _build_generator(config)
+
+
+def _evaluate(generator, symbol, df, ml_prediction=0.0):
+    try:
+        return generator.generate_signal(df, symbol, ml_prediction)
+    except Exception as e:
+        logging.error(f"Error evaluating {symbol}: {e}")
+        return None
+
+
+def _evaluate_chunk(shm_name, total_bars, layout):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        values = np.ndarray((total_bars, len(PANEL_FIELDS)), dtype='f8', buffer=shm.buf)
+        timestamps = np.ndarray(total_bars, dtype='i8', buffer=shm.buf, offset=values.nbytes)
+        records = []
+        for symbol, start, stop, ml_prediction in layout:
+            # Read-only view onto the shared block; indicator columns are added as new arrays
+            df = pd.DataFrame(values[start:stop], columns=PANEL_FIELDS,
+                              index=pd.DatetimeIndex(timestamps[start:stop].view('datetime64[ns]')), copy=False)
+            records.append((symbol, _evaluate(_worker_generator, symbol, df, ml_prediction)))
+            del df
+        del values, timestamps
+        return records
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            gc.collect()  # pandas reference cycles can keep a view alive until collected
+            shm.close()
+
+
+class ParallelSignalExecutor:
+    def __init__(self, config, workers=None, ml_predictor=None):
+        parallel_config = config.get('parallel', {})
+        self.config = config
+        # Workers have no model; predictions come from one batched forward pass here and travel with the bars
+        self.ml_predictor = ml_predictor
+        self.workers = workers if workers is not None else parallel_config.get('workers') or os.cpu_count()
+        self.chunks_per_worker = parallel_config.get('chunks_per_worker', 2)
+        self._pool = None
+        self._local_generator = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self.config,))
+        return self._pool
+
+    def _evaluate_in_process(self, frames, ml_predictions):
+        if self._local_generator is None:
+            self._local_generator = _build_generator(self.config)
+        return {symbol: _evaluate(self._local_generator, symbol, df.rename(columns=str.lower),
+                                  ml_predictions.get(symbol, 0.0))
+                for symbol, df in frames.items()}
+
+    @staticmethod
+    def _pack(frames, shm, ml_predictions):
+        total_bars = sum(len(df) for df in frames.values())
+        values = np.ndarray((total_bars, len(PANEL_FIELDS)), dtype='f8', buffer=shm.buf)
+        timestamps = np.ndarray(total_bars, dtype='i8', buffer=shm.buf, offset=values.nbytes)
+        layout, start = [], 0
+        for symbol, df in frames.items():
+            stop = start + len(df)
+            for j, field in enumerate(PANEL_FIELDS):
+                values[start:stop, j] = df[field if field in df else field.capitalize()].to_numpy(dtype='f8')
+            timestamps[start:stop] = df.index.values.astype('datetime64[ns]').view('i8')
+            layout.append((symbol, start, stop, ml_predictions.get(symbol, 0.0)))
+            start = stop
+        return total_bars, layout
+
+    def evaluate(self, frames, ml_predictions=None):
+        # Returns {symbol: Signal or None}; falls back to in-process evaluation when no pool is usable
+        frames = {symbol: df for symbol, df in frames.items() if df is not None and not df.empty}
+        if ml_predictions is None:
+            ml_predictions = self.ml_predictor.predict_batch(frames) if self.ml_predictor is not None else {}
+        if self.workers <= 1 or len(frames) <= 1:
+            return self._evaluate_in_process(frames, ml_predictions)
+
+        total_bars = sum(len(df) for df in frames.values())
+        shm = None
+        try:
+            shm = shared_memory.SharedMemory(create=True, size=max(total_bars * (len(PANEL_FIELDS) + 1) * 8, 1))
+            total_bars, layout = self._pack(frames, shm, ml_predictions)
+            n_chunks = min(len(layout), self.workers * self.chunks_per_worker)
+            chunks = [layout[i::n_chunks] for i in range(n_chunks)]
+
+            pool = self._get_pool()
+            futures = [pool.submit(_evaluate_chunk, shm.name, total_bars, chunk) for chunk in chunks]
+            return {symbol: record for future in futures for symbol, record in future.result()}
+        except (BrokenProcessPool, OSError) as e:
+            logging.warning(f"Process pool unavailable ({e}), evaluating {len(frames)} symbols in-process")
+            self.close()
+            self.workers = 1
+            return self._evaluate_in_process(frames, ml_predictions)
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
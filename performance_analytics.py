@@ -1,55 +1,129 @@
-import numpy as np
-import pandas as pd
-
-class PerformanceAnalytics:
-    def __init__(self):
-        self.signals = []
-
-    def add_signal(self, signal):
-        self.signals.append(signal)
-
-    def calculate_metrics(self):
-        if not self.signals:
-            return {}
-
-        df = pd.DataFrame(self.signals)
-        df['return'] = df.groupby('symbol').apply(self._calculate_returns).reset_index(level=0, drop=True)
-
-        total_signals = len(df)
-        correct_signals = len(df[df['return'] > 0])
-        accuracy = correct_signals / total_signals if total_signals > 0 else 0
-
-        avg_return = df['return'].mean()
-        sharpe_ratio = self._calculate_sharpe_ratio(df['return'])
-
-        return {
-            'total_signals': total_signals,
-            'accuracy': accuracy,
-            'avg_return': avg_return,
-            'sharpe_ratio': sharpe_ratio
-        }
-
-    def _calculate_returns(self, group):
-        entry_price = group['entry_price'].iloc[0]
-        exit_price = group['entry_price'].iloc[-1]  # Use the last signal's entry price as exit price
-        return (exit_price - entry_price) / entry_price if group['action'].iloc[0] == 'BUY' else (entry_price - exit_price) / entry_price
-
-    def _calculate_sharpe_ratio(self, returns, risk_free_rate=0.02):
-        excess_returns = returns - risk_free_rate
-        return np.sqrt(252) * excess_returns.mean() / excess_returns.std() if excess_returns.std() != 0 else 0
-
-    def get_best_performing_symbols(self, top_n=5):
-        if not self.signals:
-            return []
-
-        df = pd.DataFrame(self.signals)
-        df['return'] = df.groupby('symbol').apply(self._calculate_returns).reset_index(level=0, drop=True)
-        return df.groupby('symbol')['return'].mean().nlargest(top_n).index.tolist()
-
-    def get_worst_performing_symbols(self, bottom_n=5):
-        if not self.signals:
-            return []
-
-        df = pd.DataFrame(self.signals)
-        df['return'] = df.groupby('symbol').apply(self._calculate_returns).reset_index(level=0, drop=True)
-        return df.groupby('symbol')['return'].mean().nsmallest(bottom_n).index.tolist()
\ No newline at end of file
+import bisect
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = {'symbol': 'i4', 'timestamp': 'i8', 'direction': 'i1', 'entry_price': 'f8', 'exit_price': 'f8',
+           'return': 'f8'}
+
+
+class RunningStats:
+    # Welford's online count / mean / variance, plus the number of positive values
+    def __init__(self):
+        self.count = 0
+        self.wins = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        value = float(value)
+        self.count += 1
+        self.wins += value > 0
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else 0.0
+
+
+class PerformanceAnalytics:
+    def __init__(self, risk_free_rate=0.02, initial_capacity=1024):
+        self.risk_free_rate = risk_free_rate
+        # Column-backed signal storage, grown by doubling
+        self.columns = {name: np.empty(initial_capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.size = 0
+        self.symbols = []
+        self.symbol_codes = {}
+
+        self.total = RunningStats()
+        self.by_symbol = {}
+        self.open_rows = {}  # symbol code -> row of the signal still waiting for its exit
+        self.leaderboard = []  # (mean return, symbol) kept sorted
+
+    def _append_row(self, values):
+        if self.size == len(self.columns['symbol']):
+            for name, column in self.columns.items():
+                self.columns[name] = np.resize(column, 2 * len(column))
+        for name, value in values.items():
+            self.columns[name][self.size] = value
+        self.size += 1
+        return self.size - 1
+
+    def _record_return(self, row, exit_price):
+        entry_price = self.columns['entry_price'][row]
+        trade_return = self.columns['direction'][row] * (exit_price - entry_price) / entry_price
+        self.columns['exit_price'][row] = exit_price
+        self.columns['return'][row] = trade_return
+
+        symbol = self.symbols[self.columns['symbol'][row]]
+        stats = self.by_symbol.setdefault(symbol, RunningStats())
+        if stats.count:
+            del self.leaderboard[bisect.bisect_left(self.leaderboard, (stats.mean, symbol))]
+        stats.add(trade_return)
+        bisect.insort(self.leaderboard, (stats.mean, symbol))
+        self.total.add(trade_return)
+
+    def add_signal(self, signal, exit_price=None):
+        # A signal's return is realised at exit_price when given, otherwise at the entry price of the next
+        # signal for the same symbol
+        symbol = signal.symbol
+        code = self.symbol_codes.get(symbol)
+        if code is None:
+            code = self.symbol_codes[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+
+        entry_price = signal.entry_price
+        previous = self.open_rows.pop(code, None)
+        if previous is not None:
+            self._record_return(previous, entry_price)
+
+        row = self._append_row({
+            'symbol': code,
+            'timestamp': signal.timestamp,
+            'direction': signal.direction,
+            'entry_price': entry_price,
+            'exit_price': np.nan,
+            'return': np.nan,
+        })
+        if exit_price is not None:
+            self._record_return(row, exit_price)
+        else:
+            self.open_rows[code] = row
+
+    def calculate_metrics(self):
+        if not self.size:
+            return {}
+
+        return {
+            'total_signals': self.size,
+            'evaluated_signals': self.total.count,
+            'accuracy': self.total.wins / self.total.count if self.total.count else 0,
+            'avg_return': self.total.mean if self.total.count else np.nan,
+            'sharpe_ratio': self._calculate_sharpe_ratio(self.total)
+        }
+
+    def _calculate_sharpe_ratio(self, stats):
+        std = stats.std
+        return float(np.sqrt(252) * (stats.mean - self.risk_free_rate) / std) if std != 0 else 0
+
+    def symbol_metrics(self, symbol):
+        stats = self.by_symbol.get(symbol)
+        if stats is None:
+            return {}
+        return {'signals': stats.count, 'accuracy': stats.wins / stats.count, 'avg_return': stats.mean,
+                'sharpe_ratio': self._calculate_sharpe_ratio(stats)}
+
+    def get_best_performing_symbols(self, top_n=5):
+        return [symbol for _, symbol in reversed(self.leaderboard[-top_n:])] if top_n > 0 else []
+
+    def get_worst_performing_symbols(self, bottom_n=5):
+        return [symbol for _, symbol in self.leaderboard[:bottom_n]]
+
+    def to_frame(self):
+        df = pd.DataFrame({name: column[:self.size] for name, column in self.columns.items()})
+        df['symbol'] = pd.Categorical.from_codes(df['symbol'], self.symbols)
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df['action'] = np.where(df.pop('direction') > 0, 'BUY', 'SELL')
+        return df
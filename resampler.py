@@ -0,0 +1,124 @@
+# resampler.py
+#
+# Higher-timeframe bars (1h, 4h, 1d, ...) derived in memory from the base feed, so multi-timeframe
+# strategies cost no extra fetches. Each update folds only the base bars that closed since the last
+# one into the derived bars; a derived bar is complete once base bars cover its whole interval, and
+# until then it is kept as a partial bar that frame() can include on request.
+
+import numpy as np
+import pandas as pd
+
+from bar_cache import BAR_COLUMNS, BAR_DTYPE, BarCache, BarRing
+from utils import utc_now
+
+
+def aggregate(records, interval_ns):
+    # One derived bar per interval bucket of consecutive base records: (bucket starts, OHLCV rows)
+    buckets = records['timestamp'] - records['timestamp'] % interval_ns
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.append(starts[1:], len(records))
+    rows = np.column_stack((records['Open'][starts], np.maximum.reduceat(records['High'], starts),
+                            np.minimum.reduceat(records['Low'], starts), records['Close'][ends - 1],
+                            np.add.reduceat(records['Volume'], starts)))
+    return buckets[starts], rows
+
+
+def _merge(first, second):
+    # OHLCV of two consecutive pieces of the same bar
+    return np.array([first[0], max(first[1], second[1]), min(first[2], second[2]), second[3], first[4] + second[4]])
+
+
+class _Series:
+    def __init__(self, interval, max_bars):
+        self.interval_ns = pd.Timedelta(interval).value
+        self.ring = BarRing(max_bars)
+        self.partial = None  # (bucket start ns, OHLCV row) of the derived bar still being built
+
+    def fold(self, records, base_interval_ns):
+        buckets, rows = aggregate(records, self.interval_ns)
+        if self.partial is None and not self.ring.count and records['timestamp'][0] != buckets[0]:
+            # History starting mid-bucket would give a first bar that is missing its opening bars
+            keep = buckets > buckets[0]
+            if not keep.any():
+                return
+            buckets, rows = buckets[keep], rows[keep]
+        if self.partial is not None:
+            if buckets[0] == self.partial[0]:
+                rows[0] = _merge(self.partial[1], rows[0])
+            else:
+                self._complete(*self.partial)
+        # Every bucket but the last has been left behind; the last one is complete once its final base bar
+        # closes at or after the bucket's end
+        for bucket, row in zip(buckets[:-1], rows[:-1]):
+            self._complete(bucket, row)
+        if records['timestamp'][-1] + base_interval_ns >= buckets[-1] + self.interval_ns:
+            self._complete(buckets[-1], rows[-1])
+            self.partial = None
+        else:
+            self.partial = (buckets[-1], rows[-1])
+
+    def _complete(self, bucket, row):
+        self.ring.append((bucket, *row))
+
+
+class Resampler:
+    def __init__(self, timeframes, base_timeframe=None, max_bars=500):
+        self.timeframes = list(timeframes)
+        self.base_interval = pd.Timedelta(base_timeframe) if base_timeframe else None
+        self.max_bars = max_bars
+        self.series = {}  # (symbol, timeframe) -> _Series
+        self.last_closed = {}  # symbol -> open time ns of the last base bar folded in
+        self.forming = {}  # symbol -> base records that have not closed yet
+
+    @classmethod
+    def from_config(cls, config):
+        data_config = config.get('data_parameters', {})
+        return cls(data_config.get('derived_timeframes', []), data_config.get('timeframe'),
+                   data_config.get('derived_max_bars', 500))
+
+    def update(self, symbol, df, now=None):
+        # Base bars that have closed by `now` (naive UTC, as bar timestamps are) are folded in once; a still-forming
+        # last bar is kept aside
+        if df is None or df.empty:
+            return
+        if self.base_interval is None:
+            self.base_interval = pd.Timedelta(np.median(np.diff(df.index.values)))  # Inferred from the first feed
+        records = BarCache._to_records(df.rename(columns=str.capitalize))
+        now_ns = (utc_now() if now is None else pd.Timestamp(now)).value
+        closed = records['timestamp'] + self.base_interval.value <= now_ns
+        self.forming[symbol] = records[~closed]
+
+        last = self.last_closed.get(symbol)
+        new = records[closed] if last is None else records[closed & (records['timestamp'] > last)]
+        if not len(new):
+            return
+        for timeframe in self.timeframes:
+            series = self.series.get((symbol, timeframe))
+            if series is None:
+                series = self.series[symbol, timeframe] = _Series(timeframe, self.max_bars)
+            series.fold(new, self.base_interval.value)
+        self.last_closed[symbol] = int(new['timestamp'][-1])
+
+    def frame(self, symbol, timeframe, include_partial=False):
+        # Completed derived bars with capitalised OHLCV columns; include_partial appends the bar still being
+        # built, updated with any forming base bar
+        series = self.series.get((symbol, timeframe))
+        if series is None:
+            if timeframe not in self.timeframes:
+                raise KeyError(f"{timeframe} is not a derived timeframe (configured: {', '.join(self.timeframes)})")
+            return pd.DataFrame(columns=BAR_COLUMNS, dtype='f8')
+        records = series.ring.records()
+        if include_partial:
+            bucket, row = series.partial if series.partial is not None else (None, None)
+            forming = self.forming.get(symbol, np.empty(0, dtype=BAR_DTYPE))
+            if len(forming):
+                buckets, rows = aggregate(forming, series.interval_ns)
+                if bucket is None or buckets[0] != bucket:
+                    if bucket is not None:
+                        records = np.append(records, np.array([(bucket, *row)], dtype=BAR_DTYPE))
+                    bucket, row = buckets[0], rows[0]
+                else:
+                    row = _merge(row, rows[0])
+            if bucket is not None:
+                records = np.append(records, np.array([(bucket, *row)], dtype=BAR_DTYPE))
+        return BarCache._to_frame(records)
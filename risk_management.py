@@ -1,43 +1,210 @@
-import numpy as np
-
-class RiskManagement:
-    def __init__(self, config):
-        self.initial_risk_per_trade = config['risk_per_trade']
-        self.max_risk_per_trade = config['max_risk_per_trade']
-        self.max_leverage = config['max_leverage']
-        self.stop_loss_pct = config['stop_loss_pct']
-        self.risk_free_rate = 0.02  # Assume 2% risk-free rate
-
-    def calculate_stop_loss_take_profit(self, entry_price, action):
-        stop_loss_pct = self.stop_loss_pct
-        take_profit_pct = stop_loss_pct * 1.5  # Risk-reward ratio of 1:1.5
-
-        if action == "BUY":
-            stop_loss = entry_price * (1 - stop_loss_pct)
-            take_profit = entry_price * (1 + take_profit_pct)
-        else:  # SELL
-            stop_loss = entry_price * (1 + stop_loss_pct)
-            take_profit = entry_price * (1 - take_profit_pct)
-
-        return stop_loss, take_profit
-
-    def calculate_leverage(self, volatility):
-        # Calculate leverage based on volatility
-        max_leverage = min(self.max_leverage, 1 / volatility)
-        return round(max_leverage, 1)
-
-    def calculate_position_size(self, account_balance, entry_price, stop_loss):
-        risk_amount = account_balance * self.initial_risk_per_trade
-        position_size = risk_amount / abs(entry_price - stop_loss)
-        return position_size
-
-    def calculate_kelly_criterion(self, win_rate, avg_win, avg_loss):
-        q = 1 - win_rate
-        return (win_rate / q) - (avg_loss / avg_win)
-
-    def calculate_var(self, returns, confidence_level=0.95):
-        return np.percentile(returns, (1 - confidence_level) * 100)
-
-    def calculate_sharpe_ratio(self, returns):
-        excess_returns = returns - self.risk_free_rate
-        return np.mean(excess_returns) / np.std(excess_returns) * np.sqrt(252)  # Annualized
\ No newline at end of file
+import logging
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from utils import utc_now
+
+class RiskManagement:
+    def __init__(self, config):
+        self.initial_risk_per_trade = config['risk_per_trade']
+        self.max_risk_per_trade = config['max_risk_per_trade']
+        self.max_leverage = config['max_leverage']
+        self.stop_loss_pct = config['stop_loss_pct']
+        self.take_profit_ratio = config.get('take_profit_ratio', 1.5)
+        self.risk_free_rate = 0.02  # Assume 2% risk-free rate
+
+    def calculate_stop_loss_take_profit(self, entry_price, action):
+        stop_loss_pct = self.stop_loss_pct
+        take_profit_pct = stop_loss_pct * self.take_profit_ratio  # Risk-reward ratio, 1:1.5 by default
+
+        if action == "BUY":
+            stop_loss = entry_price * (1 - stop_loss_pct)
+            take_profit = entry_price * (1 + take_profit_pct)
+        else:  # SELL
+            stop_loss = entry_price * (1 + stop_loss_pct)
+            take_profit = entry_price * (1 - take_profit_pct)
+
+        return stop_loss, take_profit
+
+    def calculate_leverage(self, volatility):
+        # Calculate leverage based on volatility
+        max_leverage = min(self.max_leverage, 1 / volatility)
+        return round(max_leverage, 1)
+
+    def calculate_position_size(self, account_balance, entry_price, stop_loss):
+        risk_amount = account_balance * self.initial_risk_per_trade
+        position_size = risk_amount / abs(entry_price - stop_loss)
+        return position_size
+
+    def calculate_kelly_criterion(self, win_rate, avg_win, avg_loss):
+        q = 1 - win_rate
+        return (win_rate / q) - (avg_loss / avg_win)
+
+    def calculate_var(self, returns, confidence_level=0.95):
+        return np.percentile(returns, (1 - confidence_level) * 100)
+
+    def calculate_sharpe_ratio(self, returns):
+        excess_returns = returns - self.risk_free_rate
+        return np.mean(excess_returns) / np.std(excess_returns) * np.sqrt(252)  # Annualized
+
+class PortfolioRisk:
+    # Covariance of one-bar log returns across the whole universe, kept as an EWMA with one rank-1 update per
+    # new bar and shrunk toward its diagonal, plus a window of recent returns for historical VaR/CVaR
+    def __init__(self, config, symbols, timeframe=None):
+        portfolio_config = config.get('portfolio', {})
+        self.symbols = list(symbols)
+        self.interval = pd.Timedelta(timeframe) if timeframe else None  # Inferred from the first frames otherwise
+        self.positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.account_balance = config.get('account_balance', 10000)
+        self.decay = 0.5 ** (1 / portfolio_config.get('halflife', 96))
+        self.window = portfolio_config.get('window', 672)
+        self.shrinkage = portfolio_config.get('shrinkage', 'auto')
+        self.confidence = portfolio_config.get('confidence', 0.99)
+        self.var_budget = portfolio_config.get('var_budget', 0.02)
+        self.method = portfolio_config.get('method', 'parametric')
+        self.z = NormalDist().inv_cdf(self.confidence)
+
+        n = len(self.symbols)
+        self.covariance = np.zeros((n, n))
+        self.returns = np.zeros((self.window, n))  # Ring of the most recent bars
+        self.n_bars = 0
+        self.last_close = np.full(n, np.nan)
+        self.last_timestamp = None
+        self._shrunk = None
+
+    def _closes(self, frames):
+        closes = pd.DataFrame({symbol: df['Close'] if 'Close' in df else df['close'] for symbol, df in frames.items()
+                               if symbol in self.positions and df is not None and not df.empty})
+        return closes.reindex(columns=self.symbols).sort_index()
+
+    def update(self, frames, now=None):
+        # Folds in the bars that have closed by `now` (naive UTC) and are newer than the last update; the first call
+        # warms up from the full history. A still-forming last bar is left for a later cycle, once its close is final
+        closes = self._closes(frames)
+        if closes.empty:
+            return 0  # A cycle without bars (source outage, every symbol backed off) keeps the current estimate
+        if self.interval is None:
+            self.interval = pd.Timedelta(np.median(np.diff(closes.index.values))) if len(closes) > 1 else None
+        if self.interval is not None:
+            closes = closes[closes.index + self.interval <= (utc_now() if now is None else pd.Timestamp(now))]
+        if self.last_timestamp is not None:
+            closes = closes[closes.index > self.last_timestamp]
+        if closes.empty:
+            return 0
+        log_close = np.log(closes.to_numpy())
+        previous = np.vstack((np.log(self.last_close), log_close[:-1]))
+        # A symbol without a bar (or its first bar) contributes a zero return; its last close carries forward
+        returns = np.nan_to_num(log_close - pd.DataFrame(previous).ffill().to_numpy())
+
+        if self.n_bars == 0 and len(returns) > 1:
+            weights = (1 - self.decay) * self.decay ** np.arange(len(returns) - 1, -1, -1)
+            self.covariance = (returns * weights[:, None]).T @ returns
+        else:
+            for row in returns:
+                self.covariance *= self.decay
+                self.covariance += (1 - self.decay) * np.outer(row, row)
+        for row in returns[-self.window:]:
+            self.returns[self.n_bars % self.window] = row
+            self.n_bars += 1
+
+        latest = closes.ffill().to_numpy()[-1]
+        self.last_close = np.where(np.isnan(latest), self.last_close, latest)
+        self.last_timestamp = closes.index[-1]
+        self._shrunk = None
+        return len(returns)
+
+    def history(self):
+        if self.n_bars <= self.window:
+            return self.returns[:self.n_bars]
+        start = self.n_bars % self.window
+        return np.concatenate((self.returns[start:], self.returns[:start]))
+
+    def shrinkage_intensity(self):
+        # Ledoit-Wolf intensity toward the diagonal: estimated variance of the off-diagonal sample covariances
+        # relative to their magnitude
+        if self.shrinkage != 'auto':
+            return float(self.shrinkage)
+        x = self.history()
+        t = len(x)
+        if t < 2:
+            return 1.0
+        x = x - x.mean(axis=0)
+        sample = x.T @ x / t
+        squared = x ** 2
+        variance = (squared.T @ squared / t - sample ** 2) / (t - 1)
+        off_diagonal = ~np.eye(len(sample), dtype=bool)
+        denominator = (sample[off_diagonal] ** 2).sum()
+        return float(np.clip(variance[off_diagonal].sum() / denominator, 0, 1)) if denominator > 0 else 1.0
+
+    def covariance_matrix(self):
+        if self._shrunk is None:
+            intensity = self.shrinkage_intensity()
+            self._shrunk = (1 - intensity) * self.covariance
+            self._shrunk[np.diag_indices_from(self._shrunk)] = np.diag(self.covariance)
+        return self._shrunk
+
+    def exposures(self, signals):
+        # Signed notional per symbol of a list of Signal records
+        exposure = np.zeros(len(self.symbols))
+        for signal in signals:
+            position = self.positions.get(signal.symbol)
+            if position is not None and not np.isnan(signal.position_size):
+                exposure[position] += signal.direction * signal.position_size * signal.entry_price
+        return exposure
+
+    def parametric(self, exposure):
+        sigma = float(np.sqrt(max(exposure @ self.covariance_matrix() @ exposure, 0.0)))
+        var = self.z * sigma
+        cvar = float(sigma * np.exp(-self.z ** 2 / 2) / np.sqrt(2 * np.pi) / (1 - self.confidence))
+        return var, cvar
+
+    def historical(self, exposure):
+        pnl = self.history() @ exposure
+        if not len(pnl):
+            return 0.0, 0.0
+        var = -float(np.quantile(pnl, 1 - self.confidence))
+        tail = pnl[pnl <= -var]
+        return var, -float(tail.mean()) if len(tail) else var
+
+    def report(self, exposure):
+        parametric_var, parametric_cvar = self.parametric(exposure)
+        historical_var, historical_cvar = self.historical(exposure)
+        return {'gross_exposure': float(np.abs(exposure).sum()), 'net_exposure': float(exposure.sum()),
+                'parametric_var': parametric_var, 'parametric_cvar': parametric_cvar,
+                'historical_var': historical_var, 'historical_cvar': historical_cvar,
+                'var_budget': self.var_budget * self.account_balance}
+
+    def _var(self, exposure):
+        return self.historical(exposure)[0] if self.method == 'historical' else self.parametric(exposure)[0]
+
+    def scale(self, candidates, open_positions=()):
+        # Scales every candidate's position size by one common factor so the VaR of open positions plus
+        # candidates stays within the budget; returns the factor and the resulting risk report
+        current = self.exposures(open_positions)
+        proposed = self.exposures(candidates)
+        budget = self.var_budget * self.account_balance
+        if not proposed.any() or self._var(current + proposed) <= budget:
+            factor = 1.0
+        elif self._var(current) >= budget:
+            factor = 0.0
+        elif self.method == 'historical':
+            low, high = 0.0, 1.0
+            for _ in range(30):
+                middle = (low + high) / 2
+                low, high = (middle, high) if self._var(current + middle * proposed) <= budget else (low, middle)
+            factor = low
+        else:
+            # z^2 (a + 2kb + k^2 c) = budget^2 is a quadratic in the factor k
+            covariance = self.covariance_matrix()
+            a, b, c = current @ covariance @ current, current @ covariance @ proposed, proposed @ covariance @ proposed
+            d = b ** 2 - c * (a - (budget / self.z) ** 2)
+            factor = float(np.clip((-b + np.sqrt(max(d, 0.0))) / c, 0.0, 1.0))
+
+        for signal in candidates:
+            signal.position_size *= factor
+        if factor < 1.0:
+            logging.info(f"Scaled {len(candidates)} candidate positions by {factor:.2f} to stay within a "
+                         f"{budget:.2f} VaR budget")
+        return factor, self.report(current + factor * proposed)
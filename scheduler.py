@@ -0,0 +1,126 @@
+# scheduler.py
+#
+# Runs signal cycles on bar-close boundaries of the configured timeframe instead of sleeping a fixed
+# interval after each cycle, so processing time does not push later cycles back.
+
+import logging
+import time
+
+import pandas as pd
+
+from data_sources import WallClock
+
+
+class Cycle:
+    def __init__(self, clock, bar_close, scheduled_at, deadline, symbol_budget):
+        self.clock = clock
+        self.bar_close = bar_close
+        self.scheduled_at = scheduled_at
+        self.started_at = clock.now()
+        self.deadline = deadline
+        self.symbol_budget = symbol_budget
+        self.lateness = (self.started_at - scheduled_at).total_seconds()
+        self._start = time.perf_counter()
+        self.durations = {}
+        self.over_budget = []
+        self.deferred = []
+
+    def expired(self):
+        return self.clock.now() >= self.deadline
+
+    def record(self, symbol, seconds):
+        self.durations[symbol] = seconds
+        if seconds > self.symbol_budget:
+            self.over_budget.append(symbol)
+            logging.warning(f"{symbol} took {seconds:.1f}s, over its {self.symbol_budget}s budget")
+
+    def defer(self, symbols):
+        self.deferred.extend(symbols)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+
+class BarCloseScheduler:
+    def __init__(self, config, instrumentation=None, clock=None, bar_source=None):
+        scheduler_config = config.get('scheduler', {})
+        self.interval = pd.Timedelta(config['data_parameters']['timeframe'])
+        self.settle_delay = pd.Timedelta(seconds=scheduler_config.get('settle_delay', 5))
+        self.cycle_deadline = pd.Timedelta(seconds=scheduler_config.get('cycle_deadline',
+                                                                        self.interval.total_seconds() / 2))
+        self.symbol_budget = scheduler_config.get('symbol_budget', 20)
+        self.instrumentation = instrumentation
+        self.clock = clock or WallClock()  # Replayed and synthetic sources bring their own
+        self.bar_source = bar_source  # A streaming source signals bar closes instead of waiting out the settle delay
+
+        self.latency = {}  # symbol -> smoothed processing seconds
+        self.last_bar = {}  # symbol -> bar close it was last processed for
+        self.deferred = set()  # Symbols the previous cycle ran out of time for
+        self.last_cycle_bar = None
+        self.missed_bars = 0
+
+    def next_bar_close(self, now=None):
+        now = self.clock.now() if now is None else now
+        return now.floor(self.interval) + self.interval
+
+    async def next_cycle(self, immediate=False):
+        # The most recent close is still worth processing until its deadline; otherwise wait for the next one
+        now = self.clock.now()
+        latest_close = now.floor(self.interval)
+        if immediate or (latest_close != self.last_cycle_bar and now < latest_close + self.cycle_deadline):
+            bar_close = latest_close
+        else:
+            bar_close = latest_close + self.interval
+        scheduled_at = bar_close + self.settle_delay
+        if not immediate and self.bar_source is not None:
+            await self.clock.sleep(max(0.0, (bar_close - self.clock.now()).total_seconds()))
+            await self.bar_source.wait_closed(bar_close, self.settle_delay.total_seconds())
+            scheduled_at = bar_close
+        elif not immediate:
+            await self.clock.sleep(max(0.0, (scheduled_at - self.clock.now()).total_seconds()))
+
+        if self.last_cycle_bar is not None:
+            missed = int((bar_close - self.last_cycle_bar) / self.interval) - 1
+            if missed > 0:
+                self.missed_bars += missed
+                logging.warning(f"Skipped {missed} bar closes since {self.last_cycle_bar}; the previous cycle overran")
+        self.last_cycle_bar = bar_close
+        # An immediate cycle may start long after the close, so its deadline runs from now
+        deadline = (self.clock.now() if immediate else bar_close) + self.cycle_deadline
+        return Cycle(self.clock, bar_close, scheduled_at, deadline, self.symbol_budget)
+
+    def order(self, symbols):
+        # Symbols the last cycle deferred go first, then those left behind longest, then the fastest, so a
+        # symbol that missed a deadline is not pushed back again by faster ones and one slow symbol delays no one
+        return sorted(symbols, key=lambda symbol: (symbol not in self.deferred,
+                                                   self.last_bar.get(symbol, pd.Timestamp.min),
+                                                   self.latency.get(symbol, 0.0)))
+
+    def finish(self, cycle):
+        for symbol, seconds in cycle.durations.items():
+            self.last_bar[symbol] = cycle.bar_close
+            previous = self.latency.get(symbol)
+            self.latency[symbol] = seconds if previous is None else 0.8 * previous + 0.2 * seconds
+        self.deferred = set(cycle.deferred)
+
+        report = {
+            'bar_close': cycle.bar_close,
+            'start_lateness': cycle.lateness,
+            'duration': cycle.elapsed,
+            'processed': len(cycle.durations),
+            'over_budget': len(cycle.over_budget),
+            'deferred': len(cycle.deferred),
+            'missed_bars': self.missed_bars,
+        }
+        if self.instrumentation is not None:
+            self.instrumentation.observe('cycle_start_lateness', max(cycle.lateness, 0.0))
+            self.instrumentation.observe('cycle_completion', (self.clock.now() - cycle.bar_close).total_seconds())
+
+        message = (f"Bar {cycle.bar_close}: started {cycle.lateness:.1f}s late, {report['processed']} symbols "
+                   f"in {cycle.elapsed:.1f}s, {report['over_budget']} over budget, {report['deferred']} deferred")
+        if cycle.deferred:
+            logging.warning(f"{message} ({', '.join(cycle.deferred)} missed the deadline)")
+        else:
+            logging.info(message)
+        return report
@@ -1,123 +1,176 @@
-import pandas as pd
-import numpy as np
-
-
-class SignalGenerator:
-    def __init__(self, config, risk_management, ml_predictor, market_regime_detector):
-        self.config = config
-        self.risk_management = risk_management
-        self.ml_predictor = ml_predictor
-        self.market_regime_detector = market_regime_detector
-
-    def generate_signal(self, df, symbol):
-        # Detect market regime
-        regime, regime_probs = self.market_regime_detector.detect_regime(df['close'])
-
-        # Generate prediction using ML model
-        ml_prediction = self.ml_predictor.predict(df)
-
-        # Calculate technical indicators
-        df = self._calculate_indicators(df)
-
-        # Generate signal based on strategies
-        momentum_signal = self._momentum_strategy(df)
-        mean_reversion_signal = self._mean_reversion_strategy(df)
-        breakout_signal = self._breakout_strategy(df)
-
-        # Combine signals
-        combined_signal = self._combine_signals(momentum_signal, mean_reversion_signal, breakout_signal, ml_prediction)
-
-        if combined_signal != 0:
-            action = "BUY" if combined_signal > 0 else "SELL"
-            entry_price = df['close'].iloc[-1]
-            stop_loss, take_profit = self.risk_management.calculate_stop_loss_take_profit(entry_price, action)
-            leverage = self.risk_management.calculate_leverage(df['close'].pct_change().std())
-
-            explanation = self._generate_explanation(df, regime, combined_signal, ml_prediction)
-
-            return {
-                "symbol": symbol,
-                "action": action,
-                "entry_price": entry_price,
-                "stop_loss": stop_loss,
-                "take_profit": take_profit,
-                "leverage": leverage,
-                "explanation": explanation
-            }
-
-        return None
-
-    def _calculate_indicators(self, df):
-        df['SMA_50'] = df['close'].rolling(window=50).mean()
-        df['SMA_200'] = df['close'].rolling(window=200).mean()
-        df['RSI'] = self._calculate_rsi(df['close'])
-        return df
-
-    def _calculate_rsi(self, prices, period=14):
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        return 100 - (100 / (1 + rs))
-
-    def _momentum_strategy(self, df):
-        if df['close'].iloc[-1] > df['SMA_50'].iloc[-1] and df['RSI'].iloc[-1] < 70:
-            return 1
-        elif df['close'].iloc[-1] < df['SMA_50'].iloc[-1] and df['RSI'].iloc[-1] > 30:
-            return -1
-        return 0
-
-    def _mean_reversion_strategy(self, df):
-        if df['RSI'].iloc[-1] < 30 and df['close'].iloc[-1] < df['SMA_200'].iloc[-1]:
-            return 1
-        elif df['RSI'].iloc[-1] > 70 and df['close'].iloc[-1] > df['SMA_200'].iloc[-1]:
-            return -1
-        return 0
-
-    def _breakout_strategy(self, df):
-        highest_high = df['high'].rolling(window=20).max()
-        lowest_low = df['low'].rolling(window=20).min()
-
-        if df['close'].iloc[-1] > highest_high.iloc[-2]:
-            return 1
-        elif df['close'].iloc[-1] < lowest_low.iloc[-2]:
-            return -1
-        return 0
-
-    def _combine_signals(self, momentum, mean_reversion, breakout, ml_prediction):
-        combined = (
-                self.config['capital_allocation']['momentum'] * momentum +
-                self.config['capital_allocation']['mean_reversion'] * mean_reversion +
-                self.config['capital_allocation']['breakout'] * breakout
-        )
-
-        # Incorporate ML prediction
-        if (combined > 0 and ml_prediction > 0) or (combined < 0 and ml_prediction < 0):
-            return combined * 1.2  # Strengthen the signal if ML agrees
-        elif (combined > 0 and ml_prediction < 0) or (combined < 0 and ml_prediction > 0):
-            return combined * 0.8  # Weaken the signal if ML disagrees
-        return combined
-
-    def _generate_explanation(self, df, regime, signal, ml_prediction):
-        explanation = f"In the past {len(df)} periods, "
-
-        if signal > 0:
-            explanation += "there has been a bullish trend. "
-        elif signal < 0:
-            explanation += "there has been a bearish trend. "
-
-        explanation += f"The current market regime is {self.market_regime_detector.regime_description(regime)}. "
-
-        if ml_prediction > 0:
-            explanation += "The machine learning model predicts an upward movement. "
-        elif ml_prediction < 0:
-            explanation += "The machine learning model predicts a downward movement. "
-
-        explanation += f"The RSI is currently at {df['RSI'].iloc[-1]:.2f}, "
-
-        if df['close'].iloc[-1] > df['SMA_50'].iloc[-1]:
-            explanation += "and the price is above the 50-period moving average. "
-        else:
-            explanation += "and the price is below the 50-period moving average. "
-
-        return explanation
\ No newline at end of file
+import functools
+
+import pandas as pd
+import numpy as np
+from data_sources import WallClock
+from feature_store import frame_key, shared_store
+from panel import combine_signals, score_universe, strategy_indicators, strategy_signals
+from resampler import Resampler
+from signal_record import Signal
+
+
+def explain_signal(n_periods, signal, regime_description, ml_prediction, rsi, above_sma, sma_fast):
+    # Module-level and fed only scalars, so a pending explanation is cheap to keep and to pickle
+    explanation = f"In the past {n_periods} periods, "
+
+    if signal > 0:
+        explanation += "there has been a bullish trend. "
+    elif signal < 0:
+        explanation += "there has been a bearish trend. "
+
+    explanation += f"The current market regime is {regime_description}. "
+
+    if ml_prediction > 0:
+        explanation += "The machine learning model predicts an upward movement. "
+    elif ml_prediction < 0:
+        explanation += "The machine learning model predicts a downward movement. "
+
+    explanation += f"The RSI is currently at {rsi:.2f}, "
+
+    if above_sma:
+        explanation += f"and the price is above the {sma_fast}-period moving average. "
+    else:
+        explanation += f"and the price is below the {sma_fast}-period moving average. "
+
+    return explanation
+
+
+class SignalGenerator:
+    def __init__(self, config, risk_management, ml_predictor, market_regime_detector, feature_store=None,
+                 resampler=None, clock=None):
+        self.config = config
+        self.risk_management = risk_management
+        self.ml_predictor = ml_predictor
+        self.market_regime_detector = market_regime_detector
+        self.sma_fast = config.get('sma_fast', 50)
+        self.sma_slow = config.get('sma_slow', 200)
+        self.rsi_period = config.get('rsi_period', 14)
+        self.rsi_overbought = config.get('rsi_overbought', 70)
+        self.rsi_oversold = config.get('rsi_oversold', 30)
+        self.breakout_window = config.get('breakout_window', 20)
+        self.feature_store = feature_store if feature_store is not None else shared_store()
+        # Signals against the trend of a higher timeframe, derived from the same bars, are dropped
+        self.confirmation_timeframe = config.get('confirmation_timeframe')
+        self.confirmation_sma = config.get('confirmation_sma', 20)
+        if resampler is None and self.confirmation_timeframe:
+            resampler = Resampler([self.confirmation_timeframe])
+        self.resampler = resampler
+        self.clock = clock or WallClock()  # Decides which bars have closed when deriving confirmation bars
+
+    def generate_signal(self, df, symbol, ml_prediction=None):
+        # Detect market regime
+        regime, regime_probs = self.market_regime_detector.detect_regime(df['close'], symbol)
+
+        # Generate prediction using ML model, unless the caller already has it from a batched forward pass
+        if ml_prediction is None:
+            ml_prediction = self.ml_predictor.predict(df, symbol) if self.ml_predictor is not None else 0.0
+
+        # Calculate technical indicators
+        indicators = self._calculate_indicators(df, symbol)
+
+        # Generate signal based on strategies
+        momentum_signal = self._momentum_strategy(df, indicators)
+        mean_reversion_signal = self._mean_reversion_strategy(df, indicators)
+        breakout_signal = self._breakout_strategy(df, indicators)
+
+        # Combine signals
+        combined_signal = self._combine_signals(momentum_signal, mean_reversion_signal, breakout_signal, ml_prediction)
+        if self.confirmation_timeframe and combined_signal != 0:
+            combined_signal = self._confirm(df, symbol, combined_signal)
+
+        if combined_signal != 0:
+            action = "BUY" if combined_signal > 0 else "SELL"
+            entry_price = df['close'].iloc[-1]
+            stop_loss, take_profit = self.risk_management.calculate_stop_loss_take_profit(entry_price, action)
+            leverage = self.risk_management.calculate_leverage(df['close'].pct_change().std())
+
+            regime_description = self.market_regime_detector.regime_description(regime)
+            explain = functools.partial(explain_signal, len(df), combined_signal, regime_description, ml_prediction,
+                                        float(indicators['RSI'][-1]),
+                                        bool(entry_price > indicators[f'SMA_{self.sma_fast}'][-1]), self.sma_fast)
+
+            return Signal(symbol, action, entry_price, stop_loss, take_profit, leverage, ml_prediction=ml_prediction,
+                          regime=regime_description, timestamp=self.clock.now(), explain=explain)
+
+        return None
+
+    def bars(self, symbol, timeframe, include_partial=False):
+        # Bars of a derived timeframe, built in memory from the frames this generator has seen
+        return self.resampler.frame(symbol, timeframe, include_partial)
+
+    def _confirm(self, df, symbol, combined_signal):
+        self.resampler.update(symbol, df, self.clock.now())
+        higher = self.bars(symbol, self.confirmation_timeframe)
+        if len(higher) < self.confirmation_sma:
+            return combined_signal  # Not enough higher-timeframe history to judge the trend yet
+        sma = self.feature_store.get(higher, 'sma', frame_key(higher, symbol, self.confirmation_timeframe),
+                                     window=self.confirmation_sma)[-1]
+        trend = np.sign(higher['Close'].iloc[-1] - sma)
+        return combined_signal if trend * combined_signal >= 0 else 0
+
+    def score_universe(self, panel, ml_predictions=None):
+        # Vectorised form of the strategy checks above for every symbol of a PricePanel in one pass
+        return score_universe(panel, self.config['capital_allocation'], ml_predictions, None, self.sma_fast,
+                              self.sma_slow, self.rsi_period, self.rsi_overbought, self.rsi_oversold,
+                              self.breakout_window)
+
+    def precompute_signals(self, panel, indicators=None):
+        # Combined signal of every bar for every symbol (without the ML term), for backtests
+        if indicators is None:
+            indicators = strategy_indicators(panel, self.sma_fast, self.sma_slow, self.rsi_period,
+                                             self.breakout_window)
+        momentum, mean_reversion, breakout = strategy_signals(panel, indicators, self.sma_fast, self.sma_slow,
+                                                              self.rsi_overbought, self.rsi_oversold)
+        return combine_signals(momentum, mean_reversion, breakout, self.config['capital_allocation'])
+
+    def _calculate_indicators(self, df, symbol=None):
+        # Read-only arrays from the shared feature store, so nothing is added to (or copied from) df
+        key = frame_key(df, symbol)
+        store = self.feature_store
+        return {
+            f'SMA_{self.sma_fast}': store.get(df, 'sma', key, window=self.sma_fast),
+            f'SMA_{self.sma_slow}': store.get(df, 'sma', key, window=self.sma_slow),
+            'RSI': store.get(df, 'rsi', key, period=self.rsi_period),
+            'Highest_High': store.get(df, 'rolling_max', key, column='high', window=self.breakout_window),
+            'Lowest_Low': store.get(df, 'rolling_min', key, column='low', window=self.breakout_window),
+        }
+
+    def _momentum_strategy(self, df, indicators):
+        close, rsi = df['close'].iloc[-1], indicators['RSI'][-1]
+        sma_fast = indicators[f'SMA_{self.sma_fast}'][-1]
+        if close > sma_fast and rsi < self.rsi_overbought:
+            return 1
+        elif close < sma_fast and rsi > self.rsi_oversold:
+            return -1
+        return 0
+
+    def _mean_reversion_strategy(self, df, indicators):
+        close, rsi = df['close'].iloc[-1], indicators['RSI'][-1]
+        sma_slow = indicators[f'SMA_{self.sma_slow}'][-1]
+        if rsi < self.rsi_oversold and close < sma_slow:
+            return 1
+        elif rsi > self.rsi_overbought and close > sma_slow:
+            return -1
+        return 0
+
+    def _breakout_strategy(self, df, indicators):
+        close = df['close'].iloc[-1]
+        if close > indicators['Highest_High'][-2]:
+            return 1
+        elif close < indicators['Lowest_Low'][-2]:
+            return -1
+        return 0
+
+    def _combine_signals(self, momentum, mean_reversion, breakout, ml_prediction):
+        combined = (
+                self.config['capital_allocation']['momentum'] * momentum +
+                self.config['capital_allocation']['mean_reversion'] * mean_reversion +
+                self.config['capital_allocation']['breakout'] * breakout
+        )
+
+        # Incorporate ML prediction
+        if (combined > 0 and ml_prediction > 0) or (combined < 0 and ml_prediction < 0):
+            return combined * 1.2  # Strengthen the signal if ML agrees
+        elif (combined > 0 and ml_prediction < 0) or (combined < 0 and ml_prediction > 0):
+            return combined * 0.8  # Weaken the signal if ML disagrees
+        return combined
@@ -0,0 +1,213 @@
+# signal_journal.py
+#
+# Append-only store of generated signals: JSON lines in numbered segment files, rotated by size.
+# Only the lines written in a cycle touch the disk; an in-memory index of (timestamp, segment,
+# offset) per symbol serves reads, and a heap ordered by expiry time tracks the active signals.
+
+import bisect
+import heapq
+import itertools
+import json
+import logging
+import os
+
+import pandas as pd
+
+from signal_record import Signal
+from utils import utc_now
+
+FSYNC_POLICIES = ('always', 'commit', 'never')
+
+
+def _encode(value):
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()  # NumPy scalars
+    return str(value)
+
+
+def _decode(line):
+    record = json.loads(line)
+    if 'timestamp' in record:
+        record['timestamp'] = pd.Timestamp(record['timestamp'])
+    return record
+
+
+class SignalJournal:
+    def __init__(self, directory, segment_max_bytes=16 * 1024 * 1024, fsync='commit', validity_window=600,
+                 readonly=False, clock=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync} (expected one of {', '.join(FSYNC_POLICIES)})")
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync = fsync
+        self.validity_window = pd.Timedelta(seconds=validity_window)
+        self.readonly = readonly
+        self.clock = clock  # Replayed runs expire signals in replayed time; naive UTC otherwise
+
+        self.symbol_index = {}  # symbol -> [(timestamp ns, segment, offset)] in append order
+        self.timestamps = {}  # symbol -> [timestamp ns], parallel to symbol_index for bisect
+        self._indexed = {}  # segment -> bytes indexed so far
+        self._expiry_heap = []  # (expiry ns, sequence, record)
+        self._sequence = itertools.count()
+        self._file = None
+        self._segment = None
+
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+        self.refresh()
+        if not readonly:
+            self._open_segment(self.segments()[-1] if self.segments() else 1)
+
+    def _now(self):
+        return self.clock.now() if self.clock is not None else utc_now()
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"signals-{segment:06d}.jsonl")
+
+    def segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(name[len('signals-'):-len('.jsonl')]) for name in os.listdir(self.directory)
+                      if name.startswith('signals-') and name.endswith('.jsonl'))
+
+    def _open_segment(self, segment):
+        path = self._path(segment)
+        if os.path.exists(path):
+            # A crash can leave a partial last line; cut it off so appends start on a line boundary
+            with open(path, 'r+b') as f:
+                size = f.seek(0, os.SEEK_END)
+                if size != self._indexed.get(segment, 0):
+                    logging.warning(f"Truncating {size - self._indexed.get(segment, 0)} bytes of a partial "
+                                    f"record at the end of {path}")
+                    f.truncate(self._indexed.get(segment, 0))
+        self._file = open(path, 'ab')
+        self._segment = segment
+        self._indexed.setdefault(segment, self._file.tell())
+
+    def _index_line(self, record, segment, offset, now_ns):
+        symbol = record.get('symbol')
+        timestamp = pd.Timestamp(record['timestamp']).value
+        self.symbol_index.setdefault(symbol, []).append((timestamp, segment, offset))
+        self.timestamps.setdefault(symbol, []).append(timestamp)
+        expiry = timestamp + self.validity_window.value
+        if expiry > now_ns:
+            heapq.heappush(self._expiry_heap, (expiry, next(self._sequence), record))
+
+    def refresh(self):
+        # Index lines appended since the last call (by this or another process); returns the number indexed
+        now_ns = self._now().value
+        count = 0
+        for segment in self.segments():
+            path = self._path(segment)
+            start = self._indexed.get(segment, 0)
+            if os.path.getsize(path) <= start:
+                continue
+            with open(path, 'rb') as f:
+                f.seek(start)
+                offset = start
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # Partial line still being written, or left by a crash
+                    self._index_line(_decode(line), segment, offset, now_ns)
+                    offset += len(line)
+                    count += 1
+            self._indexed[segment] = offset
+        return count
+
+    def append(self, signals):
+        if self.readonly:
+            raise PermissionError("Journal was opened read-only")
+        if isinstance(signals, (dict, Signal)):
+            signals = [signals]
+        if not signals:
+            return
+
+        now_ns = self._now().value
+        offset = self._indexed[self._segment]
+        for signal in signals:
+            if isinstance(signal, Signal):
+                signal = signal.to_dict(explanation=False)  # Rendered only when someone asks for it
+            if 'timestamp' not in signal:
+                signal = {**signal, 'timestamp': pd.Timestamp(now_ns)}
+            line = (json.dumps(signal, default=_encode) + '\n').encode()
+            self._file.write(line)
+            self._index_line(_decode(line), self._segment, offset, now_ns)
+            offset += len(line)
+        self._indexed[self._segment] = offset
+
+        self._file.flush()
+        if self.fsync == 'always':
+            os.fsync(self._file.fileno())
+        if offset >= self.segment_max_bytes:
+            self._rotate()
+
+    def commit(self):
+        # Durability point for the 'commit' policy, called once per cycle
+        if self._file is not None and self.fsync == 'commit':
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _rotate(self):
+        self._file.flush()
+        if self.fsync != 'never':
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._open_segment(self._segment + 1)
+
+    def expire(self, now=None):
+        # Pops signals whose validity window has passed; returns them oldest first
+        now_ns = (self._now() if now is None else pd.Timestamp(now)).value
+        expired = []
+        while self._expiry_heap and self._expiry_heap[0][0] <= now_ns:
+            expired.append(heapq.heappop(self._expiry_heap)[2])
+        return expired
+
+    def active(self, now=None):
+        self.expire(now)
+        return [record for _, _, record in sorted(self._expiry_heap)]
+
+    def _read_entries(self, entries):
+        handles = {}
+        try:
+            for _, segment, offset in entries:
+                if segment not in handles:
+                    handles[segment] = open(self._path(segment), 'rb')
+                handles[segment].seek(offset)
+                yield _decode(handles[segment].readline())
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+    def read(self, symbol=None, start=None, end=None):
+        # Signals in append order, optionally for one symbol and within [start, end]
+        start_ns = pd.Timestamp(start).value if start is not None else None
+        end_ns = pd.Timestamp(end).value if end is not None else None
+        symbols = [symbol] if symbol is not None else list(self.symbol_index)
+        entries = []
+        for name in symbols:
+            timestamps = self.timestamps.get(name, [])
+            low = bisect.bisect_left(timestamps, start_ns) if start_ns is not None else 0
+            high = bisect.bisect_right(timestamps, end_ns) if end_ns is not None else len(timestamps)
+            entries.extend(self.symbol_index.get(name, [])[low:high])
+        if symbol is None:
+            entries.sort(key=lambda entry: (entry[1], entry[2]))
+        return self._read_entries(entries)
+
+    def read_signals(self, symbol=None, start=None, end=None):
+        return (Signal.from_dict(record) for record in self.read(symbol, start, end))
+
+    def to_frame(self, symbol=None, start=None, end=None):
+        return pd.DataFrame(list(self.read(symbol, start, end)))
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.symbol_index.values())
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync != 'never':
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
@@ -0,0 +1,162 @@
+# signal_record.py
+#
+# Typed signal record shared by the generators, the journal and the analytics. Signal is slotted and
+# keeps only scalars; its explanation is rendered on first access, so signals that are never logged
+# or exported never build the text. SignalBatch holds a cycle's signals as contiguous columns that
+# DataFrame and Arrow tables can wrap without copying.
+
+import functools
+
+import numpy as np
+import pandas as pd
+
+from utils import utc_now
+
+NUMERIC_FIELDS = {'timestamp': 'i8', 'direction': 'i1', 'entry_price': 'f8', 'stop_loss': 'f8', 'take_profit': 'f8',
+                  'leverage': 'f8', 'position_size': 'f8', 'ml_prediction': 'f8'}
+CATEGORICAL_FIELDS = {'symbol': 'S16', 'strategy': 'S16', 'regime': 'S24'}  # ASCII bytes, not 4-byte code points
+ACTIONS = ('SELL', 'BUY')  # Indexed by direction > 0
+
+SIGNAL_DTYPE = np.dtype([(name, dtype) for name, dtype in CATEGORICAL_FIELDS.items()] +
+                        [(name, dtype) for name, dtype in NUMERIC_FIELDS.items()])
+
+
+class Signal:
+    __slots__ = ('symbol', 'strategy', 'direction', 'entry_price', 'stop_loss', 'take_profit', 'leverage',
+                 'position_size', 'ml_prediction', 'regime', 'timestamp', '_explain', '_explanation')
+
+    def __init__(self, symbol, action, entry_price, stop_loss, take_profit, leverage, position_size=np.nan,
+                 strategy='combined', ml_prediction=0.0, regime='', timestamp=None, explain=None):
+        self.symbol = symbol
+        self.strategy = strategy
+        self.direction = 1 if str(action).upper() == 'BUY' else -1
+        self.entry_price = float(entry_price)
+        self.stop_loss = float(stop_loss)
+        self.take_profit = float(take_profit)
+        self.leverage = float(leverage)
+        self.position_size = float(position_size)
+        self.ml_prediction = float(ml_prediction)
+        self.regime = regime
+        # Nanoseconds, naive UTC like the bars; replayed runs pass their clock's time
+        self.timestamp = utc_now().value if timestamp is None else pd.Timestamp(timestamp).value
+        self._explain = explain  # Zero-argument callable returning the explanation text
+        self._explanation = None
+
+    @property
+    def action(self):
+        return ACTIONS[self.direction > 0]
+
+    @property
+    def time(self):
+        return pd.Timestamp(self.timestamp)
+
+    @property
+    def explanation(self):
+        if self._explanation is None:
+            self._explanation = self._explain() if self._explain is not None else ''
+            self._explain = None  # Drops whatever the callable kept alive
+        return self._explanation
+
+    def describe(self, validity_window=None):
+        lines = [f"Signal for {self.symbol} ({self.strategy} strategy):",
+                 f"Action: {self.action}",
+                 f"Entry Price: {self.entry_price:.2f}",
+                 f"Stop Loss: {self.stop_loss:.2f}",
+                 f"Take Profit: {self.take_profit:.2f}",
+                 f"Leverage: {self.leverage:.2f}x"]
+        if not np.isnan(self.position_size):
+            lines.append(f"Position Size: {self.position_size:.4f}")
+        lines.append(f"Generated At: {self.time}")
+        if validity_window is not None:
+            lines.append(f"Valid Until: {self.time + pd.Timedelta(seconds=validity_window)}")
+        lines += ['', 'Explanation:', self.explanation, '']
+        if self.regime:
+            lines.append(f"Market Regime: {self.regime}")
+        lines.append(f"ML Prediction: {self.ml_prediction:.2f}")
+        return '\n'.join(lines)
+
+    def __str__(self):
+        # Lets logging render the text only when the record is actually emitted
+        return self.describe()
+
+    def __repr__(self):
+        return f"Signal({self.symbol!r}, {self.action}, {self.entry_price:.4f}, strategy={self.strategy!r})"
+
+    def to_dict(self, explanation=True):
+        record = {'symbol': self.symbol, 'strategy': self.strategy, 'action': self.action,
+                  'entry_price': self.entry_price, 'stop_loss': self.stop_loss, 'take_profit': self.take_profit,
+                  'leverage': self.leverage, 'ml_prediction': self.ml_prediction,
+                  'position_size': None if np.isnan(self.position_size) else self.position_size,
+                  'regime': self.regime, 'timestamp': self.time}
+        if explanation:
+            record['explanation'] = self.explanation
+        return record
+
+    @classmethod
+    def from_dict(cls, record):
+        explanation = record.get('explanation', '')
+        return cls(record['symbol'], record['action'], record['entry_price'], record['stop_loss'],
+                   record['take_profit'], record['leverage'],
+                   np.nan if record.get('position_size') is None else record['position_size'],
+                   record.get('strategy', 'combined'), record.get('ml_prediction', 0.0), record.get('regime', ''),
+                   record.get('timestamp'), functools.partial(str, explanation))
+
+
+class SignalBatch:
+    def __init__(self, signals=()):
+        signals = list(signals)
+        self.columns = {name: np.fromiter((getattr(signal, name) for signal in signals), dtype=dtype,
+                                          count=len(signals))
+                        for name, dtype in NUMERIC_FIELDS.items()}
+        # Categorical fields are stored as codes into a small list of distinct values
+        self.codes = {}
+        self.categories = {}
+        for name in CATEGORICAL_FIELDS:
+            codes, categories = pd.factorize(np.array([getattr(signal, name) for signal in signals], dtype=object))
+            self.codes[name] = codes.astype('i4')
+            self.categories[name] = list(categories)
+
+    def __len__(self):
+        return len(self.columns['timestamp'])
+
+    @classmethod
+    def from_records(cls, records):
+        batch = cls()
+        batch.columns = {name: np.ascontiguousarray(records[name]) for name in NUMERIC_FIELDS}
+        for name in CATEGORICAL_FIELDS:
+            codes, categories = pd.factorize(records[name])
+            batch.codes[name] = codes.astype('i4')
+            batch.categories[name] = [category.decode() for category in categories]
+        return batch
+
+    def to_records(self):
+        records = np.empty(len(self), dtype=SIGNAL_DTYPE)
+        for name, column in self.columns.items():
+            records[name] = column
+        for name, dtype in CATEGORICAL_FIELDS.items():
+            categories = np.array([category.encode() for category in self.categories[name]], dtype=object)
+            too_long = [category for category in self.categories[name] if len(category) > SIGNAL_DTYPE[name].itemsize]
+            if too_long:
+                raise ValueError(f"{name} values too long for {dtype} records: {too_long}")
+            records[name] = categories[self.codes[name]] if len(self) else []
+        return records
+
+    def to_frame(self):
+        # The numeric columns and category codes are views of the batch's arrays
+        data = {name: pd.Categorical.from_codes(self.codes[name], self.categories[name])
+                for name in CATEGORICAL_FIELDS}
+        data['timestamp'] = self.columns['timestamp'].view('datetime64[ns]')
+        data.update((name, column) for name, column in self.columns.items() if name != 'timestamp')
+        df = pd.DataFrame(data, copy=False)
+        df.insert(3, 'action', pd.Categorical.from_codes((self.columns['direction'] > 0).astype('i1'), ACTIONS))
+        return df
+
+    def to_arrow(self):
+        import pyarrow as pa  # Optional; only needed by analytics exports
+
+        arrays = {name: pa.DictionaryArray.from_arrays(pa.array(self.codes[name]), pa.array(self.categories[name],
+                                                                                              type=pa.string()))
+                  for name in CATEGORICAL_FIELDS}
+        arrays['timestamp'] = pa.array(self.columns['timestamp'].view('datetime64[ns]'))
+        arrays.update((name, pa.array(column)) for name, column in self.columns.items() if name != 'timestamp')
+        return pa.table(arrays)
@@ -1,33 +1,37 @@
-# strategy.py
-
-class Strategy:
-    def __init__(self, config, strategy_type):
-        self.config = config
-        self.strategy_type = strategy_type
-
-    def generate_signal(self, df, ml_prediction, regime):
-        # Placeholder for strategy logic
-        if self.strategy_type == 'momentum':
-            return self._momentum_strategy(df, ml_prediction, regime)
-        elif self.strategy_type == 'mean_reversion':
-            return self._mean_reversion_strategy(df, ml_prediction, regime)
-        elif self.strategy_type == 'breakout':
-            return self._breakout_strategy(df, ml_prediction, regime)
-        else:
-            return {'action': 'hold'}
-
-    def _momentum_strategy(self, df, ml_prediction, regime):
-        # Placeholder for momentum strategy
-        return {'action': 'hold', 'stop_loss': 0, 'take_profit': 0}
-
-    def _mean_reversion_strategy(self, df, ml_prediction, regime):
-        # Placeholder for mean reversion strategy
-        return {'action': 'hold', 'stop_loss': 0, 'take_profit': 0}
-
-    def _breakout_strategy(self, df, ml_prediction, regime):
-        # Placeholder for breakout strategy
-        return {'action': 'hold', 'stop_loss': 0, 'take_profit': 0}
-
-    def explain_signal(self, df, signal, regime):
-        # Placeholder for signal explanation
+# strategy.py
+
+class Strategy:
+    def __init__(self, config, strategy_type, resampler=None):
+        self.config = config
+        self.strategy_type = strategy_type
+        self.resampler = resampler  # Higher-timeframe bars derived from the base feed
+
+    def bars(self, symbol, timeframe, include_partial=False):
+        return self.resampler.frame(symbol, timeframe, include_partial)
+
+    def generate_signal(self, df, ml_prediction, regime):
+        # Placeholder for strategy logic
+        if self.strategy_type == 'momentum':
+            return self._momentum_strategy(df, ml_prediction, regime)
+        elif self.strategy_type == 'mean_reversion':
+            return self._mean_reversion_strategy(df, ml_prediction, regime)
+        elif self.strategy_type == 'breakout':
+            return self._breakout_strategy(df, ml_prediction, regime)
+        else:
+            return {'action': 'hold'}
+
+    def _momentum_strategy(self, df, ml_prediction, regime):
+        # Placeholder for momentum strategy
+        return {'action': 'hold', 'stop_loss': 0, 'take_profit': 0}
+
+    def _mean_reversion_strategy(self, df, ml_prediction, regime):
+        # Placeholder for mean reversion strategy
+        return {'action': 'hold', 'stop_loss': 0, 'take_profit': 0}
+
+    def _breakout_strategy(self, df, ml_prediction, regime):
+        # Placeholder for breakout strategy
+        return {'action': 'hold', 'stop_loss': 0, 'take_profit': 0}
+
+    def explain_signal(self, n_periods, signal, regime):
+        # Placeholder for signal explanation
         return "Signal explanation placeholder"
\ No newline at end of file
@@ -0,0 +1,294 @@
+# stream_ingest.py
+#
+# Push-based market data for data_source.type 'stream': ticks arrive as JSON lines over TCP, are
+# aggregated into bars of the configured timeframe and kept in a fixed-capacity NumPy ring buffer per
+# symbol, so a cycle reads bars from memory instead of re-downloading history. The scheduler waits on
+# wait_closed() to start a cycle as soon as the bars have closed. FakeTickServer stands in for an
+# exchange feed offline.
+
+import argparse
+import asyncio
+import json
+import logging
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from bar_cache import BarCache, BarRing
+from data_sources import DataSource, create_source
+from utils import utc_now
+
+
+class BarAggregator:
+    # Builds the forming bar of one symbol; it closes on the first tick of a later bar or on flush()
+    def __init__(self, interval):
+        self.interval_ns = pd.Timedelta(interval).value
+        self.bar = None  # [open time ns, open, high, low, close, volume]
+        self.late_ticks = 0
+
+    def add(self, timestamp_ns, price, size=0.0):
+        start = timestamp_ns - timestamp_ns % self.interval_ns
+        closed = None
+        if self.bar is not None:
+            if start < self.bar[0]:
+                self.late_ticks += 1  # Its bar has already been emitted
+                return None
+            if start > self.bar[0]:
+                closed = tuple(self.bar)
+                self.bar = None
+        if self.bar is None:
+            self.bar = [start, price, price, price, price, size]
+        else:
+            self.bar[2] = max(self.bar[2], price)
+            self.bar[3] = min(self.bar[3], price)
+            self.bar[4] = price
+            self.bar[5] += size
+        return closed
+
+    def flush(self, now_ns):
+        # Closes the forming bar once its interval has ended, for symbols that went quiet at the boundary
+        if self.bar is not None and self.bar[0] + self.interval_ns <= now_ns:
+            closed, self.bar = tuple(self.bar), None
+            return closed
+        return None
+
+
+def ring_capacity(config):
+    # The longest indicator window has to be warm before the LSTM's lookback window starts
+    strategy_config = config.get('strategy', {})
+    regime_config = config.get('regime_detection', {})
+    longest_window = max(strategy_config.get('sma_slow', 200), strategy_config.get('fib_period', 100),
+                         strategy_config.get('ma_period', 50),
+                         regime_config.get('lookback_period', 100) + regime_config.get('volatility_window', 20))
+    return longest_window + strategy_config.get('lstm_lookback', 60)
+
+
+class StreamDataSource(DataSource):
+    cacheable = False
+    streaming = True
+
+    def __init__(self, config):
+        super().__init__(config)
+        stream_config = config.get('data_source', {}).get('stream', {})
+        self.host = stream_config.get('host', '127.0.0.1')
+        self.port = stream_config.get('port', 9100)
+        self.capacity = stream_config.get('capacity') or ring_capacity(config)
+        self.reconnect_delay = stream_config.get('reconnect_delay', 1.0)
+        self.reconnect_max = stream_config.get('reconnect_max', 30.0)
+        self.symbols = list(config.get('trading', {}).get('symbols', []))
+
+        # Bars from before the connection, or missed while disconnected, come from a polling source
+        self.backfill = None
+        backfill_type = stream_config.get('backfill')
+        if backfill_type:
+            self.backfill = create_source({**config, 'data_source': {**config['data_source'], 'type': backfill_type}})
+
+        self.rings = {symbol: BarRing(self.capacity) for symbol in self.symbols}
+        self.aggregators = {symbol: BarAggregator(self.interval) for symbol in self.symbols}
+        self.last_price = {}
+        self.last_closed = {}  # symbol -> open time ns of its newest closed bar
+        self._stale = set(self.symbols)  # Symbols whose ring needs a backfill before it is served
+        self._lock = threading.Lock()  # Ticks land on the event loop, reads come from fetch threads
+        self._bar_closed = asyncio.Event()
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                logging.warning(f"Cannot connect to tick stream {self.host}:{self.port}: {e}; retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(self.reconnect_max, delay * 2)
+                continue
+
+            delay = self.reconnect_delay
+            logging.info(f"Connected to tick stream {self.host}:{self.port} for {len(self.symbols)} symbols")
+            try:
+                writer.write((json.dumps({'subscribe': self.symbols}) + '\n').encode())
+                await writer.drain()
+                while line := await reader.readline():
+                    try:
+                        tick = json.loads(line)
+                        self._on_tick(tick['symbol'], int(tick['timestamp']), float(tick['price']),
+                                      float(tick.get('size', 0.0)))
+                    except (ValueError, KeyError) as e:
+                        logging.debug(f"Ignoring malformed tick {line[:80]!r}: {e}")
+            except ConnectionError as e:
+                logging.warning(f"Tick stream connection lost: {e}")
+            finally:
+                writer.close()
+
+            logging.warning("Tick stream disconnected; reconnecting")
+            with self._lock:
+                self._stale.update(self.symbols)
+
+    def _on_tick(self, symbol, timestamp_ns, price, size):
+        aggregator = self.aggregators.get(symbol)
+        if aggregator is None:
+            return
+        with self._lock:
+            self.last_price[symbol] = price
+            closed = aggregator.add(timestamp_ns, price, size)
+            if closed is not None:
+                self._close_bar(symbol, closed)
+        if closed is not None:
+            self._bar_closed.set()
+
+    def _close_bar(self, symbol, bar):
+        self.rings[symbol].append(bar)
+        self.last_closed[symbol] = bar[0]
+
+    def flush(self, now):
+        now_ns = pd.Timestamp(now).value
+        with self._lock:
+            for symbol, aggregator in self.aggregators.items():
+                closed = aggregator.flush(now_ns)
+                if closed is not None:
+                    self._close_bar(symbol, closed)
+
+    async def wait_closed(self, bar_close, timeout):
+        # Returns once every symbol has closed the bar ending at bar_close, or after timeout seconds
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        target = (bar_close - self.interval).value
+        while any(self.last_closed.get(symbol, -1) < target for symbol in self.symbols):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._bar_closed.clear()
+            try:
+                await asyncio.wait_for(self._bar_closed.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        self.flush(bar_close)
+
+    def _refill(self, symbol):
+        # Rebuilds the ring from backfilled bars followed by the streamed bars newer than them. A failed backfill
+        # leaves the symbol stale, so the next read retries it, and the streamed bars are served meanwhile
+        try:
+            records = BarCache._to_records(self.backfill.download_history(symbol))
+        except Exception as e:
+            logging.warning(f"Backfill of {symbol} failed, serving streamed bars only: {e}")
+            return
+        with self._lock:
+            # The backfill's last row is usually the still-forming bar; that bar and later ones come from the stream
+            forming = self.aggregators[symbol].bar
+            open_start = forming[0] if forming is not None else utc_now().floor(self.interval).value
+            records = records[records['timestamp'] < open_start]
+            ring = BarRing(self.capacity)
+            ring.extend(records)
+            ring.extend(self.rings[symbol].records())
+            self.rings[symbol] = ring
+            self._stale.discard(symbol)
+
+    def download_history(self, symbol, start=None):
+        if symbol not in self.rings:
+            raise KeyError(f"{symbol} is not subscribed on the tick stream")
+        if self.backfill is not None and symbol in self._stale:
+            self._refill(symbol)
+        with self._lock:
+            records = self.rings[symbol].records()
+        if not len(records):
+            raise KeyError(f"No bars streamed for {symbol} yet")
+        df = BarCache._to_frame(records)
+        return df if start is None else df[df.index >= pd.Timestamp(start)]
+
+    def download_current_price(self, symbol):
+        price = self.last_price.get(symbol)
+        if price is None:
+            raise KeyError(f"No ticks received for {symbol} yet")
+        return price
+
+
+class FakeTickServer:
+    # Random-walk ticks for every subscribed symbol, standing in for an exchange feed in tests
+    def __init__(self, host='127.0.0.1', port=0, tick_interval=0.1, seed=42, volatility=0.0005):
+        self.host = host
+        self.port = port
+        self.tick_interval = tick_interval
+        self.seed = seed
+        self.volatility = volatility
+        self._server = None
+        self._clients = {}  # writer -> handler task
+        self._closing = False
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]  # Port 0 picks a free one
+        return self
+
+    async def _handle(self, reader, writer):
+        self._clients[writer] = asyncio.current_task()
+        try:
+            symbols = json.loads(await reader.readline())['subscribe']
+            rngs = {symbol: np.random.default_rng([self.seed, zlib.crc32(symbol.encode())]) for symbol in symbols}
+            prices = {symbol: rng.uniform(1, 1000) for symbol, rng in rngs.items()}
+            while not self._closing:
+                timestamp = utc_now().value
+                lines = []
+                for symbol, rng in rngs.items():
+                    prices[symbol] *= np.exp(rng.normal(0, self.volatility))
+                    lines.append(json.dumps({'symbol': symbol, 'timestamp': timestamp, 'price': prices[symbol],
+                                             'size': float(rng.uniform(0.1, 10))}))
+                writer.write(('\n'.join(lines) + '\n').encode())
+                await writer.drain()
+                await asyncio.sleep(self.tick_interval)
+        except (ConnectionError, ValueError, KeyError):
+            pass
+        finally:
+            self._clients.pop(writer, None)
+            writer.close()
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    def drop_clients(self):
+        # Simulates a feed outage so the client's reconnect path runs
+        for writer in list(self._clients):
+            writer.close()
+
+    async def close(self):
+        # Handlers finish their current tick and return; cancelling them makes asyncio log an error
+        self._closing = True
+        await asyncio.gather(*self._clients.values(), return_exceptions=True)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+async def serve(host, port, tick_interval, seed):
+    server = await FakeTickServer(host, port, tick_interval, seed).start()
+    logging.info(f"Fake tick stream on {host}:{server.port}, one tick per symbol every {tick_interval}s")
+    await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake tick stream for data_source.type stream')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--tick-interval', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(args.host, args.port, args.tick_interval, args.seed))
+
+
+if __name__ == '__main__':
+    main()
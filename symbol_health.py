@@ -0,0 +1,144 @@
+# symbol_health.py
+#
+# Per-symbol fetch health, persisted across restarts. Failures and empty frames back a symbol off
+# exponentially (negative caching: it is not fetched again until its retry time), and after enough
+# consecutive failures it is quarantined and only probed every probe_interval. Fetch failures while
+# the whole data source is down are not counted against individual symbols. The report splits the
+# configured universe into active, backing-off and quarantined symbols.
+
+import argparse
+import json
+import logging
+import os
+
+import pandas as pd
+
+from data_sources import WallClock
+from utils import load_config
+
+
+class SymbolHealth:
+    def __init__(self, config, clock=None):
+        health_config = config.get('symbol_health', {})
+        self.path = health_config.get('path', 'symbol_health.json')
+        self.base_backoff = health_config.get('base_backoff', 900)  # Seconds after the first failure, doubled
+        self.max_backoff = health_config.get('max_backoff', 4 * 3600)
+        self.quarantine_after = health_config.get('quarantine_after', 6)  # Consecutive failures
+        self.probe_interval = health_config.get('probe_interval', 24 * 3600)
+        self.clock = clock
+        if clock is not None and not isinstance(clock, WallClock):
+            self.path = None  # Replayed time means nothing to a later run, so nothing is persisted
+        self.symbols = self._load()  # symbol -> health record
+        self._dirty = False
+
+    def _now(self):
+        return (self.clock.now() if self.clock is not None else pd.Timestamp.now()).value / 1e9
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable symbol health file {self.path}: {e}")
+            return {}
+
+    def save(self):
+        if not self._dirty or not self.path:
+            return
+        # Written to a temporary file and renamed, so a crash never leaves a truncated registry
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.symbols, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def _record(self, symbol):
+        record = self.symbols.get(symbol)
+        if record is None:
+            record = self.symbols[symbol] = {'failures': 0, 'total_failures': 0, 'successes': 0, 'latency': None,
+                                             'last_ok': None, 'last_error': None, 'retry_at': 0.0,
+                                             'quarantined': False}
+        self._dirty = True
+        return record
+
+    def due(self, symbols):
+        # Symbols whose negative-cache entry has expired; quarantined ones come back only to be probed
+        now = self._now()
+        return [symbol for symbol in symbols if self.symbols.get(symbol, {}).get('retry_at', 0.0) <= now]
+
+    def probing(self, symbol):
+        return self.symbols.get(symbol, {}).get('failures', 0) > 0
+
+    def record_success(self, symbol, latency):
+        record = self._record(symbol)
+        if record['quarantined']:
+            logging.info(f"{symbol} recovered after {record['failures']} failures; back in the active universe")
+        record.update(failures=0, quarantined=False, retry_at=0.0, last_ok=self._now())
+        record['successes'] += 1
+        previous = record['latency']
+        record['latency'] = latency if previous is None else 0.8 * previous + 0.2 * latency
+
+    def record_failure(self, symbol, reason):
+        record = self._record(symbol)
+        record['failures'] += 1
+        record['total_failures'] += 1
+        record['last_error'] = reason
+        if record['failures'] >= self.quarantine_after:
+            if not record['quarantined']:
+                logging.warning(f"Quarantined {symbol} after {record['failures']} consecutive failures "
+                                f"({reason}); probing every {self.probe_interval / 3600:.0f}h")
+            record['quarantined'] = True
+            delay = self.probe_interval
+        else:
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (record['failures'] - 1))
+        record['retry_at'] = self._now() + delay
+
+    def report(self, universe):
+        now = self._now()
+        report = {'active': [], 'backing_off': [], 'quarantined': []}
+        for symbol in universe:
+            record = self.symbols.get(symbol, {})
+            if record.get('quarantined'):
+                report['quarantined'].append(symbol)
+            elif record.get('retry_at', 0.0) > now:
+                report['backing_off'].append(symbol)
+            else:
+                report['active'].append(symbol)
+        return report
+
+    def summary(self, universe):
+        report = self.report(universe)
+        text = (f"Universe: {len(report['active'])} active, {len(report['backing_off'])} backing off, "
+                f"{len(report['quarantined'])} quarantined")
+        if report['quarantined']:
+            text += f" ({', '.join(report['quarantined'])})"
+        return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Active versus quarantined symbols')
+    parser.add_argument('--config', default='config.yaml')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    health = SymbolHealth(config)
+    now = health._now()
+    print(health.summary(config['trading']['symbols']))
+    for symbol in config['trading']['symbols']:
+        record = health.symbols.get(symbol)
+        if record is None:
+            print(f"{symbol:>12}  no fetches recorded")
+            continue
+        state = ('quarantined' if record['quarantined'] else
+                 'backing off' if record['retry_at'] > now else 'active')
+        retry = (f", retry in {(record['retry_at'] - now) / 60:.0f}m" if record['retry_at'] > now else '')
+        latency = f"{record['latency']:.2f}s" if record['latency'] is not None else '-'
+        print(f"{symbol:>12}  {state:<11}  failures {record['failures']}/{record['total_failures']}  "
+              f"ok {record['successes']}  latency {latency}{retry}"
+              + (f"  last error: {record['last_error']}" if record['failures'] else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+
+import pandas as pd
+
+from async_fetcher import AsyncDataFetcher
+from data_sources import synthetic_ohlcv
+
+
+class FakeFetcher:
+    # Blocking download methods, as the real sources have, with injected latency and failures
+    def __init__(self, latency=0.0, slow=(), fail_first=0, down=False):
+        self.latency = latency
+        self.slow = set(slow)
+        self.fail_first = fail_first  # Failed calls per symbol before it succeeds
+        self.down = down
+        self.frame = synthetic_ohlcv(1, 50)['SYM0-USD']
+        self.calls = []  # (symbol, wall time)
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def _request(self, symbol):
+        with self._lock:
+            self.calls.append((symbol, time.monotonic()))
+            attempt = sum(called == symbol for called, _ in self.calls)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(1.0 if symbol in self.slow else self.latency)
+            if self.down:
+                raise OSError("Failed to resolve 'fc.yahoo.com'")
+            if attempt <= self.fail_first:
+                raise ConnectionError('connection reset')
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def download_history(self, symbol):
+        self._request(symbol)
+        return self.frame
+
+    def download_current_price(self, symbol):
+        return 1.0
+
+
+def fetch_all(fetcher, symbols, **fetching):
+    async_fetcher = AsyncDataFetcher(fetcher, {'fetching': fetching})
+    try:
+        return asyncio.run(async_fetcher.fetch_all(symbols)), async_fetcher
+    finally:
+        async_fetcher.close()
+
+
+def test_concurrency_is_limited():
+    fetcher = FakeFetcher(latency=0.05)
+    symbols = [f"SYM{j}-USD" for j in range(20)]
+    frames, _ = fetch_all(fetcher, symbols, max_concurrency=3)
+    assert fetcher.peak == 3
+    assert sorted(frames) == sorted(symbols)
+    assert not any(df.empty for df in frames.values())
+
+
+def test_slow_request_times_out():
+    fetcher = FakeFetcher(latency=0.01, slow={'SLOW-USD'})
+    start = time.monotonic()
+    frames, async_fetcher = fetch_all(fetcher, ['BTC-USD', 'SLOW-USD'], request_timeout=0.2, max_retries=0)
+    assert time.monotonic() - start < 0.9
+    assert frames['SLOW-USD'].empty and not frames['BTC-USD'].empty
+    assert 'timed out' in async_fetcher._errors['SLOW-USD']
+
+
+def test_failures_are_retried_with_backoff():
+    fetcher = FakeFetcher(fail_first=2)
+    frames, _ = fetch_all(fetcher, ['BTC-USD'], max_retries=2, backoff_base=0.1)
+    assert not frames['BTC-USD'].empty
+    times = [called_at for _, called_at in fetcher.calls]
+    assert len(times) == 3
+    # Jittered between half and all of backoff_base * 2 ** attempt
+    assert 0.05 <= times[1] - times[0] < 0.2
+    assert 0.1 <= times[2] - times[1] < 0.3
+
+    fetcher = FakeFetcher(fail_first=5)
+    frames, async_fetcher = fetch_all(fetcher, ['BTC-USD'], max_retries=2, backoff_base=0.01)
+    assert frames['BTC-USD'].empty
+    assert len(fetcher.calls) == 3
+    assert 'connection reset' in async_fetcher._errors['BTC-USD']
+
+
+def test_breaker_stops_fetching_when_every_fetch_fails():
+    # A DNS outage: every request fails, so the cycle gives up instead of trying each symbol
+    fetcher = FakeFetcher(latency=0.01, down=True)
+    symbols = [f"SYM{j}-USD" for j in range(40)]
+    frames, async_fetcher = fetch_all(fetcher, symbols, max_concurrency=2, max_retries=1, backoff_base=0.01,
+                                      max_consecutive_failures=3)
+    assert all(frames[symbol].empty for symbol in symbols)
+    assert async_fetcher._tripped
+    # Symbols already in flight when the breaker opened finish their attempts; nothing new starts
+    assert len({symbol for symbol, _ in fetcher.calls}) <= 3 + 2
+    assert len(fetcher.calls) <= (3 + 2) * 2
+
+
+def test_breaker_resets_each_cycle():
+    fetcher = FakeFetcher(down=True)
+    async_fetcher = AsyncDataFetcher(fetcher, {'fetching': {'max_retries': 0, 'max_consecutive_failures': 2}})
+    try:
+        asyncio.run(async_fetcher.fetch_all(['A-USD', 'B-USD', 'C-USD', 'D-USD']))
+        assert async_fetcher._tripped
+        fetcher.down = False
+        frames = asyncio.run(async_fetcher.fetch_all(['A-USD', 'B-USD']))
+    finally:
+        async_fetcher.close()
+    assert not async_fetcher._tripped
+    assert all(isinstance(df, pd.DataFrame) and not df.empty for df in frames.values())
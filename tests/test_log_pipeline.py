@@ -0,0 +1,98 @@
+import json
+import logging
+import queue
+
+import log_pipeline
+from log_pipeline import DedupQueueHandler
+
+
+def make_logger(handler, name):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger
+
+
+def drain(log_queue):
+    records = []
+    while not log_queue.empty():
+        records.append(log_queue.get_nowait())
+    return records
+
+
+def record(message, created, name='test'):
+    entry = logging.makeLogRecord({'name': name, 'msg': message, 'levelno': logging.WARNING,
+                                   'levelname': 'WARNING'})
+    entry.created = created
+    entry.msecs = int((created - int(created)) * 1000) + 0.0
+    return entry
+
+
+def test_outage_burst_collapses_across_symbols():
+    log_queue = queue.Queue()
+    handler = DedupQueueHandler(log_queue, window=5.0)
+    symbols = [f"SYM{j}-USD" for j in range(40)] + ['DCR-USD', 'NEAR-USD']
+    for j, symbol in enumerate(symbols):
+        handler.handle(record(f"Failed to get ticker '{symbol}' reason: NameResolutionError", 1000.0 + j * 0.1))
+    handler.handle(record("Iteration 3 took 9.0s", 1004.2))
+    handler.handle(record("Iteration 4 took 9.5s", 1010.0))  # Sweeps the bursts that have ended
+
+    records = drain(log_queue)
+    messages = [entry.getMessage() for entry in records]
+    assert messages[0] == "Failed to get ticker 'SYM0-USD' reason: NameResolutionError"
+    assert messages[1] == "Iteration 3 took 9.0s"
+    summary = records[2]
+    assert summary.repeats == 42
+    assert summary.symbols == symbols
+    assert "[x42 in 10.0s; 42 symbols: SYM0-USD, SYM1-USD," in messages[2]
+    assert messages[2].endswith(", +32 more]")
+    # Iteration 3 ended its burst alone, so it gets no summary; Iteration 4 starts a new one
+    assert messages[3:] == ["Iteration 4 took 9.5s"]
+
+
+def test_summary_has_its_own_timestamps():
+    log_queue = queue.Queue()
+    handler = DedupQueueHandler(log_queue, window=1.0)
+    handler.handle(record("Error fetching data for BTC-USD: timeout", 2000.125))
+    handler.handle(record("Error fetching data for ETH-USD: timeout", 2000.5))
+    handler.handle(record("Cycle done", 2001.75))
+
+    first, summary, other = drain(log_queue)
+    assert summary.created == 2001.75
+    assert summary.msecs == 750.0
+    assert summary.relativeCreated == (2001.75 - logging._startTime) * 1000
+    assert first.msecs == 125.0
+    line = json.loads(log_pipeline.JsonFormatter().format(summary))
+    assert line['repeats'] == 2 and line['symbols'] == ['BTC-USD', 'ETH-USD']
+
+
+def test_full_queue_drops_and_reports():
+    log_queue = queue.Queue(maxsize=2)
+    handler = DedupQueueHandler(log_queue, window=0)
+    logger = make_logger(handler, 'test.drops')
+    for j in range(5):
+        logger.info("record %d", j)
+    assert handler.dropped == 3
+    drain(log_queue)
+    logger.info("after")
+    messages = [entry.getMessage() for entry in drain(log_queue)]
+    assert messages == ["Dropped 3 log records: logging queue full", "after"]
+    assert handler.dropped == 0
+
+
+def test_stop_flushes_pending_summaries(tmp_path):
+    path = tmp_path / 'bot.log'
+    log_pipeline.start(logging.INFO, str(path), dedup_window=60.0)
+    try:
+        for symbol in ('BTC-USD', 'ETH-USD', 'SOL-USD'):
+            logging.getLogger('test.exit').warning(f"Error fetching data for {symbol}: DNS failure")
+    finally:
+        log_pipeline.stop()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 2
+    assert lines[0]['message'] == "Error fetching data for BTC-USD: DNS failure"
+    assert lines[1]['message'].startswith("Error fetching data for BTC-USD: DNS failure [x3 in ")
+    assert lines[1]['repeats'] == 3
+    assert lines[1]['symbols'] == ['BTC-USD', 'ETH-USD', 'SOL-USD']
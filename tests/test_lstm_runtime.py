@@ -0,0 +1,104 @@
+import numpy as np
+
+from lstm_runtime import NumpyLSTM, NumpyScaler, export
+
+
+def tanh(x):
+    return np.tanh(x)
+
+
+def sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def linear(x):
+    return x
+
+
+# Stand-ins for the Keras layers; export() only looks at the class name, activations and weights
+class LSTM:
+    def __init__(self, weights, name='lstm'):
+        self.name = name
+        self.activation = tanh
+        self.recurrent_activation = sigmoid
+        self.use_bias = True
+        self.weights = weights
+
+    def get_weights(self):
+        return self.weights
+
+
+class Dropout:
+    name = 'dropout'
+
+
+class Dense:
+    name = 'dense'
+    activation = linear
+
+    def __init__(self, weights):
+        self.weights = weights
+
+    def get_weights(self):
+        return self.weights
+
+
+class Model:
+    def __init__(self, layers):
+        self.layers = layers
+
+
+def lstm_weights(rng, n_inputs, units):
+    return [rng.normal(0, 0.5, (n_inputs, 4 * units)).astype('f4'),
+            rng.normal(0, 0.5, (units, 4 * units)).astype('f4'),
+            rng.normal(0, 0.1, 4 * units).astype('f4')]
+
+
+def reference_lstm(sequence, kernel, recurrent_kernel, bias):
+    # The gate equations one step and one unit block at a time, in Keras' i, f, c, o order
+    units = recurrent_kernel.shape[0]
+    h, c = np.zeros(units), np.zeros(units)
+    outputs = []
+    for x in sequence:
+        z = x @ kernel + h @ recurrent_kernel + bias
+        i = sigmoid(z[:units])
+        f = sigmoid(z[units:2 * units])
+        g = np.tanh(z[2 * units:3 * units])
+        o = sigmoid(z[3 * units:])
+        c = f * c + i * g
+        h = o * np.tanh(c)
+        outputs.append(h)
+    return np.array(outputs)
+
+
+def test_forward_pass_matches_gate_equations():
+    rng = np.random.default_rng(0)
+    first, second = lstm_weights(rng, 3, 8), lstm_weights(rng, 8, 5)
+    dense = [rng.normal(0, 0.5, (5, 2)).astype('f4'), rng.normal(0, 0.1, 2).astype('f4')]
+    model = NumpyLSTM([('lstm', first), ('lstm', second), ('dense', dense)])
+    windows = rng.random((6, 10, 3)).astype('f4')
+
+    expected = np.array([reference_lstm(reference_lstm(window, *first), *second)[-1] @ dense[0] + dense[1]
+                         for window in windows.astype('f8')])
+    np.testing.assert_allclose(model.predict(windows), expected, rtol=1e-5, atol=1e-6)
+
+
+def test_export_load_round_trip(tmp_path):
+    rng = np.random.default_rng(1)
+    first, second = lstm_weights(rng, 4, 6), lstm_weights(rng, 6, 6)
+    dense = [rng.normal(0, 0.5, (6, 1)).astype('f4'), rng.normal(0, 0.1, 1).astype('f4')]
+    keras_model = Model([LSTM(first), Dropout(), LSTM(second, 'lstm_1'), Dropout(), Dense(dense)])
+    scaler = NumpyScaler(rng.normal(size=4), rng.uniform(0.5, 2, size=4))
+    path = tmp_path / 'weights.npz'
+    export(keras_model, scaler, path)
+
+    loaded, loaded_scaler = NumpyLSTM.load(path)
+    assert [kind for kind, _ in loaded.layers] == ['lstm', 'lstm', 'dense']
+    for (_, weights), original in zip(loaded.layers, (first, second, dense)):
+        for array, expected in zip(weights, original):
+            np.testing.assert_array_equal(array, expected)
+    X = rng.random((3, 4))
+    np.testing.assert_allclose(loaded_scaler.transform(X), scaler.transform(X))
+    windows = rng.random((2, 7, 4)).astype('f4')
+    np.testing.assert_array_equal(loaded.predict(windows), NumpyLSTM([('lstm', first), ('lstm', second),
+                                                                      ('dense', dense)]).predict(windows))
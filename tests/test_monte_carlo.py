@@ -0,0 +1,57 @@
+import numpy as np
+
+from monte_carlo import MonteCarloSimulator
+
+
+def make(**monte_carlo):
+    return MonteCarloSimulator({'monte_carlo': {'n_paths': 500, 'horizon': 40, 'block_size': 8, 'chunk_size': 200,
+                                                **monte_carlo}})
+
+
+def test_seeded_results_are_reproducible():
+    returns = np.random.default_rng(0).normal(0, 0.01, 1000)
+    simulator = make()
+    first = simulator.simulate_trade(returns, 1, 0.02, 0.03, seed=7)
+    assert simulator.simulate_trade(returns, 1, 0.02, 0.03, seed=7) == first
+    assert make(seed=7).simulate_trade(returns, 1, 0.02, 0.03) == first
+    assert simulator.simulate_trade(returns, 1, 0.02, 0.03, seed=8) != first
+
+
+def test_block_bootstrap_shape_and_blocks():
+    simulator = make(block_size=8, horizon=20)
+    returns = np.arange(50, dtype=float)
+    paths = simulator.bootstrap_paths(returns, 30, np.random.default_rng(1))
+    assert paths.shape == (30, 20)
+    # Each block is a run of consecutive bars, wrapping around the end of the history
+    for path in paths:
+        for start in range(0, 20, 8):
+            block = path[start:start + 8]
+            np.testing.assert_array_equal(block, (block[0] + np.arange(len(block))) % 50)
+
+    panel = np.random.default_rng(2).normal(size=(50, 3))
+    assert simulator.bootstrap_paths(panel, 30, np.random.default_rng(1)).shape == (30, 20, 3)
+    chunks = list(simulator.paths(panel, weights=np.full(3, 1 / 3), seed=3))
+    assert [chunk.shape for chunk in chunks] == [(200, 20), (200, 20), (100, 20)]
+
+
+def test_short_pnl_is_the_negated_price_move():
+    # The price rises 1% every bar: a short loses 1.01 ** k - 1 after k bars and hits a 5% stop at bar 5,
+    # where the negated log return would not reach it until bar 6
+    simulator = make(horizon=10)
+    returns = np.full(100, np.log(1.01))
+    result = simulator.simulate_trade(returns, -1, 0.05, 0.10, seed=1)
+    assert result['stop_loss_probability'] == 1.0
+    assert result['expected_return'] == -0.05
+    np.testing.assert_allclose(result['drawdown']['mean'], 1.01 ** 5 - 1)
+
+    falling = np.full(100, np.log(0.99))
+    result = simulator.simulate_trade(falling, -1, 0.05, 0.10, seed=1)
+    assert result['take_profit_probability'] == 0.0
+    np.testing.assert_allclose(result['expected_return'], 1 - 0.99 ** 10)
+    assert result['drawdown']['mean'] == 0.0
+
+
+def test_kelly_search_is_capped_at_max_leverage():
+    config = {'monte_carlo': {'max_kelly_fraction': 2.0}, 'risk_management': {'max_leverage': 1.5}}
+    assert MonteCarloSimulator(config).max_kelly_fraction == 1.5
+    assert MonteCarloSimulator({'monte_carlo': {'max_kelly_fraction': 2.0}}).max_kelly_fraction == 2.0
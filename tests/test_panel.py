@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from data_sources import synthetic_ohlcv
+from feature_store import FeatureStore
+from panel import PricePanel, compute_indicators, rolling_mean, score_universe
+from risk_management import RiskManagement
+from signal_generator import SignalGenerator
+
+CAPITAL_ALLOCATION = {'momentum': 0.4, 'mean_reversion': 0.3, 'breakout': 0.3}
+
+
+class FixedRegime:
+    def detect_regime(self, close, symbol=None):
+        return 0, None
+
+    def regime_description(self, regime):
+        return 'Low Volatility'
+
+
+def test_interior_gaps_are_filled_flat():
+    frames = synthetic_ohlcv(2, 300)
+    full, gappy = frames['SYM0-USD'], frames['SYM1-USD']
+    frames['SYM1-USD'] = gappy.drop(gappy.index[[100, 150, 151, 152]])
+    frames['SYM0-USD'] = full.iloc[20:]  # Shorter history stays NaN-padded at the top
+    panel = PricePanel.from_frames(frames)
+
+    close = panel.close[:, 1]
+    for row in (150, 151, 152):
+        assert close[row] == gappy['close'].iloc[149]
+        assert panel.open[row, 1] == panel.high[row, 1] == panel.low[row, 1] == close[row]
+        assert panel.volume[row, 1] == 0.0
+    assert np.isnan(panel.close[:20, 0]).all()
+
+    # A gap no longer blanks the rolling kernels for the following window of bars
+    expected = pd.Series(close).rolling(50).mean().to_numpy()
+    np.testing.assert_allclose(rolling_mean(panel.close, 50)[:, 1], expected, rtol=1e-12)
+    assert not np.isnan(compute_indicators(panel)['SMA_50'][60:, 1]).any()
+
+
+def test_score_universe_matches_per_symbol_signals():
+    frames = synthetic_ohlcv(4, 420, volatility=0.01)
+    lengths = {'SYM0-USD': 420, 'SYM1-USD': 300, 'SYM2-USD': 215, 'SYM3-USD': 120}
+    frames = {symbol: df.iloc[-lengths[symbol]:] for symbol, df in frames.items()}
+    risk_management = RiskManagement({'risk_per_trade': 0.01, 'max_risk_per_trade': 0.02, 'max_leverage': 2,
+                                      'stop_loss_pct': 0.01})
+    generator = SignalGenerator({'capital_allocation': CAPITAL_ALLOCATION}, risk_management, None, FixedRegime(),
+                                FeatureStore())
+    end = frames['SYM0-USD'].index
+    actions = 0
+    for cut in range(len(end) - 40, len(end) + 1):
+        window = {symbol: df[df.index < end[cut - 1] + pd.Timedelta('1ns')] for symbol, df in frames.items()}
+        panel = PricePanel.from_frames(window)
+        ml_predictions = np.sin(np.arange(len(panel.symbols)) + cut) / 100
+        scores = score_universe(panel, CAPITAL_ALLOCATION, ml_predictions)
+        for j, symbol in enumerate(panel.symbols):
+            signal = generator.generate_signal(window[symbol], symbol, float(ml_predictions[j]))
+            if signal is None:
+                assert scores[j] == 0, (cut, symbol)
+                continue
+            actions += 1
+            assert signal.action == ('BUY' if scores[j] > 0 else 'SELL'), (cut, symbol)
+            entry_price = panel.close[-1, j]
+            stop_loss, take_profit = risk_management.calculate_stop_loss_take_profit(entry_price, signal.action)
+            assert (signal.entry_price, signal.stop_loss, signal.take_profit) == (entry_price, stop_loss, take_profit)
+    assert actions > 40  # Both sides of the comparison were exercised, not just the no-signal case
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+from data_sources import synthetic_ohlcv
+from risk_management import PortfolioRisk
+
+
+def test_forming_bar_is_folded_in_only_once_closed():
+    frames = synthetic_ohlcv(3, 200, timeframe='15min')
+    index = frames['SYM0-USD'].index
+    risk = PortfolioRisk({}, list(frames), '15min')
+    assert risk.update(frames, index[-1] + pd.Timedelta('5min')) == 199  # Every closed bar; the first has no return
+    assert risk.last_timestamp == index[-2]
+
+    # The forming bar's close moves during the bar; the return that is folded in uses its final close
+    final = {symbol: df.copy() for symbol, df in frames.items()}
+    for df in final.values():
+        df.loc[df.index[-1], 'close'] *= 1.01
+    assert risk.update(final, index[-1] + pd.Timedelta('10min')) == 0
+    reference = PortfolioRisk({}, list(frames), '15min')
+    reference.update(final, index[-1] + pd.Timedelta('15min'))
+    assert risk.update(final, index[-1] + pd.Timedelta('15min')) == 1
+    np.testing.assert_allclose(risk.covariance, reference.covariance)
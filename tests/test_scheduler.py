@@ -0,0 +1,29 @@
+import pandas as pd
+
+from scheduler import BarCloseScheduler, Cycle
+
+
+class FixedClock:
+    def __init__(self, now):
+        self.current = pd.Timestamp(now)
+
+    def now(self):
+        return self.current
+
+
+def test_deferred_symbols_go_first_next_cycle():
+    clock = FixedClock('2024-01-01 00:15:05')
+    scheduler = BarCloseScheduler({'data_parameters': {'timeframe': '15m'}}, clock=clock)
+    bar_close = pd.Timestamp('2024-01-01 00:15')
+    cycle = Cycle(clock, bar_close, bar_close, bar_close + pd.Timedelta('7min'), 20)
+    for symbol, seconds in (('FAST-USD', 0.1), ('SLOW-USD', 3.0)):
+        cycle.record(symbol, seconds)
+    cycle.defer(['LATE-USD'])
+    scheduler.finish(cycle)
+    # LATE-USD was processed more recently than the others once before, so only the deferral puts it first
+    scheduler.last_bar['LATE-USD'] = bar_close
+    scheduler.latency['LATE-USD'] = 5.0
+    assert scheduler.order(['SLOW-USD', 'LATE-USD', 'FAST-USD', 'NEW-USD']) == ['LATE-USD', 'NEW-USD', 'FAST-USD',
+                                                                                 'SLOW-USD']
+    scheduler.finish(Cycle(clock, bar_close + pd.Timedelta('15min'), bar_close, bar_close, 20))
+    assert scheduler.order(['LATE-USD', 'FAST-USD'])[0] == 'FAST-USD'
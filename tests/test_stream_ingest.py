@@ -0,0 +1,122 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from bar_cache import BarRing
+from stream_ingest import BarAggregator, FakeTickServer, StreamDataSource
+
+SYMBOLS = ['BTC-USD', 'ETH-USD']
+
+
+def make_config(port, backfill=None):
+    return {'data_parameters': {'timeframe': '1s', 'history_length': '1h'},
+            'trading': {'symbols': SYMBOLS},
+            'data_source': {'type': 'stream', 'synthetic': {'speed': 0},
+                            'stream': {'port': port, 'capacity': 100, 'backfill': backfill}}}
+
+
+class RecordingSource(StreamDataSource):
+    def __init__(self, config):
+        super().__init__(config)
+        self.ticks = []
+
+    def _on_tick(self, symbol, timestamp_ns, price, size):
+        self.ticks.append((symbol, timestamp_ns, price, size))
+        super()._on_tick(symbol, timestamp_ns, price, size)
+
+
+def test_aggregator_closes_on_next_interval():
+    aggregator = BarAggregator('1min')
+    minute = 60 * 10 ** 9
+    assert aggregator.add(0, 10.0, 1.0) is None
+    assert aggregator.add(minute // 2, 12.0, 2.0) is None
+    assert aggregator.add(minute - 1, 9.0, 1.0) is None
+    assert aggregator.add(minute, 11.0, 1.0) == (0, 10.0, 12.0, 9.0, 9.0, 4.0)
+    assert aggregator.add(minute // 2, 50.0) is None  # Late tick for a bar already emitted
+    assert aggregator.late_ticks == 1
+    assert aggregator.flush(2 * minute) == (minute, 11.0, 11.0, 11.0, 11.0, 1.0)
+
+
+def test_streamed_ticks_close_into_bars():
+    async def run():
+        server = await FakeTickServer(port=0, tick_interval=0.02).start()
+        source = RecordingSource(make_config(server.port))
+        await source.start()
+        try:
+            await asyncio.sleep(2.5)
+            bar_close = pd.Timestamp(source.ticks[-1][1]).floor('1s')
+            await source.wait_closed(bar_close, timeout=1.0)
+        finally:
+            await source.stop()
+            await server.close()
+        return source, bar_close
+
+    source, bar_close = asyncio.run(run())
+    ticks = pd.DataFrame(source.ticks, columns=['symbol', 'timestamp', 'price', 'size'])
+    for symbol in SYMBOLS:
+        bars = source.download_history(symbol)
+        assert len(bars) >= 2
+        assert bars.index[-1] == bar_close - pd.Timedelta('1s')
+
+        # Every closed bar matches the OHLCV of the ticks that fell into its second
+        symbol_ticks = ticks[ticks['symbol'] == symbol]
+        seconds = pd.to_datetime(symbol_ticks['timestamp']).dt.floor('1s')
+        for open_time, bar in bars.iterrows():
+            prices = symbol_ticks['price'][seconds == open_time].to_numpy()
+            sizes = symbol_ticks['size'][seconds == open_time].to_numpy()
+            np.testing.assert_allclose(bar[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy(dtype=float),
+                                       [prices[0], prices.max(), prices.min(), prices[-1], sizes.sum()])
+        assert source.download_current_price(symbol) == symbol_ticks['price'].iloc[-1]
+
+
+def test_failed_backfill_serves_streamed_bars_and_retries():
+    source = StreamDataSource(make_config(0, backfill='synthetic'))
+    calls = []
+
+    def failing_history(symbol, start=None):
+        calls.append(symbol)
+        raise ConnectionError('backfill source down')
+
+    source.backfill.download_history = failing_history
+    second = 10 ** 9
+    for k in range(4):
+        source._on_tick('BTC-USD', k * second, 100.0 + k, 1.0)
+
+    bars = source.download_history('BTC-USD')
+    assert list(bars['Close']) == [100.0, 101.0, 102.0]
+    assert 'BTC-USD' in source._stale
+    source.download_history('BTC-USD')
+    assert calls == ['BTC-USD', 'BTC-USD']
+
+
+def test_backfill_mid_bar_keeps_one_bar_per_timestamp():
+    source = StreamDataSource(make_config(0, backfill='synthetic'))
+    second = 10 ** 9
+    start = pd.Timestamp('2026-01-01').value
+    index = pd.DatetimeIndex([pd.Timestamp(start + k * second) for k in range(5)])
+    # The backfill is taken 0.5s into bar 4, so its last row is a partial bar
+    history = pd.DataFrame({'Open': 1.0, 'High': 2.0, 'Low': 0.5, 'Close': 1.5, 'Volume': 10.0}, index=index)
+    source.backfill.download_history = lambda symbol, start=None: history
+
+    source._on_tick('BTC-USD', start + 4 * second + second // 4, 100.0, 1.0)
+    bars = source.download_history('BTC-USD')
+    assert list(bars.index) == list(index[:4])
+
+    source._on_tick('BTC-USD', start + 4 * second + 3 * second // 4, 103.0, 2.0)
+    source._on_tick('BTC-USD', start + 5 * second, 104.0, 1.0)  # Closes bar 4
+    bars = source.download_history('BTC-USD')
+    assert list(bars.index) == list(index)
+    assert bars.index.is_unique
+    assert list(bars.iloc[-1]) == [100.0, 103.0, 100.0, 103.0, 3.0]
+
+
+def test_ring_replaces_a_bar_with_the_same_timestamp():
+    ring = BarRing(4)
+    ring.append((1, 1.0, 1.0, 1.0, 1.0, 1.0))
+    ring.append((2, 2.0, 2.0, 2.0, 2.0, 2.0))
+    ring.append((2, 3.0, 3.0, 3.0, 3.0, 3.0))
+    ring.append((1, 9.0, 9.0, 9.0, 9.0, 9.0))  # Older than the newest bar: ignored
+    records = ring.records()
+    assert list(records['timestamp']) == [1, 2]
+    assert list(records['Close']) == [1.0, 3.0]
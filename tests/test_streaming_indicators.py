@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from data_sources import synthetic_ohlcv
+from indicators import Indicators
+from streaming_indicators import StreamingIndicatorEngine
+
+EXACT = ['SMA_50', 'SMA_200', 'RSI', 'ATR', 'Chandelier_Exit', 'MACD', 'MACD_Signal', 'MACD_Histogram',
+         'BB_Middle', 'Highest_High', 'Lowest_Low']
+
+
+def pandas_indicators(df):
+    atr = Indicators.calculate_atr(df, 14)
+    macd = Indicators.calculate_macd(df['close'])
+    bands = Indicators.bollinger_bands(df)
+    return pd.DataFrame({
+        'SMA_50': Indicators.moving_average(df, 50), 'SMA_200': Indicators.moving_average(df, 200),
+        'RSI': Indicators.calculate_rsi(df['close']), 'ATR': atr,
+        'Chandelier_Exit': Indicators.chandelier_exit(df, atr, 14),
+        'MACD': macd['MACD'], 'MACD_Signal': macd['Signal'], 'MACD_Histogram': macd['Histogram'],
+        'BB_Upper': bands['Upper'], 'BB_Middle': bands['Middle'], 'BB_Lower': bands['Lower'],
+        'Highest_High': df['high'].rolling(20).max(), 'Lowest_Low': df['low'].rolling(20).min()})
+
+
+def flat_bars(seed):
+    # Synthetic bars with runs of identical prices, as for a halted or illiquid symbol
+    rng = np.random.default_rng(seed)
+    df = synthetic_ohlcv(1, 1000, seed=seed)['SYM0-USD']
+    for start in rng.integers(200, 950, 6):
+        df.iloc[start:start + rng.integers(5, 50), :4] = df['close'].iloc[start]
+    return df
+
+
+def test_streamed_indicators_match_pandas():
+    for seed in range(5):
+        df = flat_bars(seed)
+        engine = StreamingIndicatorEngine()
+        streamed = pd.DataFrame([engine.update(high, low, close)
+                                 for high, low, close in zip(df['high'], df['low'], df['close'])], index=df.index)
+        expected = pandas_indicators(df)
+        for column in EXACT:
+            np.testing.assert_array_equal(streamed[column].to_numpy(), expected[column].to_numpy(), err_msg=column)
+        for column in ('BB_Upper', 'BB_Lower'):
+            difference = (streamed[column] - expected[column]).abs() / df['close']
+            assert streamed[column].isna().equals(expected[column].isna())
+            assert difference.max() < 1e-7, column
+
+
+def test_peek_matches_update_and_checkpoint_restores():
+    df = flat_bars(7)
+    engine = StreamingIndicatorEngine()
+    for high, low, close in zip(df['high'][:600], df['low'][:600], df['close'][:600]):
+        engine.update(high, low, close)
+    restored = StreamingIndicatorEngine.restore(engine.checkpoint())
+    bar = (df['high'].iloc[600], df['low'].iloc[600], df['close'].iloc[600])
+    preview = engine.peek(*bar)
+    assert engine.update(*bar) == preview == restored.update(*bar)
@@ -0,0 +1,67 @@
+import asyncio
+
+import pandas as pd
+
+from async_fetcher import AsyncDataFetcher
+from data_sources import synthetic_ohlcv
+from symbol_health import SymbolHealth
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = pd.Timestamp('2026-01-01')
+
+    def now(self):
+        return self.time
+
+
+class FakeSource:
+    def __init__(self, dead=(), down=False):
+        self.dead = set(dead)
+        self.down = down
+        self.frame = synthetic_ohlcv(1, 50)['SYM0-USD']
+
+    def download_history(self, symbol):
+        if self.down:
+            raise OSError("Failed to resolve 'fc.yahoo.com'")
+        return pd.DataFrame() if symbol in self.dead else self.frame
+
+    def download_current_price(self, symbol):
+        if self.down or symbol in self.dead:
+            raise KeyError('regularMarketPrice')
+        return 1.0
+
+
+def run_cycles(source, symbols, n_cycles, clock, health, fetcher):
+    for _ in range(n_cycles):
+        async def cycle():
+            return [symbol async for symbol, _, _ in fetcher.stream(health.due(symbols))]
+        asyncio.run(cycle())
+        clock.time += pd.Timedelta('15min')
+
+
+def make(config, source):
+    clock = FakeClock()
+    health = SymbolHealth({'symbol_health': {'path': None, **config}}, clock)
+    fetcher = AsyncDataFetcher(source, {'fetching': {'max_retries': 0, 'max_concurrency': 4}}, health)
+    return clock, health, fetcher
+
+
+def test_dead_symbols_are_quarantined_and_skipped():
+    source = FakeSource(dead={'DEAD-USD'})
+    symbols = ['BTC-USD', 'ETH-USD', 'DEAD-USD']
+    clock, health, fetcher = make({'base_backoff': 60, 'quarantine_after': 3}, source)
+    run_cycles(source, symbols, 40, clock, health, fetcher)
+    report = health.report(symbols)
+    assert report['quarantined'] == ['DEAD-USD']
+    assert health.symbols['BTC-USD']['failures'] == 0
+    assert health.due(symbols) == ['BTC-USD', 'ETH-USD']
+
+
+def test_source_outage_is_not_charged_to_symbols():
+    source = FakeSource(down=True)
+    symbols = [f"SYM{j}-USD" for j in range(40)]
+    clock, health, fetcher = make({}, source)
+    run_cycles(source, symbols, 4 * 48, clock, health, fetcher)
+    assert health.report(symbols)['active'] == symbols
+    assert all(record['failures'] == 0 for record in health.symbols.values())
@@ -1,45 +1,61 @@
-import logging
-import yaml
-import yfinance as yf
-from datetime import datetime, timedelta
-
-def setup_logging(log_level: str) -> None:
-    logging.basicConfig(
-        level=log_level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        filename='signals_bot.log',
-        filemode='a'
-    )
-    console = logging.StreamHandler()
-    console.setLevel(log_level)
-    logging.getLogger('').addHandler(console)
-
-def load_config(file_path):
-    with open(file_path, 'r') as file:
-        return yaml.safe_load(file)
-
-def fetch_ohlcv(symbol, timeframe, history_length):
-    try:
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=7)  # Fetch 7 days of data
-        df = yf.Ticker(symbol).history(interval=timeframe, start=start_date, end=end_date)
-        return df
-    except Exception as e:
-        logging.error(f"An error occurred while fetching data for {symbol}: {str(e)}")
-        return None
-
-def format_signal(signal):
-    return f"""
-    Symbol: {signal['symbol']}
-    Action: {signal['action']}
-    Entry Price: {signal['entry_price']:.2f}
-    Stop Loss: {signal['stop_loss']:.2f}
-    Take Profit: {signal['take_profit']:.2f}
-    Leverage: {signal['leverage']}x
-    Generated At: {signal['generated_at']}
-    Valid Until: {signal['valid_until']}
-    Explanation: {signal['explanation']}
-    """
-
-def fetch_all_ohlcv(symbols, timeframe, history_length):
-    return {symbol: fetch_ohlcv(symbol, timeframe, history_length) for symbol in symbols}
+import logging
+import os
+import sys
+import time
+import pandas as pd
+import yaml
+
+import log_pipeline
+
+def setup_logging(log_level: str, log_file: str = 'signals_bot.log', options: dict = None) -> None:
+    # options is the logging config section: rotation size, queue size and error deduplication
+    options = options or {}
+    log_pipeline.start(log_level, log_file,
+                       max_bytes=int(options.get('max_mb', 50) * 1024 * 1024),
+                       backup_count=options.get('backup_count', 5),
+                       queue_size=options.get('queue_size', 10000),
+                       dedup_window=options.get('dedup_window', 5.0),
+                       dedup_level=options.get('dedup_level', 'WARNING'))
+
+def utc_now():
+    # Naive UTC, like the bar timestamps every data source serves
+    return pd.Timestamp.now(tz='UTC').tz_localize(None)
+
+def load_config(file_path):
+    with open(file_path, 'r') as file:
+        return yaml.safe_load(file)
+
+def current_rss_mb():
+    # Resident set size of this process; Linux reads /proc, elsewhere falls back to the peak RSS
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+def log_startup_stats(start_time):
+    heavy = [name for name in ('tensorflow', 'sklearn', 'yfinance') if name in sys.modules]
+    logging.info(f"Startup took {time.perf_counter() - start_time:.2f}s, RSS {current_rss_mb():.0f} MB, "
+                 f"heavy modules loaded: {', '.join(heavy) or 'none'}")
+
+def fetch_ohlcv(symbol, timeframe, history_length):
+    from data_fetcher import YFinanceDataFetcher
+
+    fetcher = YFinanceDataFetcher({'data_parameters': {'timeframe': timeframe, 'history_length': history_length}})
+    try:
+        return fetcher.download_history(symbol)
+    except Exception as e:
+        logging.error(f"An error occurred while fetching data for {symbol}: {str(e)}")
+        return None
+
+def format_signal(signal, validity_window=None):
+    return signal.describe(validity_window)
+
+def fetch_all_ohlcv(symbols, timeframe, history_length):
+    return {symbol: fetch_ohlcv(symbol, timeframe, history_length) for symbol in symbols}